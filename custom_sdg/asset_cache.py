@@ -0,0 +1,272 @@
+#!/usr/bin/env python3
+"""
+Content-addressed local cache for Isaac assets used by SDG.
+
+Why this exists:
+- Every SDG launch resolves the warehouse stage, robot distractors, floor/wall
+  textures and online MDL materials against Nucleus/S3, which is slow and fails
+  when the network is flaky.
+
+Layout under the cache directory:
+- blobs/<sha[:2]>/<sha256>        file contents, stored once per unique content.
+- tree/<key path>                 hardlinks (or copies) of blobs, laid out like the
+                                  source so relative USD/MDL references still resolve.
+- manifest.json                   key -> {sha256, size, source, tree}.
+
+Keys are either Isaac-relative paths (e.g. /Isaac/Environments/.../warehouse.usd,
+resolved against an asset root) or absolute URLs (e.g. online MDL files).
+The asset root may be a Nucleus/S3 URL or a plain local directory, which makes the
+cache easy to exercise without an asset server.
+
+Usage:
+  python asset_cache.py localize --cache-dir ~/.cache/sdg_assets \\
+      --asset-root /mnt/isaac_assets /Isaac/Environments/Simple_Warehouse/warehouse.usd
+"""
+
+from __future__ import annotations
+
+import argparse
+import hashlib
+import json
+import os
+import posixpath
+import shutil
+import tempfile
+import urllib.parse
+import urllib.request
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Tuple
+
+USD_EXTENSIONS = (".usd", ".usda", ".usdc", ".usdz")
+REMOTE_PREFIXES = ("omniverse://", "http://", "https://")
+MANIFEST_NAME = "manifest.json"
+
+
+def is_url(path: str) -> bool:
+    return path.startswith(REMOTE_PREFIXES) or path.startswith("file://")
+
+
+def join_asset_root(asset_root: str, key: str) -> str:
+    """Join an asset root (URL or local directory) with an Isaac-relative key."""
+    if is_url(key):
+        return key
+    return asset_root.rstrip("/") + "/" + key.lstrip("/")
+
+
+def key_to_tree_relpath(key: str) -> str:
+    """Map a cache key to a relative path inside tree/ that keeps the source layout."""
+    if key.startswith("file://"):
+        rel = posixpath.join("_file", key[len("file://"):].lstrip("/"))
+    elif key.startswith(REMOTE_PREFIXES):
+        parsed = urllib.parse.urlparse(key)
+        rel = posixpath.join("_url", parsed.scheme, parsed.netloc, parsed.path.lstrip("/"))
+    else:
+        rel = key.lstrip("/")
+    rel = posixpath.normpath(rel)
+    if rel.startswith(".."):
+        raise ValueError(f"Refusing cache key outside the cache tree: {key}")
+    return rel
+
+
+def fetch_to_file(url: str, dst: Path, timeout: float = 60.0) -> None:
+    """Copy/download `url` (local path, file://, http(s)://, omniverse://) to `dst`."""
+    if url.startswith(("http://", "https://")):
+        with urllib.request.urlopen(url, timeout=timeout) as resp, open(dst, "wb") as f:
+            shutil.copyfileobj(resp, f, length=1 << 20)
+        return
+    if url.startswith("omniverse://"):
+        # Only available inside Kit (Isaac Sim python); kept optional on purpose.
+        import omni.client
+
+        result, _version, content = omni.client.read_file(url)
+        if result != omni.client.Result.OK:
+            raise IOError(f"omni.client.read_file failed for {url}: {result}")
+        dst.write_bytes(memoryview(content).tobytes())
+        return
+    src = url[len("file://"):] if url.startswith("file://") else url
+    shutil.copyfile(src, dst)
+
+
+def _sha256_file(path: Path) -> str:
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+def _usd_external_refs(local_path: Path) -> List[str]:
+    """Return authored sublayer/reference/payload/asset paths of a USD file (needs pxr)."""
+    try:
+        from pxr import UsdUtils
+    except Exception:
+        return []
+    try:
+        sublayers, references, payloads = UsdUtils.ExtractExternalReferences(str(local_path))
+    except Exception:
+        return []
+    return [p for p in list(sublayers) + list(references) + list(payloads) if p]
+
+
+class AssetCache:
+    """Manifest-backed, content-addressed asset store (see module docstring)."""
+
+    def __init__(self, cache_dir: str):
+        self.root = Path(cache_dir).expanduser().resolve()
+        self.blobs_dir = self.root / "blobs"
+        self.tree_dir = self.root / "tree"
+        self.manifest_path = self.root / MANIFEST_NAME
+        self.entries: Dict[str, dict] = {}
+        if self.manifest_path.is_file():
+            self.entries = json.loads(self.manifest_path.read_text()).get("entries", {})
+
+    def save(self) -> None:
+        self.root.mkdir(parents=True, exist_ok=True)
+        tmp = self.manifest_path.with_suffix(".json.tmp")
+        tmp.write_text(json.dumps({"version": 1, "entries": self.entries}, indent=2, sort_keys=True))
+        os.replace(tmp, self.manifest_path)
+
+    def lookup(self, key: str) -> Optional[str]:
+        """Return the local tree path for `key`, or None if it is not (validly) cached."""
+        entry = self.entries.get(key)
+        if not entry:
+            return None
+        path = self.tree_dir / entry["tree"]
+        if not path.is_file():
+            return None
+        return str(path)
+
+    def lookup_url(self, key: str) -> Optional[str]:
+        path = self.lookup(key)
+        return "file://" + path if path else None
+
+    def _blob_path(self, sha: str) -> Path:
+        return self.blobs_dir / sha[:2] / sha
+
+    def store(self, key: str, source_url: str) -> Tuple[str, bool]:
+        """Fetch `source_url` into the cache under `key`. Returns (tree_path, new_blob)."""
+        self.blobs_dir.mkdir(parents=True, exist_ok=True)
+        fd, tmp_name = tempfile.mkstemp(dir=self.blobs_dir, suffix=".part")
+        os.close(fd)
+        tmp = Path(tmp_name)
+        try:
+            fetch_to_file(source_url, tmp)
+            sha = _sha256_file(tmp)
+            blob = self._blob_path(sha)
+            new_blob = not blob.is_file()
+            if new_blob:
+                blob.parent.mkdir(parents=True, exist_ok=True)
+                os.replace(tmp, blob)
+        finally:
+            if tmp.exists():
+                tmp.unlink()
+
+        rel = key_to_tree_relpath(key)
+        tree_path = self.tree_dir / rel
+        tree_path.parent.mkdir(parents=True, exist_ok=True)
+        if tree_path.exists() or tree_path.is_symlink():
+            tree_path.unlink()
+        try:
+            os.link(blob, tree_path)
+        except OSError:
+            shutil.copyfile(blob, tree_path)
+        self.entries[key] = {
+            "sha256": sha,
+            "size": blob.stat().st_size,
+            "source": source_url,
+            "tree": rel,
+        }
+        return str(tree_path), new_blob
+
+
+def localize(
+    cache: AssetCache,
+    asset_root: str,
+    keys: Iterable[str],
+    follow_deps: bool = True,
+    refresh: bool = False,
+    log=print,
+) -> dict:
+    """
+    Mirror `keys` (and, for USD files, their external references) into `cache`.
+    Already cached keys are skipped unless `refresh` is set. Failures are reported,
+    not raised, so one missing robot does not abort the whole mirror.
+    """
+    stats = {"requested": 0, "fetched": 0, "cached": 0, "new_blobs": 0, "failed": []}
+    queue: List[str] = []
+    seen = set()
+    for key in keys:
+        if key and key not in seen:
+            queue.append(key)
+            seen.add(key)
+    stats["requested"] = len(queue)
+
+    while queue:
+        key = queue.pop(0)
+        local = None if refresh else cache.lookup(key)
+        if local:
+            stats["cached"] += 1
+        else:
+            source = join_asset_root(asset_root, key)
+            try:
+                local, new_blob = cache.store(key, source)
+            except Exception as exc:
+                log(f"[asset_cache] FAILED {key} from {source}: {exc}")
+                stats["failed"].append(key)
+                continue
+            stats["fetched"] += 1
+            stats["new_blobs"] += int(new_blob)
+            log(f"[asset_cache] cached {key}")
+            # Persist progress so an interrupted mirror resumes where it stopped.
+            cache.save()
+
+        if follow_deps and local.lower().endswith(USD_EXTENSIONS):
+            for dep in _usd_external_refs(Path(local)):
+                dep_key = _resolve_dependency_key(key, dep)
+                if dep_key and dep_key not in seen:
+                    queue.append(dep_key)
+                    seen.add(dep_key)
+
+    cache.save()
+    return stats
+
+
+def _resolve_dependency_key(parent_key: str, dep: str) -> Optional[str]:
+    """Resolve an authored asset path relative to the key of the layer that authored it."""
+    dep = dep.strip()
+    if not dep or dep.startswith("@") or "<UDIM>" in dep:
+        return None
+    if is_url(dep):
+        return dep
+    if dep.startswith("/"):
+        # Absolute filesystem path authored in the layer; not part of the asset root.
+        return None
+    if is_url(parent_key):
+        return urllib.parse.urljoin(parent_key, dep)
+    return posixpath.normpath(posixpath.join(posixpath.dirname(parent_key), dep))
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Mirror Isaac SDG assets into a local content-addressed cache.")
+    sub = parser.add_subparsers(dest="command", required=True)
+    loc = sub.add_parser("localize", help="Fetch assets into the cache.")
+    loc.add_argument("--cache-dir", required=True, help="Cache directory.")
+    loc.add_argument(
+        "--asset-root",
+        required=True,
+        help="Isaac assets root (Nucleus/S3 URL or local directory) used for Isaac-relative keys.",
+    )
+    loc.add_argument("--no-deps", action="store_true", help="Do not follow USD sublayers/references/payloads.")
+    loc.add_argument("--refresh", action="store_true", help="Re-fetch keys that are already cached.")
+    loc.add_argument("keys", nargs="+", help="Isaac-relative asset paths or absolute URLs.")
+    args = parser.parse_args()
+
+    cache = AssetCache(args.cache_dir)
+    stats = localize(cache, args.asset_root, args.keys, follow_deps=not args.no_deps, refresh=args.refresh)
+    print(json.dumps(stats, indent=2))
+    if stats["failed"]:
+        raise SystemExit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,173 @@
+#!/usr/bin/env python3
+"""
+Class-balanced resampled training lists for multi-asset SDG datasets.
+
+Why this exists:
+- In multi-asset runs some classes are seen far less often than others (small parts, parts
+  that end up occluded), so most training steps go to the easy, frequent classes. Repeating
+  the frames that hold rare (or small) objects rebalances an epoch without rendering more data.
+
+How it works (on the annotation index of dataset_query.py, so it is vectorized and fast):
+1) class weights: inverse annotation frequency over the train frames, w_c = (mean count /
+   count_c) ** --power (1 = inverse frequency, 0.5 = square root).
+2) annotation weights: w_c, optionally times (median area / bbox area) ** --area_power,
+   clipped to [1/--max_area_factor, --max_area_factor], so small objects weigh more.
+3) frame weight: the largest annotation weight in the frame (repeat-factor style);
+   frames without objects get --background_weight.
+4) resampling: frame i appears round(N * --epoch_scale * weight_i / sum(weights)) times
+   (stochastic rounding with --seed, at least --min_repeats times; default 1, so no frame is
+   dropped and the list is somewhat longer than N * --epoch_scale).
+
+Output in OUT_ROOT/subsets/<name>/:
+- train.txt          resampled YOLO image list (repeated lines into images/train, labels resolve as usual),
+- frame_weights.txt  "<image path> <weight>" per train frame, for custom samplers,
+- my_dataset.yaml    train: the list above, val/test unchanged,
+- balance.json       class weights and per-class annotation counts before / after resampling.
+
+Usage:
+  python balanced_sampling.py $OUT_ROOT --name balanced --power 0.5 --area_power 0.5
+  DATA_YAML=$OUT_ROOT/subsets/balanced/my_dataset.yaml ../yolov8/train_yolov8.sh
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import os
+from pathlib import Path
+from typing import Dict
+
+import numpy as np
+
+from dataset_query import SPLITS, load_index, write_dataset_yaml
+
+
+def frame_weights(
+    index: dict,
+    frames: np.ndarray,
+    power: float = 1.0,
+    area_power: float = 0.0,
+    max_area_factor: float = 4.0,
+    background_weight: float = 1.0,
+) -> Dict[str, np.ndarray]:
+    """Class weights (per class) and frame weights (per entry of `frames`), see module docstring."""
+    n_classes = len(index["classes"])
+    pos = np.full(len(index["frame_path"]), -1, dtype=np.int64)
+    pos[frames] = np.arange(len(frames))
+    ann_pos = pos[index["ann_frame"]]
+    ok = (ann_pos >= 0) & (index["ann_cls"] >= 0)
+    cls = index["ann_cls"][ok].astype(np.int64)
+    counts = np.bincount(cls, minlength=n_classes).astype(np.float64)
+
+    class_w = np.zeros(n_classes)
+    present = counts > 0
+    if present.any():
+        class_w[present] = (counts[present].mean() / counts[present]) ** power
+    ann_w = class_w[cls]
+    if area_power:
+        area = (index["ann_w"][ok] * index["ann_h"][ok]).astype(np.float64)
+        ref = np.median(area) if area.size else 1.0
+        factor = (ref / np.maximum(area, 1.0)) ** area_power
+        ann_w = ann_w * np.clip(factor, 1.0 / max_area_factor, max_area_factor)
+
+    weights = np.full(len(frames), np.nan)
+    np.fmax.at(weights, ann_pos[ok], ann_w)
+    weights[np.isnan(weights)] = background_weight
+    return {"class_weights": class_w, "class_counts": counts, "frame_weights": weights, "ann_pos": ann_pos[ok], "ann_cls": cls}
+
+
+def resample(weights: np.ndarray, epoch_scale: float, min_repeats: int, seed: int) -> np.ndarray:
+    """Integer repeats per frame with expected value proportional to `weights`."""
+    total = weights.sum()
+    if total <= 0:
+        return np.full(len(weights), max(1, min_repeats), dtype=np.int64)
+    expected = weights * (len(weights) * epoch_scale / total)
+    rng = np.random.default_rng(seed)
+    repeats = np.floor(expected).astype(np.int64)
+    repeats += rng.random(len(weights)) < (expected - repeats)
+    return np.maximum(repeats, min_repeats)
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser(description="Class-balanced resampled YOLO train list for an SDG output root.")
+    ap.add_argument("out_root", help="SDG output root (OUT_ROOT).")
+    ap.add_argument("--name", default="balanced", help="Output goes to OUT_ROOT/subsets/<name>.")
+    ap.add_argument("--split", default="train", choices=SPLITS, help="Split to resample.")
+    ap.add_argument("--power", type=float, default=1.0, help="Exponent of the inverse class frequency.")
+    ap.add_argument("--area_power", type=float, default=0.0, help="Exponent of (median area / bbox area); 0 = off.")
+    ap.add_argument("--max_area_factor", type=float, default=4.0, help="Clip of the area factor (and its inverse).")
+    ap.add_argument("--background_weight", type=float, default=1.0, help="Weight of frames without objects.")
+    ap.add_argument("--epoch_scale", type=float, default=1.0, help="List length relative to the split's frame count.")
+    ap.add_argument(
+        "--min_repeats", type=int, default=1, help="Keep every frame at least this many times (0 lets frames drop out)."
+    )
+    ap.add_argument("--seed", type=int, default=0, help="Seed of the stochastic rounding.")
+    ap.add_argument("--rebuild_index", action="store_true")
+    ap.add_argument("--dry_run", action="store_true", help="Only print the class statistics.")
+    args = ap.parse_args()
+
+    root = Path(args.out_root).expanduser().resolve()
+    index = load_index(root, rebuild=args.rebuild_index)
+    frames = np.flatnonzero(index["frame_split"] == SPLITS.index(args.split))
+    if not frames.size:
+        raise SystemExit(f"[balance] no {args.split} frames in the index of {root}")
+    w = frame_weights(index, frames, args.power, args.area_power, args.max_area_factor, args.background_weight)
+    repeats = resample(w["frame_weights"], args.epoch_scale, args.min_repeats, args.seed)
+    after = np.bincount(w["ann_cls"], weights=repeats[w["ann_pos"]], minlength=len(index["classes"]))
+
+    names = [str(c) for c in index["classes"]]
+    before = w["class_counts"]
+    print(f"{'class':<24}{'weight':>8}{'objects':>10}{'share %':>9}{'-> objects':>12}{'share %':>9}")
+    for i, name in enumerate(names):
+        print(
+            f"{name[:23]:<24}{w['class_weights'][i]:>8.2f}{int(before[i]):>10}"
+            f"{100.0 * before[i] / max(before.sum(), 1):>9.1f}{int(after[i]):>12}{100.0 * after[i] / max(after.sum(), 1):>9.1f}"
+        )
+    dropped = int((repeats == 0).sum())
+    print(
+        f"[balance] {args.split}: {frames.size} frames -> {int(repeats.sum())} list entries "
+        f"({dropped} frames dropped, max {int(repeats.max())} repeats)"
+    )
+    if dropped:
+        print(f"[balance] Warning: {dropped} {args.split} frame(s) never appear in the list; --min_repeats 1 keeps them")
+    if args.dry_run:
+        return
+
+    out_dir = root / "subsets" / args.name
+    out_dir.mkdir(parents=True, exist_ok=True)
+    # YOLO resolves labels from /images/ -> /labels/, so list the prep script's image links
+    links = [root / "images" / args.split / os.path.basename(p) for p in index["frame_path"][frames]]
+    missing = sum(not link.exists() for link in links)
+    with open(out_dir / f"{args.split}.txt", "w", encoding="utf-8") as f:
+        for link, n in zip(links, repeats):
+            if n and link.exists():
+                f.write(f"{link}\n" * int(n))
+    with open(out_dir / "frame_weights.txt", "w", encoding="utf-8") as f:
+        for link, weight in zip(links, w["frame_weights"]):
+            f.write(f"{link} {weight:.6f}\n")
+    yaml_splits = {
+        s: (os.path.relpath(out_dir / f"{s}.txt", root) if s == args.split else f"images/{s}")
+        for s in SPLITS
+        if s == args.split or (root / "images" / s).is_dir()
+    }
+    write_dataset_yaml(root, out_dir / "my_dataset.yaml", yaml_splits, index)
+    report = {
+        "args": vars(args),
+        "frames": int(frames.size),
+        "list_entries": int(repeats.sum()),
+        "not_in_images_dir": int(missing),
+        "classes": {
+            name: {
+                "weight": round(float(w["class_weights"][i]), 4),
+                "objects_before": int(before[i]),
+                "objects_after": int(after[i]),
+            }
+            for i, name in enumerate(names)
+        },
+    }
+    (out_dir / "balance.json").write_text(json.dumps(report, indent=2))
+    print(f"[balance] wrote {out_dir}; train with DATA_YAML={out_dir / 'my_dataset.yaml'}")
+
+
+if __name__ == "__main__":
+    main()
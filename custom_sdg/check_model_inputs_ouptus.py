@@ -1,4 +1,446 @@
-import onnx, sys
-m = onnx.load(f"{sys.argv[1]}")
-print("Inputs:", [i.name for i in m.graph.input])
-print("Outputs:", [o.name for o in m.graph.output])
\ No newline at end of file
+#!/usr/bin/env python3
+"""
+Inspect and benchmark exported ONNX models (YOLOv8 best.onnx, RT-DETR exports) on CPU.
+
+Why this exists:
+- The models are deployed on CPU edge boxes; the export step only tells us that an .onnx
+  exists, not how fast it runs there.
+
+Modes:
+- default: print the graph input/output names.
+- --bench: onnxruntime CPU benchmark on frames of an SDG split (OUT_ROOT/images/<split>).
+  1) decode (PNG/JPG -> RGB) and preprocess (letterbox/resize to the model input, CHW,
+     /255, optional mean/std) are timed per image, separately from inference;
+  2) for every --threads x --batch combination a fresh session runs --warmup untimed
+     batches, then --iters timed batches cycling over the preprocessed frames;
+  3) the report (JSON) holds p50/p95/p99/mean latency per batch, inference images/sec and an
+     end-to-end images/sec including single-threaded decode + preprocess.
+  Models exported with a static batch dimension only run the matching batch size.
+- --profile: where the model spends its time and compute.
+  1) static: input/output shapes, parameter count, and estimated FLOPs / parameters per node
+     type from ONNX shape inference (symbolic dims set to --profile_batch / --imgsz);
+  2) runtime: onnxruntime's built-in profiler over --profile_runs runs (first run dropped),
+     aggregated per operator type and per node. Timed op types are those of the optimized
+     graph, so fused kernels (e.g. FusedConv) show up under their own name.
+  Sorted tables go to stderr, the JSON report to stdout.
+
+Usage:
+  python check_model_inputs_ouptus.py best.onnx
+  python check_model_inputs_ouptus.py best.onnx --bench --out_root $OUT_ROOT --split val \
+      --batch 1,4,8 --threads 1,2,4 --json bench.json
+  python check_model_inputs_ouptus.py best.onnx --profile --threads 4 --json profile.json
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import platform
+import sys
+import tempfile
+import time
+from collections import defaultdict
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+from sdg_writers import ResolutionVariant
+
+IMAGE_SUFFIXES = (".png", ".jpg", ".jpeg")
+# Mask images that prepare_yolov8_dataset.sh links into images/<split> next to the frames
+MASK_PREFIXES = ("instance_segmentation", "semantic_segmentation")
+# FLOPs per output element for element-wise ops (everything else not listed in node_flops counts 0)
+ELEMENTWISE_FLOPS = {
+    "Add": 1, "Sub": 1, "Mul": 1, "Div": 1, "Relu": 1, "LeakyRelu": 2, "Clip": 1, "Max": 1, "Min": 1,
+    "Sigmoid": 4, "HardSigmoid": 3, "HardSwish": 4, "Tanh": 4, "Exp": 1, "Sqrt": 1, "Pow": 1, "Erf": 4,
+    "Softmax": 5, "BatchNormalization": 2, "LayerNormalization": 8,
+}
+NP_DTYPES = {"tensor(float)": np.float32, "tensor(float16)": np.float16, "tensor(double)": np.float64}
+
+
+def _int_list(value: str) -> List[int]:
+    return [int(v) for v in value.replace(":", ",").split(",") if v.strip()]
+
+
+def latency_stats(ms: List[float]) -> Dict[str, float]:
+    arr = np.asarray(ms, dtype=np.float64)
+    if arr.size == 0:
+        return {}
+    p50, p95, p99 = np.percentile(arr, [50, 95, 99])
+    return {
+        "p50": round(float(p50), 3),
+        "p95": round(float(p95), 3),
+        "p99": round(float(p99), 3),
+        "mean": round(float(arr.mean()), 3),
+        "min": round(float(arr.min()), 3),
+        "max": round(float(arr.max()), 3),
+    }
+
+
+def split_images(images: Optional[str], out_root: str, split: str, max_images: int) -> List[Path]:
+    """Frames to benchmark on: --images (dir or list file) or OUT_ROOT/images/<split>, masks skipped."""
+    src = Path(images or os.path.join(out_root, "images", split)).expanduser()
+    if src.is_file():
+        paths = [Path(line.strip()) for line in src.read_text().splitlines() if line.strip()]
+    elif src.is_dir():
+        paths = sorted(p for p in src.rglob("*") if p.suffix.lower() in IMAGE_SUFFIXES)
+    else:
+        raise SystemExit(f"[bench] image source not found: {src}")
+    paths = [p for p in paths if not p.name.startswith(MASK_PREFIXES)]
+    if not paths:
+        raise SystemExit(f"[bench] no images in {src}")
+    return paths[:max_images] if max_images > 0 else paths
+
+
+def model_input(sess, imgsz: int) -> Tuple[str, object, int, int, type]:
+    """(name, batch dim, height, width, numpy dtype) of the single image input; symbolic H/W use --imgsz."""
+    inputs = sess.get_inputs()
+    if len(inputs) != 1:
+        raise SystemExit(f"[bench] expected one image input, model has {[i.name for i in inputs]}")
+    inp = inputs[0]
+    shape = list(inp.shape) + [None] * (4 - len(inp.shape))
+    h = shape[2] if isinstance(shape[2], int) else imgsz
+    w = shape[3] if isinstance(shape[3], int) else imgsz
+    return inp.name, shape[0], h, w, NP_DTYPES.get(inp.type, np.float32)
+
+
+def load_frames(
+    paths: List[Path], variant: ResolutionVariant, mean, std, dtype
+) -> Tuple[List[np.ndarray], List[float], List[float]]:
+    """Decode and preprocess every frame; returns (CHW tensors, decode ms, preprocess ms)."""
+    from PIL import Image
+
+    tensors, decode_ms, prep_ms = [], [], []
+    for p in paths:
+        t0 = time.perf_counter()
+        with Image.open(p) as im:
+            rgb = np.asarray(im.convert("RGB"))
+        t1 = time.perf_counter()
+        x = variant.apply_image(rgb).astype(np.float32) / 255.0
+        if mean is not None:
+            x = (x - mean) / std
+        tensors.append(np.ascontiguousarray(x.transpose(2, 0, 1), dtype=dtype))
+        t2 = time.perf_counter()
+        decode_ms.append((t1 - t0) * 1000.0)
+        prep_ms.append((t2 - t1) * 1000.0)
+    return tensors, decode_ms, prep_ms
+
+
+def make_session(model: str, threads: int):
+    import onnxruntime as ort
+
+    so = ort.SessionOptions()
+    so.intra_op_num_threads = threads
+    so.inter_op_num_threads = 1
+    so.execution_mode = ort.ExecutionMode.ORT_SEQUENTIAL
+    so.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+    return ort.InferenceSession(model, sess_options=so, providers=["CPUExecutionProvider"])
+
+
+def run_benchmark(
+    model: str,
+    tensors: List[np.ndarray],
+    batches: List[int],
+    threads_list: List[int],
+    warmup: int,
+    iters: int,
+    imgsz: int,
+    cpu_ms_per_image: float,
+    log=print,
+) -> List[dict]:
+    """Timed onnxruntime runs for every threads x batch combination."""
+    runs = []
+    for threads in threads_list:
+        sess = make_session(model, threads)
+        name, batch_dim, _h, _w, _dtype = model_input(sess, imgsz)
+        for batch in batches:
+            if isinstance(batch_dim, int) and batch_dim != batch:
+                log(f"[bench] skip batch {batch}: model has a static batch of {batch_dim}")
+                continue
+            feeds = [
+                np.stack([tensors[(i * batch + j) % len(tensors)] for j in range(batch)])
+                for i in range(max(1, min(len(tensors) // batch, iters)))
+            ]
+            for i in range(warmup):
+                sess.run(None, {name: feeds[i % len(feeds)]})
+            ms = []
+            for i in range(iters):
+                t0 = time.perf_counter()
+                sess.run(None, {name: feeds[i % len(feeds)]})
+                ms.append((time.perf_counter() - t0) * 1000.0)
+            stats = latency_stats(ms)
+            run = {
+                "threads": threads,
+                "batch": batch,
+                "iters": iters,
+                "latency_ms": stats,
+                "images_per_sec": round(batch * 1000.0 / stats["mean"], 2),
+                "end_to_end_images_per_sec": round(batch * 1000.0 / (stats["mean"] + batch * cpu_ms_per_image), 2),
+            }
+            runs.append(run)
+            log(
+                f"[bench] threads={threads} batch={batch}: p50 {stats['p50']:.2f} ms, p95 {stats['p95']:.2f} ms, "
+                f"p99 {stats['p99']:.2f} ms, {run['images_per_sec']:.1f} img/s "
+                f"({run['end_to_end_images_per_sec']:.1f} img/s with decode+preprocess)"
+            )
+    return runs
+
+
+def benchmark(args) -> dict:
+    import onnxruntime as ort
+
+    paths = split_images(args.images, args.out_root, args.split, args.max_images)
+    probe = make_session(args.model, 1)
+    _name, _batch, h, w, dtype = model_input(probe, args.imgsz)
+    del probe
+    mean = np.asarray(args.mean, dtype=np.float32) if args.mean else None
+    std = np.asarray(args.std, dtype=np.float32) if args.std else np.ones(3, dtype=np.float32)
+    tensors, decode_ms, prep_ms = load_frames(paths, ResolutionVariant(w, h, args.resize), mean, std, dtype)
+    log = lambda msg: print(msg, file=sys.stderr)  # stdout carries the JSON report
+    decode, prep = latency_stats(decode_ms), latency_stats(prep_ms)
+    log(f"[bench] {len(paths)} frames: decode p50 {decode['p50']:.2f} ms, preprocess p50 {prep['p50']:.2f} ms")
+    runs = run_benchmark(
+        args.model,
+        tensors,
+        _int_list(args.batch),
+        _int_list(args.threads),
+        args.warmup,
+        args.iters,
+        args.imgsz,
+        decode["mean"] + prep["mean"],
+        log,
+    )
+    return {
+        "model": os.path.abspath(args.model),
+        "model_mb": round(os.path.getsize(args.model) / float(1 << 20), 3),
+        "input": {"height": h, "width": w, "dtype": np.dtype(dtype).name, "resize": args.resize},
+        "images": len(paths),
+        "image_source": str(paths[0].parent),
+        "decode_ms": decode,
+        "preprocess_ms": prep,
+        "runs": runs,
+        "onnxruntime": ort.__version__,
+        "cpu": platform.processor() or platform.machine(),
+        "cpu_count": os.cpu_count(),
+    }
+
+
+# ---------- profiler ----------
+
+
+def _dims(value_info) -> list:
+    return [
+        d.dim_value if d.HasField("dim_value") else (d.dim_param or "?")
+        for d in value_info.type.tensor_type.shape.dim
+    ]
+
+
+def _numel(shape) -> int:
+    return int(np.prod(shape)) if shape and all(isinstance(d, int) and d > 0 for d in shape) else 0
+
+
+def concrete_shapes(model, batch: int, imgsz: int) -> Dict[str, list]:
+    """Tensor name -> shape after shape inference with symbolic input dims set to batch / imgsz."""
+    import onnx
+
+    m = onnx.ModelProto()
+    m.CopyFrom(model)
+    init_names = {t.name for t in m.graph.initializer}
+    for inp in m.graph.input:
+        if inp.name in init_names:
+            continue
+        for i, d in enumerate(inp.type.tensor_type.shape.dim):
+            if not d.HasField("dim_value"):
+                d.dim_value = batch if i == 0 else imgsz
+    m = onnx.shape_inference.infer_shapes(m)
+    shapes = {t.name: list(t.dims) for t in m.graph.initializer}
+    for vi in list(m.graph.input) + list(m.graph.value_info) + list(m.graph.output):
+        shapes[vi.name] = _dims(vi)
+    return shapes
+
+
+def node_flops(node, shapes: Dict[str, list]) -> int:
+    """Estimated FLOPs of one node (multiply-add = 2), 0 when shapes are unknown or the op is data movement."""
+    out = shapes.get(node.output[0]) if node.output else None
+    n_out = _numel(out)
+    if not n_out:
+        return 0
+    op = node.op_type
+    if op in ("Conv", "ConvTranspose") and len(node.input) > 1:
+        w = shapes.get(node.input[1])
+        if not _numel(w):
+            return 0
+        if op == "Conv":
+            return 2 * n_out * int(np.prod(w[1:]))  # w: (Cout, Cin/groups, kh, kw)
+        return 2 * _numel(shapes.get(node.input[0])) * int(np.prod(w[1:]))
+    if op in ("MatMul", "Gemm"):
+        a = shapes.get(node.input[0])
+        if not a:
+            return 0
+        trans_a = any(at.name == "transA" and at.i for at in node.attribute)
+        return 2 * n_out * int(a[-2] if trans_a else a[-1])
+    if op in ("MaxPool", "AveragePool"):
+        kernel = next((list(at.ints) for at in node.attribute if at.name == "kernel_shape"), [1])
+        return n_out * int(np.prod(kernel))
+    if op in ("GlobalAveragePool", "GlobalMaxPool", "ReduceMean", "ReduceSum", "ReduceMax"):
+        return _numel(shapes.get(node.input[0]))
+    return n_out * ELEMENTWISE_FLOPS.get(op, 0)
+
+
+def static_profile(model_path: str, batch: int, imgsz: int) -> dict:
+    """Input/output shapes, parameters and estimated FLOPs per node type."""
+    import onnx
+
+    model = onnx.load(model_path)
+    inits = {t.name: int(np.prod(t.dims)) for t in model.graph.initializer}
+    shapes = concrete_shapes(model, batch, imgsz)
+    by_type = defaultdict(lambda: {"nodes": 0, "params": 0, "flops": 0})
+    nodes = []
+    for node in model.graph.node:
+        params = sum(inits.get(name, 0) for name in node.input)
+        flops = node_flops(node, shapes)
+        entry = by_type[node.op_type]
+        entry["nodes"] += 1
+        entry["params"] += params
+        entry["flops"] += flops
+        nodes.append({"name": node.name or node.output[0], "op": node.op_type, "params": params, "flops": flops})
+    total_flops = sum(e["flops"] for e in by_type.values())
+    return {
+        "inputs": [{"name": i.name, "shape": _dims(i)} for i in model.graph.input if i.name not in inits],
+        "outputs": [{"name": o.name, "shape": shapes.get(o.name) or _dims(o)} for o in model.graph.output],
+        "opset": max((o.version for o in model.opset_import if o.domain in ("", "ai.onnx")), default=None),
+        "params": sum(inits.values()),
+        "gflops": round(total_flops / 1e9, 4),
+        "flops_assumed_input": {"batch": batch, "imgsz": imgsz},
+        "by_op_type": dict(sorted(by_type.items(), key=lambda kv: -kv[1]["flops"])),
+        "top_nodes_by_flops": sorted(nodes, key=lambda n: -n["flops"])[:20],
+    }
+
+
+def runtime_profile(model_path: str, threads: int, runs: int, batch: int, imgsz: int) -> dict:
+    """Per-operator timing from onnxruntime's profiler; the first run is dropped as warm-up."""
+    import onnxruntime as ort
+
+    so = ort.SessionOptions()
+    so.intra_op_num_threads = threads
+    so.inter_op_num_threads = 1
+    so.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+    so.enable_profiling = True
+    with tempfile.TemporaryDirectory() as tmp:
+        so.profile_file_prefix = os.path.join(tmp, "ort_profile")
+        sess = ort.InferenceSession(model_path, sess_options=so, providers=["CPUExecutionProvider"])
+        name, batch_dim, h, w, dtype = model_input(sess, imgsz)
+        feed = np.random.rand(batch_dim if isinstance(batch_dim, int) else batch, 3, h, w).astype(dtype)
+        for _ in range(runs + 1):
+            sess.run(None, {name: feed})
+        events = json.loads(Path(sess.end_profiling()).read_text())
+
+    model_runs = sorted((e for e in events if e.get("name") == "model_run"), key=lambda e: e["ts"])
+    cutoff = model_runs[0]["ts"] + model_runs[0]["dur"] if len(model_runs) > 1 else 0
+    counted = max(1, len(model_runs) - 1)
+    by_op = defaultdict(lambda: {"calls": 0, "us": 0})
+    by_node = defaultdict(lambda: {"op": "", "us": 0})
+    for e in events:
+        if e.get("cat") != "Node" or not e.get("name", "").endswith("_kernel_time") or e["ts"] < cutoff:
+            continue
+        op = e.get("args", {}).get("op_name", "?")
+        node = e["name"][: -len("_kernel_time")]
+        by_op[op]["calls"] += 1
+        by_op[op]["us"] += e["dur"]
+        by_node[node]["op"] = op
+        by_node[node]["us"] += e["dur"]
+    total_us = sum(v["us"] for v in by_op.values()) or 1
+    run_ms = [e["dur"] / 1000.0 for e in model_runs[1:]] or [e["dur"] / 1000.0 for e in model_runs]
+    return {
+        "threads": threads,
+        "runs": counted,
+        "run_ms": latency_stats(run_ms),
+        "by_op_type": {
+            op: {
+                "calls_per_run": v["calls"] / counted,
+                "ms_per_run": round(v["us"] / 1000.0 / counted, 4),
+                "pct": round(100.0 * v["us"] / total_us, 2),
+            }
+            for op, v in sorted(by_op.items(), key=lambda kv: -kv[1]["us"])
+        },
+        "top_nodes": [
+            {"name": n, "op": v["op"], "ms_per_run": round(v["us"] / 1000.0 / counted, 4)}
+            for n, v in sorted(by_node.items(), key=lambda kv: -kv[1]["us"])[:20]
+        ],
+    }
+
+
+def print_profile(static: dict, runtime: dict, out=sys.stderr) -> None:
+    """Sorted human-readable tables of a profile report."""
+    for io in ("inputs", "outputs"):
+        for t in static[io]:
+            print(f"{io[:-1]:<7} {t['name']}: {t['shape']}", file=out)
+    print(f"params {static['params']:,}  |  {static['gflops']:.3f} GFLOPs (estimated)  |  opset {static['opset']}", file=out)
+    print(f"\n{'op type':<24}{'nodes':>7}{'params':>14}{'GFLOPs':>10}{'FLOPs %':>9}", file=out)
+    total = sum(v["flops"] for v in static["by_op_type"].values()) or 1
+    for op, v in static["by_op_type"].items():
+        print(
+            f"{op:<24}{v['nodes']:>7}{v['params']:>14,}{v['flops'] / 1e9:>10.3f}{100.0 * v['flops'] / total:>9.1f}",
+            file=out,
+        )
+    rm = runtime["run_ms"]
+    print(
+        f"\nonnxruntime CPU, {runtime['threads']} thread(s), {runtime['runs']} run(s): "
+        f"p50 {rm['p50']:.2f} ms, mean {rm['mean']:.2f} ms / run", file=out,
+    )
+    print(f"{'op type (optimized graph)':<28}{'calls':>7}{'ms/run':>10}{'time %':>9}", file=out)
+    for op, v in runtime["by_op_type"].items():
+        print(f"{op:<28}{v['calls_per_run']:>7.0f}{v['ms_per_run']:>10.3f}{v['pct']:>9.1f}", file=out)
+    print(f"\n{'slowest nodes':<60}{'op':<16}{'ms/run':>10}", file=out)
+    for n in runtime["top_nodes"][:10]:
+        print(f"{n['name'][:59]:<60}{n['op']:<16}{n['ms_per_run']:>10.3f}", file=out)
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser(description="Inspect, benchmark or profile an exported ONNX model on CPU.")
+    ap.add_argument("model", help="Path to the .onnx file.")
+    ap.add_argument("--bench", action="store_true", help="Run the onnxruntime CPU benchmark.")
+    ap.add_argument("--profile", action="store_true", help="Report shapes, params, FLOPs and per-op CPU timing.")
+    ap.add_argument("--profile_runs", type=int, default=20, help="Profiled runs (after one warm-up run).")
+    ap.add_argument("--profile_batch", type=int, default=1, help="Batch for symbolic batch dims when profiling.")
+    ap.add_argument("--out_root", default=os.path.expanduser("~/synthetic_out"), help="SDG output root.")
+    ap.add_argument("--split", default="val", help="Split whose images/<split> frames are used.")
+    ap.add_argument("--images", default=None, help="Image directory or list file (overrides --out_root/--split).")
+    ap.add_argument("--max_images", type=int, default=256, help="Frames decoded for the benchmark (0 = all).")
+    ap.add_argument("--batch", default="1", help="Comma-separated batch sizes.")
+    ap.add_argument("--threads", default=str(os.cpu_count() or 1), help="Comma-separated intra-op thread counts.")
+    ap.add_argument("--warmup", type=int, default=10, help="Untimed runs per configuration.")
+    ap.add_argument("--iters", type=int, default=100, help="Timed runs per configuration.")
+    ap.add_argument("--imgsz", type=int, default=640, help="Input size for models with symbolic H/W.")
+    ap.add_argument("--resize", choices=ResolutionVariant.MODES, default="letterbox", help="Frame -> input mapping.")
+    ap.add_argument("--mean", type=float, nargs=3, default=None, help="Per-channel mean after /255 (e.g. RT-DETR).")
+    ap.add_argument("--std", type=float, nargs=3, default=None, help="Per-channel std after /255.")
+    ap.add_argument("--json", default=None, help="Also write the report to this file.")
+    args = ap.parse_args()
+
+    if not (args.bench or args.profile):
+        import onnx
+
+        m = onnx.load(args.model)
+        print("Inputs:", [i.name for i in m.graph.input])
+        print("Outputs:", [o.name for o in m.graph.output])
+        return
+
+    report = benchmark(args) if args.bench else {"model": os.path.abspath(args.model)}
+    if args.profile:
+        static = static_profile(args.model, args.profile_batch, args.imgsz)
+        runtime = runtime_profile(
+            args.model, _int_list(args.threads)[0], args.profile_runs, args.profile_batch, args.imgsz
+        )
+        print_profile(static, runtime)
+        report["profile"] = {"static": static, "runtime": runtime}
+    text = json.dumps(report, indent=2)
+    print(text)
+    if args.json:
+        Path(args.json).write_text(text + "\n")
+
+
+if __name__ == "__main__":
+    main()
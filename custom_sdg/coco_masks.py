@@ -0,0 +1,207 @@
+"""
+NumPy helpers for per-instance masks in SDG COCO output (no Kit, no pycocotools).
+
+Masks come from either:
+- the COCO annotation "segmentation" field (RLE with list or compressed-string counts,
+  or polygons), or
+- Replicator instance segmentation images (instance_segmentation_XXXX.png next to
+  rgb_XXXX.png), matched to annotations by their tight bbox.
+
+RLE follows the COCO convention: column-major run lengths, starting with a run of zeros.
+Encoding and decoding match pycocotools (including the compressed string form).
+"""
+
+from __future__ import annotations
+
+import json
+import re
+from pathlib import Path
+from typing import List, Optional, Sequence
+
+import numpy as np
+
+# Instance segmentation mapping labels that are not objects.
+NON_OBJECT_LABELS = {"BACKGROUND", "UNLABELLED"}
+
+
+def rle_string_to_counts(s: str) -> List[int]:
+    """Decode COCO's compressed RLE string (LEB128-like, deltas after the 2nd count)."""
+    counts: List[int] = []
+    data = s.encode("ascii") if isinstance(s, str) else bytes(s)
+    p = 0
+    while p < len(data):
+        x = 0
+        k = 0
+        more = True
+        while more:
+            c = data[p] - 48
+            x |= (c & 0x1F) << (5 * k)
+            more = bool(c & 0x20)
+            p += 1
+            k += 1
+            if not more and (c & 0x10):
+                x |= -1 << (5 * k)
+        if len(counts) > 2:
+            x += counts[-2]
+        counts.append(x)
+    return counts
+
+
+def rle_counts_to_string(counts: Sequence[int]) -> str:
+    """Inverse of rle_string_to_counts (pycocotools' rleToString)."""
+    out = bytearray()
+    for i, count in enumerate(counts):
+        x = int(count) - (int(counts[i - 2]) if i > 2 else 0)
+        more = True
+        while more:
+            c = x & 0x1F
+            x >>= 5
+            more = x != -1 if c & 0x10 else x != 0
+            if more:
+                c |= 0x20
+            out.append(c + 48)
+    return out.decode("ascii")
+
+
+def rle_encode(mask: np.ndarray, compressed: bool = True) -> dict:
+    """HxW bool mask -> COCO RLE dict (column-major runs, first run counts zeros)."""
+    h, w = mask.shape
+    flat = np.asarray(mask, dtype=bool).T.ravel()
+    if flat.size == 0:
+        counts: List[int] = [0]
+    else:
+        edges = np.flatnonzero(flat[1:] != flat[:-1]) + 1
+        bounds = np.concatenate(([0], edges, [flat.size]))
+        counts = np.diff(bounds).tolist()
+        if flat[0]:
+            counts.insert(0, 0)
+    return {"size": [int(h), int(w)], "counts": rle_counts_to_string(counts) if compressed else counts}
+
+
+def rle_area(rle: dict) -> int:
+    counts = rle["counts"]
+    if isinstance(counts, (str, bytes)):
+        counts = rle_string_to_counts(counts)
+    return int(sum(counts[1::2]))
+
+
+def rle_decode(rle: dict) -> np.ndarray:
+    """COCO RLE dict {"size": [h, w], "counts": list|str} -> HxW bool mask."""
+    h, w = (int(v) for v in rle["size"])
+    counts = rle["counts"]
+    if isinstance(counts, (str, bytes)):
+        counts = rle_string_to_counts(counts)
+    counts = np.asarray(counts, dtype=np.int64)
+    values = (np.arange(len(counts)) % 2).astype(bool)
+    flat = np.repeat(values, counts)
+    if flat.size != h * w:
+        raise ValueError(f"RLE covers {flat.size} pixels, expected {h * w}")
+    return flat.reshape((w, h)).T
+
+
+def polygons_to_mask(polygons: Sequence[Sequence[float]], height: int, width: int) -> np.ndarray:
+    from PIL import Image, ImageDraw
+
+    canvas = Image.new("L", (width, height), 0)
+    draw = ImageDraw.Draw(canvas)
+    for poly in polygons:
+        if len(poly) >= 6:
+            draw.polygon([(float(poly[i]), float(poly[i + 1])) for i in range(0, len(poly) - 1, 2)], fill=1)
+    return np.asarray(canvas, dtype=bool)
+
+
+def annotation_mask(ann: dict, height: int, width: int) -> Optional[np.ndarray]:
+    """Mask from an annotation's "segmentation" field, or None when it has none."""
+    seg = ann.get("segmentation")
+    if not seg:
+        return None
+    if isinstance(seg, dict):
+        return rle_decode(seg)
+    if isinstance(seg, list) and seg and isinstance(seg[0], (list, tuple)):
+        return polygons_to_mask(seg, height, width)
+    return None
+
+
+def mask_bbox(mask: np.ndarray) -> Optional[List[float]]:
+    """Tight COCO [x, y, w, h] of a bool mask, or None when empty."""
+    rows = np.flatnonzero(mask.any(axis=1))
+    if rows.size == 0:
+        return None
+    cols = np.flatnonzero(mask.any(axis=0))
+    return [float(cols[0]), float(rows[0]), float(cols[-1] - cols[0] + 1), float(rows[-1] - rows[0] + 1)]
+
+
+def bbox_iou(a: Sequence[float], b: Sequence[float]) -> float:
+    ax1, ay1 = a[0] + a[2], a[1] + a[3]
+    bx1, by1 = b[0] + b[2], b[1] + b[3]
+    iw = max(0.0, min(ax1, bx1) - max(a[0], b[0]))
+    ih = max(0.0, min(ay1, by1) - max(a[1], b[1]))
+    inter = iw * ih
+    union = a[2] * a[3] + b[2] * b[3] - inter
+    return inter / union if union > 0 else 0.0
+
+
+def find_source_json(split_dir: Path) -> Path:
+    """Newest Replicator coco_*.json of a split/run directory (the TAO coco_annotations.json is skipped)."""
+    cands = [p for p in Path(split_dir).glob("coco_*.json") if p.name != "coco_annotations.json"]
+    if not cands:
+        raise FileNotFoundError(f"No COCO json found in {split_dir}")
+    return max(cands, key=lambda p: p.stat().st_mtime)
+
+
+def instance_png_for(image_path: Path) -> Optional[Path]:
+    """Replicator names masks after the frame index: rgb_0007.png -> instance_segmentation_0007.png."""
+    m = re.search(r"(\d+)$", image_path.stem)
+    if not m:
+        return None
+    candidate = image_path.parent / f"instance_segmentation_{m.group(1)}.png"
+    return candidate if candidate.is_file() else None
+
+
+class InstanceMap:
+    """Instance segmentation image decoded to one integer id per pixel."""
+
+    def __init__(self, png_path: Path):
+        from PIL import Image
+
+        arr = np.asarray(Image.open(png_path))
+        self._channels = 1
+        if arr.ndim == 2:
+            ids = arr.astype(np.uint32)
+        else:
+            arr = np.ascontiguousarray(arr[..., :4] if arr.shape[-1] >= 4 else arr[..., :3])
+            ids = np.zeros(arr.shape[:2], dtype=np.uint32)
+            for ch in range(arr.shape[-1]):
+                ids |= arr[..., ch].astype(np.uint32) << (8 * ch)
+            self._channels = arr.shape[-1]
+        self.ids = ids
+        self.excluded = {0}
+        mapping = png_path.with_name(png_path.name.replace("instance_segmentation_", "instance_segmentation_mapping_"))
+        mapping = mapping.with_suffix(".json")
+        if arr.ndim == 3 and mapping.is_file():
+            for color, label in json.loads(mapping.read_text()).items():
+                if str(label).upper() in NON_OBJECT_LABELS:
+                    self.excluded.add(self._color_id(color))
+
+    def _color_id(self, color: str) -> int:
+        vals = [int(v) for v in re.findall(r"\d+", color)][: self._channels]
+        return sum(v << (8 * i) for i, v in enumerate(vals))
+
+    def mask_for_bbox(self, bbox: Sequence[float], min_iou: float = 0.5) -> Optional[np.ndarray]:
+        """Mask of the dominant instance inside `bbox`, if its tight bbox matches (IoU >= min_iou)."""
+        x, y, w, h = bbox
+        x0, y0 = max(0, int(np.floor(x))), max(0, int(np.floor(y)))
+        x1, y1 = int(np.ceil(x + w)), int(np.ceil(y + h))
+        window = self.ids[y0:y1, x0:x1]
+        if window.size == 0:
+            return None
+        vals, counts = np.unique(window, return_counts=True)
+        keep = ~np.isin(vals, list(self.excluded))
+        if not keep.any():
+            return None
+        inst = vals[keep][np.argmax(counts[keep])]
+        mask = self.ids == inst
+        tight = mask_bbox(mask)
+        if tight is None or bbox_iou(tight, bbox) < min_iou:
+            return None
+        return mask
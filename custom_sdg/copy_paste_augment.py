@@ -0,0 +1,341 @@
+#!/usr/bin/env python3
+"""
+Offline copy-paste augmentation for an SDG split, driven by the instance masks SDG writes.
+
+Why this exists:
+- Rendering dominates the cost of the pipeline. The instance masks written with
+  `--output_profile segmentation|full` make it cheap to multiply the data: masked object
+  crops are pasted onto other rendered frames, with annotations derived from the masks.
+
+What it does:
+1) Builds a crop bank (<split>/copy_paste_bank/) of RGBA object crops. Masks come from the
+   COCO "segmentation" field when present, otherwise from Replicator's
+   instance_segmentation_XXXX.png next to each rgb_XXXX.png (matched by tight bbox).
+   bank.json records the source json (path, mtime) and crop settings; the bank is reused
+   only while they match, so a rewritten source json (e.g. after a merge) rebuilds it.
+2) Composes `--multiplier` x (number of source images) new images on a process pool:
+   random background frame, 1..N random crops at random scale/position.
+   - pasted objects get tight bboxes from their still-visible mask pixels,
+   - background annotations covered more than `--max_occlusion` by pastes are dropped.
+3) Writes images to <split>/Replicator/copy_paste/cp_XXXXXX.png and rewrites the split's
+   COCO json with original + synthetic entries. The original json is kept as
+   <name>.pre_copypaste and is used as the source on re-runs, so re-running replaces the
+   previous synthetic set instead of stacking on it.
+
+Usage:
+  python copy_paste_augment.py --data_dir $OUT_ROOT/train --multiplier 1.0 --workers 8
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import random
+import shutil
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from typing import Dict, List, Tuple
+
+import numpy as np
+
+from coco_masks import InstanceMap, annotation_mask, find_source_json, instance_png_for, mask_bbox
+
+BANK_DIRNAME = "copy_paste_bank"
+OUTPUT_SUBDIR = "Replicator/copy_paste"
+BACKUP_SUFFIX = ".pre_copypaste"
+
+
+def _parse_range(value: str, cast=float) -> Tuple:
+    parts = [p for p in value.replace(" ", "").replace(":", ",").split(",") if p]
+    if len(parts) == 1:
+        return cast(parts[0]), cast(parts[0])
+    if len(parts) == 2:
+        lo, hi = cast(parts[0]), cast(parts[1])
+        return min(lo, hi), max(lo, hi)
+    raise argparse.ArgumentTypeError(f"Expected 'v' or 'min,max', got '{value}'")
+
+
+# ---------- crop bank ----------
+
+
+def _bank_crops_for_image(task: Tuple[str, dict, List[dict], str, int, bool]) -> List[dict]:
+    """Cut RGBA crops for every usable annotation of one image (runs in a worker process)."""
+    from PIL import Image
+
+    image_path, image, anns, crops_dir, min_crop_px, skip_truncated = task
+    path = Path(image_path)
+    if not path.is_file():
+        return []
+    rgb = np.asarray(Image.open(path).convert("RGB"))
+    height, width = rgb.shape[:2]
+    instance_map = None
+    entries = []
+    for ann in anns:
+        x, y, w, h = ann["bbox"]
+        if w < min_crop_px or h < min_crop_px:
+            continue
+        if skip_truncated and (x <= 0 or y <= 0 or x + w >= width or y + h >= height):
+            continue
+        mask = annotation_mask(ann, height, width)
+        if mask is None:
+            if instance_map is None:
+                png = instance_png_for(path)
+                if png is None:
+                    return entries
+                instance_map = InstanceMap(png)
+            mask = instance_map.mask_for_bbox(ann["bbox"])
+        if mask is None:
+            continue
+        tight = mask_bbox(mask)
+        if tight is None:
+            continue
+        cx, cy, cw, ch = (int(v) for v in tight)
+        alpha = mask[cy : cy + ch, cx : cx + cw]
+        if int(alpha.sum()) < min_crop_px * min_crop_px // 4:
+            continue
+        rgba = np.dstack([rgb[cy : cy + ch, cx : cx + cw], alpha.astype(np.uint8) * 255])
+        out = Path(crops_dir) / str(ann["category_id"]) / f"{path.stem}_{ann['id']}.png"
+        out.parent.mkdir(parents=True, exist_ok=True)
+        Image.fromarray(rgba, "RGBA").save(out, compress_level=1)
+        entries.append(
+            {
+                "path": str(out),
+                "category_id": int(ann["category_id"]),
+                "width": cw,
+                "height": ch,
+                "pixels": int(alpha.sum()),
+                "source_image": image["file_name"],
+            }
+        )
+    return entries
+
+
+def _bank_key(source: Path, min_crop_px: int, skip_truncated: bool) -> dict:
+    """What a crop bank was built from; a bank whose key differs is rebuilt."""
+    return {
+        "path": str(source),
+        "mtime_ns": source.stat().st_mtime_ns,
+        "min_crop_px": min_crop_px,
+        "skip_truncated": skip_truncated,
+    }
+
+
+def build_crop_bank(
+    coco: dict,
+    split_dir: Path,
+    bank_dir: Path,
+    workers: int,
+    min_crop_px: int,
+    skip_truncated: bool,
+    source_key: dict,
+) -> List[dict]:
+    crops_dir = bank_dir / "crops"
+    if crops_dir.exists():
+        shutil.rmtree(crops_dir)
+    by_img: Dict[int, List[dict]] = {}
+    for a in coco["annotations"]:
+        if not a.get("iscrowd", 0):
+            by_img.setdefault(a["image_id"], []).append(a)
+    tasks = [
+        (str(split_dir / im["file_name"]), im, by_img[im["id"]], str(crops_dir), min_crop_px, skip_truncated)
+        for im in coco["images"]
+        if im["id"] in by_img
+    ]
+    bank: List[dict] = []
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        for entries in pool.map(_bank_crops_for_image, tasks, chunksize=8):
+            bank.extend(entries)
+    (bank_dir / "bank.json").write_text(json.dumps({"source": source_key, "crops": bank}, indent=2))
+    return bank
+
+
+# ---------- composition ----------
+
+
+def _compose(task: dict) -> Tuple[dict, List[dict]]:
+    """Paste the planned crops onto one background; returns (image, annotations) without ids."""
+    from PIL import Image
+
+    rng = random.Random(task["seed"])
+    bg = np.array(Image.open(task["background"]).convert("RGB"))
+    height, width = bg.shape[:2]
+    # 0 = background pixel, k = pixel owned by the k-th pasted crop
+    owner = np.zeros((height, width), dtype=np.int32)
+    pasted = []
+    for k, crop in enumerate(task["crops"], start=1):
+        rgba = Image.open(crop["path"])
+        scale = rng.uniform(*task["scale"])
+        scale = min(scale, width / rgba.width, height / rgba.height)
+        cw, ch = max(1, int(round(rgba.width * scale))), max(1, int(round(rgba.height * scale)))
+        rgba = np.asarray(rgba.resize((cw, ch), Image.BILINEAR))
+        x0 = rng.randint(0, width - cw)
+        y0 = rng.randint(0, height - ch)
+        alpha = rgba[..., 3:4].astype(np.float32) / 255.0
+        region = bg[y0 : y0 + ch, x0 : x0 + cw].astype(np.float32)
+        bg[y0 : y0 + ch, x0 : x0 + cw] = (rgba[..., :3] * alpha + region * (1.0 - alpha)).astype(np.uint8)
+        solid = alpha[..., 0] >= 0.5
+        owner[y0 : y0 + ch, x0 : x0 + cw][solid] = k
+        pasted.append((crop["category_id"], int(solid.sum())))
+
+    anns = []
+    for a in task["background_anns"]:
+        x, y, w, h = (int(round(v)) for v in a["bbox"])
+        box = owner[max(0, y) : y + h, max(0, x) : x + w]
+        covered = float((box > 0).mean()) if box.size else 1.0
+        if covered <= task["max_occlusion"]:
+            anns.append({k: v for k, v in a.items() if k not in ("id", "image_id", "segmentation")})
+    for k, (category_id, full_pixels) in enumerate(pasted, start=1):
+        visible = owner == k
+        n_visible = int(visible.sum())
+        if full_pixels == 0 or n_visible < (1.0 - task["max_occlusion"]) * full_pixels:
+            continue
+        bbox = mask_bbox(visible)
+        anns.append(
+            {
+                "category_id": category_id,
+                "bbox": bbox,
+                "area": float(n_visible),
+                "iscrowd": 0,
+                "occlusion": round(1.0 - n_visible / full_pixels, 4),
+            }
+        )
+
+    out = Path(task["out_path"])
+    out.parent.mkdir(parents=True, exist_ok=True)
+    Image.fromarray(bg).save(out, compress_level=1)
+    image = {"file_name": task["file_name"], "width": width, "height": height}
+    return image, anns
+
+
+def plan_compositions(
+    coco: dict,
+    split_dir: Path,
+    bank: List[dict],
+    n_out: int,
+    objects: Tuple[int, int],
+    scale: Tuple[float, float],
+    max_occlusion: float,
+    class_balanced: bool,
+    seed: int,
+) -> List[dict]:
+    """All random choices are made here from `seed`, so results do not depend on worker scheduling."""
+    rng = random.Random(seed)
+    by_img: Dict[int, List[dict]] = {}
+    for a in coco["annotations"]:
+        by_img.setdefault(a["image_id"], []).append(a)
+    by_cat: Dict[int, List[dict]] = {}
+    for crop in bank:
+        by_cat.setdefault(crop["category_id"], []).append(crop)
+    cats = sorted(by_cat)
+    tasks = []
+    for i in range(n_out):
+        bg = rng.choice(coco["images"])
+        n_obj = rng.randint(*objects)
+        if class_balanced:
+            crops = [rng.choice(by_cat[rng.choice(cats)]) for _ in range(n_obj)]
+        else:
+            crops = [rng.choice(bank) for _ in range(n_obj)]
+        file_name = f"{OUTPUT_SUBDIR}/cp_{i:06d}.png"
+        tasks.append(
+            {
+                "seed": rng.getrandbits(32),
+                "background": str(split_dir / bg["file_name"]),
+                "background_anns": by_img.get(bg["id"], []),
+                "crops": crops,
+                "scale": scale,
+                "max_occlusion": max_occlusion,
+                "file_name": file_name,
+                "out_path": str(split_dir / file_name),
+            }
+        )
+    return tasks
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser(description="Copy-paste augmentation for an SDG split using instance masks.")
+    ap.add_argument("--data_dir", required=True, help="SDG split directory (e.g. $OUT_ROOT/train).")
+    ap.add_argument("--coco", default=None, help="Source COCO json (default: newest coco_*.json in --data_dir).")
+    ap.add_argument("--multiplier", type=float, default=1.0, help="Synthetic images per source image.")
+    ap.add_argument("--objects", type=str, default="1,3", help="Pasted objects per image: 'k' or 'min,max'.")
+    ap.add_argument("--scale", type=str, default="0.7,1.3", help="Crop scale factor range: 's' or 'min,max'.")
+    ap.add_argument("--max_occlusion", type=float, default=0.7, help="Drop objects covered more than this fraction.")
+    ap.add_argument("--min_crop_px", type=int, default=16, help="Minimum crop width/height in pixels.")
+    ap.add_argument(
+        "--keep_truncated", action="store_true", help="Also bank objects touching the image border (likely cut off)."
+    )
+    ap.add_argument("--class_balanced", action="store_true", help="Pick the class uniformly before picking a crop.")
+    ap.add_argument("--rebuild_bank", action="store_true", help="Rebuild the crop bank even if one exists.")
+    ap.add_argument("--workers", type=int, default=os.cpu_count() or 4, help="Worker processes.")
+    ap.add_argument("--seed", type=int, default=0)
+    args = ap.parse_args()
+
+    split_dir = Path(args.data_dir).expanduser().resolve()
+    src = Path(args.coco).expanduser().resolve() if args.coco else find_source_json(split_dir)
+    backup = src.with_name(src.name + BACKUP_SUFFIX)
+    if not backup.exists():
+        shutil.copy2(src, backup)
+    coco = json.loads(backup.read_text())
+    print(f"[copy_paste] source: {src} ({len(coco['images'])} images, {len(coco['annotations'])} annotations)")
+
+    bank_dir = split_dir / BANK_DIRNAME
+    bank_index = bank_dir / "bank.json"
+    key = _bank_key(backup, args.min_crop_px, not args.keep_truncated)
+    cached = json.loads(bank_index.read_text()) if bank_index.is_file() and not args.rebuild_bank else {}
+    if cached.get("source") == key:
+        bank = cached["crops"]
+    else:
+        if cached:
+            print("[copy_paste] crop bank was built from another source json or settings; rebuilding")
+        bank = build_crop_bank(
+            coco, split_dir, bank_dir, args.workers, args.min_crop_px, not args.keep_truncated, key
+        )
+    print(f"[copy_paste] crop bank: {len(bank)} crops in {bank_dir}")
+    if not bank:
+        raise SystemExit(
+            "[copy_paste] No crops: the split needs instance masks (generate with --output_profile segmentation or "
+            "full) or COCO 'segmentation' fields."
+        )
+
+    out_dir = split_dir / OUTPUT_SUBDIR
+    if out_dir.exists():
+        shutil.rmtree(out_dir)
+    n_out = int(round(args.multiplier * len(coco["images"])))
+    tasks = plan_compositions(
+        coco,
+        split_dir,
+        bank,
+        n_out,
+        _parse_range(args.objects, int),
+        _parse_range(args.scale, float),
+        args.max_occlusion,
+        args.class_balanced,
+        args.seed,
+    )
+
+    next_img = max((im["id"] for im in coco["images"]), default=-1) + 1
+    next_ann = max((a["id"] for a in coco["annotations"]), default=-1) + 1
+    images, annotations = list(coco["images"]), list(coco["annotations"])
+    with ProcessPoolExecutor(max_workers=args.workers) as pool:
+        for image, anns in pool.map(_compose, tasks, chunksize=4):
+            image["id"] = next_img
+            images.append(image)
+            for a in anns:
+                a["id"] = next_ann
+                a["image_id"] = next_img
+                annotations.append(a)
+                next_ann += 1
+            next_img += 1
+
+    out = dict(coco, images=images, annotations=annotations)
+    tmp = src.with_name(src.name + ".tmp")
+    tmp.write_text(json.dumps(out))
+    os.replace(tmp, src)
+    print(
+        f"[copy_paste] wrote {n_out} images ({len(annotations) - len(coco['annotations'])} annotations) to {out_dir}; "
+        f"updated {src.name} (original kept as {backup.name})"
+    )
+
+
+if __name__ == "__main__":
+    main()
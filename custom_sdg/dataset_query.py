@@ -0,0 +1,341 @@
+#!/usr/bin/env python3
+"""
+Zero-copy subset queries over the SDG annotations of an output root.
+
+Why this exists:
+- Training on a subset ("frames with >= 2 objects of class X larger than 32px", "only the
+  no-distractor pass") used to mean copying images into a new dataset.
+
+How it works:
+1) index: every run directory under OUT_ROOT that holds a coco_*.json (train/val/test, the
+   three-pass runs, ...) is flattened into NumPy arrays saved as OUT_ROOT/annotation_index.npz:
+   one row per frame (run, split, image source dir, image path, size) and one per annotation
+   (frame, class, bbox w/h). The index is rebuilt when a COCO json changes.
+2) query: vectorized filters over those arrays pick the matching frames, then writes
+   - <split>.txt        YOLO image lists (paths into OUT_ROOT/images/<split>, labels resolve as usual),
+   - coco_<split>.json  subset COCO whose file_name points at the original images,
+   - my_dataset.yaml    YOLO dataset file using the lists (unfiltered splits keep images/<split>).
+   Nothing is copied.
+
+Usage:
+  python dataset_query.py $OUT_ROOT --name x_2big --class X --min_count 2 --min_px 32
+  python dataset_query.py $OUT_ROOT --name nodist --run no_distractors --filter_splits ""
+  python dataset_query.py $OUT_ROOT --dry_run --class X --max_count 0    # frames without X
+"""
+
+from __future__ import annotations
+
+import argparse
+import fnmatch
+import json
+import os
+import time
+from pathlib import Path
+from typing import Dict, List, Optional
+
+import numpy as np
+
+from coco_masks import find_source_json
+
+INDEX_NAME = "annotation_index.npz"
+SPLITS = ("train", "val", "test")
+SKIP_DIRS = {"images", "labels", "subsets", "copy_paste_bank", "Replicator"}
+
+
+def _read_lines(path: Path) -> List[str]:
+    if not path.exists():
+        return []
+    return [line.strip() for line in path.read_text().splitlines() if line.strip()]
+
+
+def find_run_jsons(root: Path, max_depth: int = 2) -> Dict[str, Path]:
+    """Run directory (relative to root) -> newest source coco_*.json in it."""
+    runs: Dict[str, Path] = {}
+    for dirpath, dirnames, _files in os.walk(root):
+        rel = os.path.relpath(dirpath, root)
+        depth = 0 if rel == "." else rel.count(os.sep) + 1
+        dirnames[:] = [d for d in dirnames if d not in SKIP_DIRS and not d.startswith(".")] if depth < max_depth else []
+        if rel == ".":
+            continue
+        try:
+            runs[rel] = find_source_json(Path(dirpath))
+        except FileNotFoundError:
+            pass
+    return dict(sorted(runs.items()))
+
+
+def build_index(root: Path) -> dict:
+    """Flatten all run COCO jsons under `root` into frame / annotation arrays."""
+    runs = find_run_jsons(root)
+    class_names = _read_lines(root / "classes_unique.txt")
+    class_idx = {name: i for i, name in enumerate(class_names)}
+    sources: List[str] = []
+    frames = {k: [] for k in ("run", "split", "source", "width", "height", "path")}
+    anns = {k: [] for k in ("frame", "cls", "w", "h")}
+    for run_id, (run, js) in enumerate(runs.items()):
+        coco = json.loads(js.read_text())
+        cat_cls = {}
+        for cat in coco.get("categories", []):
+            name = str(cat.get("name", f"class_{cat['id']}"))
+            if name not in class_idx:
+                class_idx[name] = len(class_names)
+                class_names.append(name)
+            cat_cls[cat["id"]] = class_idx[name]
+        top = run.split(os.sep)[0]
+        split_id = SPLITS.index(top) if top in SPLITS else -1
+        frame_of = {}
+        for im in coco.get("images", []):
+            source = os.path.dirname(im["file_name"])
+            if source not in sources:
+                sources.append(source)
+            frame_of[im["id"]] = len(frames["path"])
+            frames["run"].append(run_id)
+            frames["split"].append(split_id)
+            frames["source"].append(sources.index(source))
+            frames["width"].append(im.get("width", 0))
+            frames["height"].append(im.get("height", 0))
+            frames["path"].append(str(js.parent / im["file_name"]))
+        for a in coco.get("annotations", []):
+            if a["image_id"] not in frame_of or a.get("iscrowd", 0):
+                continue
+            anns["frame"].append(frame_of[a["image_id"]])
+            anns["cls"].append(cat_cls.get(a["category_id"], -1))
+            anns["w"].append(a["bbox"][2])
+            anns["h"].append(a["bbox"][3])
+    return {
+        "frame_run": np.asarray(frames["run"], dtype=np.int16),
+        "frame_split": np.asarray(frames["split"], dtype=np.int8),
+        "frame_source": np.asarray(frames["source"], dtype=np.int16),
+        "frame_width": np.asarray(frames["width"], dtype=np.int32),
+        "frame_height": np.asarray(frames["height"], dtype=np.int32),
+        "frame_path": np.asarray(frames["path"], dtype=str),
+        "ann_frame": np.asarray(anns["frame"], dtype=np.int32),
+        "ann_cls": np.asarray(anns["cls"], dtype=np.int16),
+        "ann_w": np.asarray(anns["w"], dtype=np.float32),
+        "ann_h": np.asarray(anns["h"], dtype=np.float32),
+        "runs": np.asarray(list(runs), dtype=str),
+        "run_jsons": np.asarray([str(p) for p in runs.values()], dtype=str),
+        "run_stats": _json_stats(runs.values()),
+        "sources": np.asarray(sources, dtype=str),
+        "classes": np.asarray(class_names, dtype=str),
+    }
+
+
+def _json_stats(paths) -> np.ndarray:
+    """(n, 2) int64 [st_mtime_ns, st_size] per json; compared exactly to detect in-place rewrites."""
+    stats = [(st.st_mtime_ns, st.st_size) for st in (Path(p).stat() for p in paths)]
+    return np.asarray(stats, dtype=np.int64).reshape(-1, 2)
+
+
+def load_index(root: Path, rebuild: bool = False) -> dict:
+    """Load OUT_ROOT/annotation_index.npz, rebuilding it when a run json was added or changed."""
+    path = root / INDEX_NAME
+    if path.is_file() and not rebuild:
+        with np.load(path) as data:
+            index = {k: data[k] for k in data.files}
+        current = find_run_jsons(root)
+        same_runs = list(current.values()) == [Path(p) for p in index["run_jsons"]]
+        if same_runs and "run_stats" in index and np.array_equal(_json_stats(current.values()), index["run_stats"]):
+            return index
+    t0 = time.time()
+    index = build_index(root)
+    tmp = path.with_name(path.stem + ".tmp.npz")
+    np.savez(tmp, **index)
+    os.replace(tmp, path)
+    print(
+        f"[query] indexed {len(index['frame_path'])} frames / {len(index['ann_frame'])} annotations "
+        f"from {len(index['runs'])} run(s) in {time.time() - t0:.1f}s -> {path}"
+    )
+    return index
+
+
+def select_frames(
+    index: dict,
+    classes: Optional[List[str]] = None,
+    min_px: float = 0.0,
+    max_px: float = 0.0,
+    min_area: float = 0.0,
+    min_count: Optional[int] = None,
+    max_count: Optional[int] = None,
+    runs: Optional[List[str]] = None,
+    sources: Optional[List[str]] = None,
+) -> np.ndarray:
+    """
+    Bool mask over frames. An annotation matches when its class is in `classes` (all classes
+    when empty) and its bbox passes the size filters (min/max px apply to the shorter side).
+    A frame matches when its number of matching annotations is within [min_count, max_count]
+    (default min_count: 1 when a class/size filter is given without max_count, else 0) and
+    its run / image source match the given names or globs.
+    """
+    n_frames = len(index["frame_path"])
+    ann_ok = np.ones(len(index["ann_frame"]), dtype=bool)
+    if classes:
+        names = list(index["classes"])
+        unknown = [c for c in classes if c not in names]
+        if unknown:
+            raise ValueError(f"Unknown class(es): {', '.join(unknown)} (index has: {', '.join(names)})")
+        ann_ok &= np.isin(index["ann_cls"], [names.index(c) for c in classes])
+    short = np.minimum(index["ann_w"], index["ann_h"])
+    if min_px:
+        ann_ok &= short >= min_px
+    if max_px:
+        ann_ok &= short <= max_px
+    if min_area:
+        ann_ok &= index["ann_w"] * index["ann_h"] >= min_area
+    counts = np.bincount(index["ann_frame"][ann_ok], minlength=n_frames)
+
+    if min_count is None:
+        min_count = 1 if (classes or min_px or max_px or min_area) and max_count is None else 0
+    keep = counts >= min_count
+    if max_count is not None:
+        keep &= counts <= max_count
+    if runs:
+        run_ids = [i for i, r in enumerate(index["runs"]) if any(fnmatch.fnmatch(r, p) for p in runs)]
+        keep &= np.isin(index["frame_run"], run_ids)
+    if sources:
+        src_ids = [i for i, s in enumerate(index["sources"]) if any(fnmatch.fnmatch(s, p) for p in sources)]
+        keep &= np.isin(index["frame_source"], src_ids)
+    return keep
+
+
+def write_subset(root: Path, out_dir: Path, index: dict, keep: np.ndarray, filter_splits: List[str]) -> dict:
+    """Write YOLO lists, subset COCO files and my_dataset.yaml for the selected frames."""
+    out_dir.mkdir(parents=True, exist_ok=True)
+    summary = {}
+    yaml_splits = {}
+    for split_id, split in enumerate(SPLITS):
+        if split not in filter_splits:
+            if (root / "images" / split).is_dir():
+                yaml_splits[split] = f"images/{split}"
+            continue
+        sel = np.flatnonzero(keep & (index["frame_split"] == split_id))
+        # YOLO resolves labels from /images/ -> /labels/, so list the prep script's image links
+        listed, missing = [], 0
+        for p in index["frame_path"][sel]:
+            link = root / "images" / split / os.path.basename(p)
+            if link.exists():
+                listed.append(str(link))
+            else:
+                missing += 1
+        (out_dir / f"{split}.txt").write_text("\n".join(listed) + ("\n" if listed else ""))
+        yaml_splits[split] = os.path.relpath(out_dir / f"{split}.txt", root)
+        _write_subset_coco(index, sel, out_dir / f"coco_{split}.json")
+        summary[split] = {"frames": int(sel.size), "yolo_listed": len(listed), "not_in_images_dir": missing}
+
+    # Frames outside train/val/test (e.g. the three-pass runs) only get a COCO subset
+    other = np.flatnonzero(keep & (index["frame_split"] < 0))
+    if other.size:
+        _write_subset_coco(index, other, out_dir / "coco_other.json")
+        summary["other"] = {"frames": int(other.size)}
+
+    write_dataset_yaml(root, out_dir / "my_dataset.yaml", yaml_splits, index)
+    return summary
+
+
+def write_dataset_yaml(root: Path, path: Path, yaml_splits: Dict[str, str], index: dict) -> None:
+    """YOLO dataset file: `path: root`, one entry per split (relative to root), classes_unique.txt names."""
+    names = [str(c) for c in index["classes"]]
+    classes_meta = _read_lines(root / "classes_unique.txt") or names
+    with open(path, "w", encoding="utf-8") as f:
+        f.write(f"path: {root}\n")
+        for split, rel in yaml_splits.items():
+            f.write(f"{split}: {rel}\n")
+        f.write("names:\n")
+        for c in classes_meta:
+            f.write(f"  - {c}\n")
+
+
+def _write_subset_coco(index: dict, frame_ids: np.ndarray, path: Path) -> None:
+    """Subset COCO for `frame_ids`, re-read from the run jsons so every field is preserved."""
+    by_run: Dict[int, set] = {}
+    for fid in frame_ids:
+        by_run.setdefault(int(index["frame_run"][fid]), set()).add(str(index["frame_path"][fid]))
+    out = {"images": [], "annotations": [], "categories": []}
+    next_img = next_ann = 1
+    cat_names = {}
+    for run_id, wanted in sorted(by_run.items()):
+        js = Path(str(index["run_jsons"][run_id]))
+        coco = json.loads(js.read_text())
+        for cat in coco.get("categories", []):
+            cat_names.setdefault(cat["name"], cat)
+        cat_name_of = {c["id"]: c["name"] for c in coco.get("categories", [])}
+        img_map = {}
+        for im in coco.get("images", []):
+            full = str(js.parent / im["file_name"])
+            if full in wanted:
+                img_map[im["id"]] = next_img
+                out["images"].append(dict(im, id=next_img, file_name=full))
+                next_img += 1
+        for a in coco.get("annotations", []):
+            if a["image_id"] in img_map:
+                out["annotations"].append(
+                    dict(a, id=next_ann, image_id=img_map[a["image_id"]], category_name=cat_name_of.get(a["category_id"]))
+                )
+                next_ann += 1
+    # Category ids follow the global class order so runs with different ids merge cleanly
+    order = {str(n): i + 1 for i, n in enumerate(index["classes"])}
+    out["categories"] = [dict(cat, id=order[name]) for name, cat in cat_names.items() if name in order]
+    out["categories"].sort(key=lambda c: c["id"])
+    for a in out["annotations"]:
+        a["category_id"] = order.get(a.pop("category_name"), a["category_id"])
+    path.write_text(json.dumps(out))
+
+
+def _csv(value: str) -> List[str]:
+    return [v for v in value.replace(":", ",").split(",") if v]
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser(description="Select SDG frames by class / bbox size / count / split / run.")
+    ap.add_argument("out_root", help="SDG output root (OUT_ROOT).")
+    ap.add_argument("--name", default="subset", help="Subset name; output goes to OUT_ROOT/subsets/<name>.")
+    ap.add_argument("--class", dest="classes", action="append", default=[], help="Class name (repeatable).")
+    ap.add_argument("--min_px", type=float, default=0.0, help="Min shorter bbox side (px) of a matching object.")
+    ap.add_argument("--max_px", type=float, default=0.0, help="Max shorter bbox side (px) of a matching object.")
+    ap.add_argument("--min_area", type=float, default=0.0, help="Min bbox area (px^2) of a matching object.")
+    ap.add_argument("--min_count", type=int, default=None, help="Min matching objects per frame.")
+    ap.add_argument("--max_count", type=int, default=None, help="Max matching objects per frame.")
+    ap.add_argument("--run", action="append", default=[], help="Run directory name/glob (e.g. no_distractors).")
+    ap.add_argument("--source", action="append", default=[], help="Image dir glob (e.g. 'Replicator/copy_paste').")
+    ap.add_argument(
+        "--filter_splits",
+        type=_csv,
+        default=["train"],
+        help="Splits the query applies to (default: train); the others stay whole in my_dataset.yaml. "
+        "'' applies the query to frames outside train/val/test only.",
+    )
+    ap.add_argument("--rebuild_index", action="store_true")
+    ap.add_argument("--dry_run", action="store_true", help="Only print the counts.")
+    args = ap.parse_args()
+
+    root = Path(args.out_root).expanduser().resolve()
+    index = load_index(root, rebuild=args.rebuild_index)
+    t0 = time.perf_counter()
+    try:
+        keep = select_frames(
+            index,
+            classes=args.classes,
+            min_px=args.min_px,
+            max_px=args.max_px,
+            min_area=args.min_area,
+            min_count=args.min_count,
+            max_count=args.max_count,
+            runs=args.run,
+            sources=args.source,
+        )
+    except ValueError as exc:
+        raise SystemExit(f"[query] {exc}")
+    elapsed_ms = (time.perf_counter() - t0) * 1000
+    per_split = {s: int((keep & (index["frame_split"] == i)).sum()) for i, s in enumerate(SPLITS)}
+    per_split["other"] = int((keep & (index["frame_split"] < 0)).sum())
+    print(f"[query] {int(keep.sum())}/{keep.size} frames match in {elapsed_ms:.1f} ms: {per_split}")
+    if args.dry_run:
+        return
+    out_dir = root / "subsets" / args.name
+    summary = write_subset(root, out_dir, index, keep, args.filter_splits)
+    (out_dir / "query.json").write_text(json.dumps({"args": vars(args), "summary": summary}, indent=2))
+    print(f"[query] wrote {out_dir} ({summary}); train with DATA_YAML={out_dir / 'my_dataset.yaml'}")
+
+
+if __name__ == "__main__":
+    main()
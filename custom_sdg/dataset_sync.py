@@ -0,0 +1,285 @@
+#!/usr/bin/env python3
+"""
+Content-addressed sync of an SDG output root to a training host (local or mounted path).
+
+Why this exists:
+- rsync of $OUT_ROOT resends renamed/duplicated frames and rescans everything; the
+  symlink farms and label trees built by the prep scripts add thousands of small entries.
+
+How it works:
+1) manifest: walks the source tree and hashes regular files (SHA-256) on a thread pool.
+   Hashes are reused from the previous manifest when size and mtime are unchanged, so
+   re-running after a new split only hashes new files. Symlinks are recorded as links
+   (absolute targets inside the source root are made relative so they resolve on the target).
+2) push: copies each missing content blob once into <dst>/.sdg_blobs/<sha[:2]>/<sha>
+   (written as .part and renamed, so an interrupted push resumes where it stopped), then
+   rebuilds the layout under <dst> with hardlinks to the blobs and recreates the symlinks.
+
+Files under <dst> share inodes with the blob store: replace files instead of editing them in place.
+
+Usage:
+  python dataset_sync.py manifest $OUT_ROOT
+  python dataset_sync.py push $OUT_ROOT /mnt/trainer/sdg_out --workers 16 [--delete] [--dry_run]
+"""
+
+from __future__ import annotations
+
+import argparse
+import fnmatch
+import hashlib
+import json
+import os
+import shutil
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Tuple
+
+MANIFEST_NAME = ".sdg_sync_manifest.json"
+BLOBS_DIRNAME = ".sdg_blobs"
+SKIP_NAMES = {MANIFEST_NAME, BLOBS_DIRNAME}
+
+
+def _sha256_file(path: Path) -> str:
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+def _excluded(rel: str, patterns: Iterable[str]) -> bool:
+    return any(fnmatch.fnmatch(rel, p) or fnmatch.fnmatch(os.path.basename(rel), p) for p in patterns)
+
+
+def scan_tree(root: Path, exclude: Iterable[str] = ()) -> Tuple[Dict[str, os.stat_result], Dict[str, str]]:
+    """(regular files rel -> stat, symlinks rel -> target) under `root`, without following links."""
+    files: Dict[str, os.stat_result] = {}
+    links: Dict[str, str] = {}
+    for dirpath, dirnames, filenames in os.walk(root):
+        rel_dir = os.path.relpath(dirpath, root)
+        keep_dirs = []
+        for d in dirnames:
+            rel = os.path.normpath(os.path.join(rel_dir, d))
+            if d in SKIP_NAMES or _excluded(rel, exclude):
+                continue
+            if os.path.islink(os.path.join(dirpath, d)):
+                links[rel] = os.readlink(os.path.join(dirpath, d))
+            else:
+                keep_dirs.append(d)
+        dirnames[:] = keep_dirs
+        for name in filenames:
+            rel = os.path.normpath(os.path.join(rel_dir, name))
+            if name in SKIP_NAMES or _excluded(rel, exclude):
+                continue
+            path = os.path.join(dirpath, name)
+            if os.path.islink(path):
+                links[rel] = os.readlink(path)
+            else:
+                files[rel] = os.stat(path)
+    return files, links
+
+
+def _portable_link_target(root: Path, rel: str, target: str) -> str:
+    """Absolute link targets inside `root` become relative so the link resolves under the sync target."""
+    if not os.path.isabs(target):
+        return target
+    try:
+        inside = Path(target).resolve().relative_to(root)
+    except ValueError:
+        return target
+    return os.path.relpath(root / inside, (root / rel).parent)
+
+
+def build_manifest(
+    root, workers: int = 8, previous: Optional[dict] = None, exclude: Iterable[str] = (), log=print
+) -> dict:
+    """Hash the tree under `root` (reusing unchanged entries of `previous`) and return the manifest."""
+    root = Path(root).expanduser().resolve()
+    files, links = scan_tree(root, exclude)
+    prev_files = (previous or {}).get("files", {})
+    entries: Dict[str, dict] = {}
+    to_hash: List[str] = []
+    for rel, st in files.items():
+        old = prev_files.get(rel)
+        if old and old["size"] == st.st_size and old["mtime_ns"] == st.st_mtime_ns:
+            entries[rel] = old
+        else:
+            to_hash.append(rel)
+
+    t0 = time.time()
+    with ThreadPoolExecutor(max_workers=max(1, workers)) as pool:
+        for rel, sha in zip(to_hash, pool.map(lambda r: _sha256_file(root / r), to_hash)):
+            st = files[rel]
+            entries[rel] = {"sha256": sha, "size": st.st_size, "mtime_ns": st.st_mtime_ns}
+    log(
+        f"[sync] manifest: {len(entries)} files ({len(to_hash)} hashed in {time.time() - t0:.1f}s, "
+        f"{len(entries) - len(to_hash)} reused), {len(links)} symlinks"
+    )
+    return {
+        "version": 1,
+        "root": str(root),
+        "created": time.time(),
+        "files": dict(sorted(entries.items())),
+        "symlinks": {rel: _portable_link_target(root, rel, t) for rel, t in sorted(links.items())},
+    }
+
+
+def load_manifest(path: Path) -> Optional[dict]:
+    return json.loads(path.read_text()) if path.is_file() else None
+
+
+def save_manifest(path: Path, manifest: dict) -> None:
+    tmp = path.with_name(path.name + ".tmp")
+    tmp.write_text(json.dumps(manifest, indent=1))
+    os.replace(tmp, path)
+
+
+def manifest_for(root, workers: int = 8, exclude: Iterable[str] = (), log=print) -> dict:
+    """Build (incrementally) and save the manifest of `root`."""
+    root = Path(root).expanduser().resolve()
+    path = root / MANIFEST_NAME
+    manifest = build_manifest(root, workers, load_manifest(path), exclude, log)
+    save_manifest(path, manifest)
+    return manifest
+
+
+def _blob_path(dst: Path, sha: str) -> Path:
+    return dst / BLOBS_DIRNAME / sha[:2] / sha
+
+
+def _copy_blob(src: Path, blob: Path, sha: str) -> int:
+    """Copy `src` to `blob` via a .part file, verifying the content hash. Returns bytes copied."""
+    blob.parent.mkdir(parents=True, exist_ok=True)
+    part = blob.with_name(blob.name + ".part")
+    h = hashlib.sha256()
+    copied = 0
+    with open(src, "rb") as fin, open(part, "wb") as fout:
+        for chunk in iter(lambda: fin.read(1 << 20), b""):
+            h.update(chunk)
+            fout.write(chunk)
+            copied += len(chunk)
+    if h.hexdigest() != sha:
+        part.unlink(missing_ok=True)
+        raise IOError(f"{src} changed while syncing (hash mismatch); re-run the push")
+    shutil.copystat(src, part)
+    os.replace(part, blob)
+    return copied
+
+
+def _place(blob: Path, path: Path) -> bool:
+    """Hardlink `blob` at `path` (copy when hardlinks are not supported). Returns True when changed."""
+    if path.is_symlink():
+        path.unlink()
+    elif path.exists():
+        if os.path.samefile(blob, path):
+            return False
+        b, t = blob.stat(), path.stat()
+        if (b.st_size, b.st_mtime_ns) == (t.st_size, t.st_mtime_ns):
+            return False  # copy from an earlier run on a filesystem without hardlinks
+        if path.is_dir():
+            shutil.rmtree(path)
+        else:
+            path.unlink()
+    path.parent.mkdir(parents=True, exist_ok=True)
+    try:
+        os.link(blob, path)
+    except OSError:
+        shutil.copy2(blob, path)
+    return True
+
+
+def push(
+    src, dst, workers: int = 8, exclude: Iterable[str] = (), delete: bool = False, dry_run: bool = False, log=print
+) -> dict:
+    """Sync `src` to `dst` by content (see module docstring) and return transfer stats."""
+    src = Path(src).expanduser().resolve()
+    dst = Path(dst).expanduser().resolve()
+    t0 = time.time()
+    manifest = manifest_for(src, workers, exclude, log)
+    files = manifest["files"]
+
+    # One source file per unique blob; only blobs missing on the target are sent
+    first_by_sha: Dict[str, str] = {}
+    for rel, entry in files.items():
+        first_by_sha.setdefault(entry["sha256"], rel)
+    missing = [sha for sha in first_by_sha if not _blob_path(dst, sha).is_file()]
+    sizes = {entry["sha256"]: entry["size"] for entry in files.values()}
+    stats = {
+        "files": len(files),
+        "symlinks": len(manifest["symlinks"]),
+        "unique_blobs": len(first_by_sha),
+        "blobs_sent": len(missing),
+        "bytes_total": sum(e["size"] for e in files.values()),
+        "bytes_sent": sum(sizes[sha] for sha in missing),
+        "files_linked": 0,
+        "symlinks_created": 0,
+        "deleted": 0,
+        "dry_run": dry_run,
+    }
+    stats["bytes_saved"] = stats["bytes_total"] - stats["bytes_sent"]
+    if dry_run:
+        stats["seconds"] = round(time.time() - t0, 3)
+        return stats
+
+    dst.mkdir(parents=True, exist_ok=True)
+    with ThreadPoolExecutor(max_workers=max(1, workers)) as pool:
+        list(pool.map(lambda sha: _copy_blob(src / first_by_sha[sha], _blob_path(dst, sha), sha), missing))
+
+    for rel, entry in files.items():
+        stats["files_linked"] += int(_place(_blob_path(dst, entry["sha256"]), dst / rel))
+    for rel, target in manifest["symlinks"].items():
+        path = dst / rel
+        if path.is_symlink() and os.readlink(path) == target:
+            continue
+        if path.is_symlink() or path.is_file():
+            path.unlink()
+        elif path.is_dir():
+            shutil.rmtree(path)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        os.symlink(target, path)
+        stats["symlinks_created"] += 1
+
+    if delete:
+        dst_files, dst_links = scan_tree(dst)
+        for rel in list(dst_files) + list(dst_links):
+            if rel not in files and rel not in manifest["symlinks"]:
+                (dst / rel).unlink()
+                stats["deleted"] += 1
+
+    save_manifest(dst / MANIFEST_NAME, manifest)
+    stats["seconds"] = round(time.time() - t0, 3)
+    return stats
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Content-addressed sync of an SDG output root.")
+    sub = parser.add_subparsers(dest="command", required=True)
+    man = sub.add_parser("manifest", help="Build/refresh the hashed manifest of a dataset root.")
+    man.add_argument("src")
+    p_push = sub.add_parser("push", help="Send missing blobs to a target directory and rebuild the layout there.")
+    p_push.add_argument("src")
+    p_push.add_argument("dst")
+    p_push.add_argument("--delete", action="store_true", help="Remove target files that are not in the source.")
+    p_push.add_argument("--dry_run", action="store_true", help="Only report what would be sent.")
+    for p in (man, p_push):
+        p.add_argument("--workers", type=int, default=os.cpu_count() or 4, help="Hash/copy threads.")
+        p.add_argument(
+            "--exclude", action="append", default=[], help="Glob on the relative path or file name (repeatable)."
+        )
+    args = parser.parse_args()
+
+    if args.command == "manifest":
+        manifest_for(args.src, args.workers, args.exclude)
+        return
+    stats = push(args.src, args.dst, args.workers, args.exclude, args.delete, args.dry_run)
+    mib = float(1 << 20)
+    print(json.dumps(stats, indent=2))
+    print(
+        f"[sync] sent {stats['blobs_sent']} blob(s), {stats['bytes_sent'] / mib:.1f} MiB of "
+        f"{stats['bytes_total'] / mib:.1f} MiB; saved {stats['bytes_saved'] / mib:.1f} MiB"
+    )
+
+
+if __name__ == "__main__":
+    main()
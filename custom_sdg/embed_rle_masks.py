@@ -0,0 +1,146 @@
+#!/usr/bin/env python3
+"""
+Embed instance masks in an SDG split's COCO json as RLE "segmentation" fields.
+
+Why this exists:
+- With `--output_profile segmentation|full` Replicator writes instance (and semantic)
+  mask images for every frame, which adds 2N+ files per split. COCO RLE stores the same
+  per-object masks inside the annotation json, so segmentation training reads one file.
+
+What it does:
+1) Matches every annotation to its instance in instance_segmentation_XXXX.png (dominant
+   instance inside the bbox whose tight bbox agrees, see coco_masks.InstanceMap).
+2) Encodes the mask as COCO RLE (compressed counts string by default; pycocotools
+   compatible) on a process pool and sets "segmentation" and "area" (mask pixels).
+3) Rewrites the json in place (atomic replace).
+4) With --delete_masks, removes the instance/semantic mask images and their mapping
+   jsons for frames whose annotations were all embedded. Semantic masks can be rebuilt
+   from the instance RLE and category ids.
+
+Run it before copy_paste_augment.py: the crop bank reads masks from RLE fields too.
+
+Usage:
+  python embed_rle_masks.py --data_dir $OUT_ROOT/train --workers 8 --delete_masks
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import re
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from typing import Dict, List, Tuple
+
+from coco_masks import InstanceMap, find_source_json, instance_png_for, rle_area, rle_encode
+
+MASK_FILE_PREFIXES = ("instance_segmentation", "semantic_segmentation")
+
+
+def mask_files_for(image_path: Path) -> List[Path]:
+    """Mask images and mapping jsons Replicator wrote for the frame of `image_path`."""
+    m = re.search(r"(\d+)$", image_path.stem)
+    if not m:
+        return []
+    files = []
+    for prefix in MASK_FILE_PREFIXES:
+        files += image_path.parent.glob(f"{prefix}*_{m.group(1)}.*")
+    return sorted(files)
+
+
+def _encode_image(task: Tuple[str, List[dict], float, bool, bool]) -> Tuple[Dict[int, dict], int, List[str]]:
+    """
+    RLE for the annotations of one image (runs in a worker process).
+    Returns ({ann_id: rle}, number of annotations without a mask, mask files of the frame).
+    """
+    image_path, anns, min_iou, compressed, overwrite = task
+    path = Path(image_path)
+    todo = [a for a in anns if overwrite or not a.get("segmentation")]
+    files = [str(p) for p in mask_files_for(path)]
+    if not todo:
+        return {}, 0, files
+    png = instance_png_for(path)
+    if png is None:
+        return {}, len(todo), files
+    instance_map = InstanceMap(png)
+    encoded = {}
+    for ann in todo:
+        mask = instance_map.mask_for_bbox(ann["bbox"], min_iou=min_iou)
+        if mask is not None:
+            encoded[int(ann["id"])] = rle_encode(mask, compressed=compressed)
+    return encoded, len(todo) - len(encoded), files
+
+
+def embed_rle_masks(
+    coco: dict,
+    split_dir: Path,
+    workers: int,
+    min_iou: float = 0.5,
+    compressed: bool = True,
+    overwrite: bool = False,
+) -> Tuple[int, int, List[str]]:
+    """
+    Set RLE "segmentation"/"area" on the annotations of `coco` in place.
+    Returns (annotations embedded, annotations without a mask, mask files safe to delete).
+    """
+    by_img: Dict[int, List[dict]] = {}
+    for ann in coco.get("annotations", []):
+        by_img.setdefault(ann["image_id"], []).append(ann)
+    anns_by_id = {int(a["id"]): a for a in coco.get("annotations", [])}
+    tasks = [
+        (str(split_dir / im["file_name"]), by_img.get(im["id"], []), min_iou, compressed, overwrite)
+        for im in coco.get("images", [])
+    ]
+    embedded = missing = 0
+    deletable: List[str] = []
+    with ProcessPoolExecutor(max_workers=max(1, workers)) as pool:
+        for encoded, n_missing, files in pool.map(_encode_image, tasks, chunksize=16):
+            for ann_id, rle in encoded.items():
+                anns_by_id[ann_id]["segmentation"] = rle
+                anns_by_id[ann_id]["area"] = rle_area(rle)
+            embedded += len(encoded)
+            missing += n_missing
+            if n_missing == 0:
+                deletable += files
+    return embedded, missing, deletable
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser(description="Embed instance masks of an SDG split as COCO RLE segmentation.")
+    ap.add_argument("--data_dir", required=True, help="SDG split directory (e.g. $OUT_ROOT/train).")
+    ap.add_argument("--coco", default=None, help="COCO json to update (default: newest coco_*.json in --data_dir).")
+    ap.add_argument("--workers", type=int, default=os.cpu_count() or 4, help="Worker processes.")
+    ap.add_argument("--min_iou", type=float, default=0.5, help="Min IoU between annotation bbox and mask bbox.")
+    ap.add_argument("--uncompressed", action="store_true", help="Write counts as integer lists instead of strings.")
+    ap.add_argument("--overwrite", action="store_true", help="Re-encode annotations that already have a segmentation.")
+    ap.add_argument(
+        "--delete_masks",
+        action="store_true",
+        help="Delete instance/semantic mask images of frames whose annotations were all embedded.",
+    )
+    args = ap.parse_args()
+
+    split_dir = Path(args.data_dir).expanduser().resolve()
+    src = Path(args.coco).expanduser().resolve() if args.coco else find_source_json(split_dir)
+    coco = json.loads(src.read_text())
+    print(f"[rle] source: {src} ({len(coco['images'])} images, {len(coco['annotations'])} annotations)")
+
+    embedded, missing, deletable = embed_rle_masks(
+        coco, split_dir, args.workers, args.min_iou, compressed=not args.uncompressed, overwrite=args.overwrite
+    )
+    tmp = src.with_name(src.name + ".tmp")
+    tmp.write_text(json.dumps(coco))
+    os.replace(tmp, src)
+    print(f"[rle] embedded {embedded} mask(s); {missing} annotation(s) without a matching instance mask")
+
+    if args.delete_masks:
+        for f in deletable:
+            Path(f).unlink(missing_ok=True)
+        print(f"[rle] deleted {len(deletable)} mask file(s)")
+        if missing:
+            print("[rle] kept the mask files of frames with unmatched annotations")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,194 @@
+"""
+Geometric pre-filter for pre-sampled pose schedules (NumPy only, no Kit).
+
+Each custom object is approximated by a bounding sphere (asset radius x sampled scale).
+For every frame the spheres are moved into the camera frame of the look-at camera and
+tested against the view frustum built from the render resolution and the camera
+intrinsics. Frames with fewer than `min_visible` spheres in view are resampled (new
+camera/object positions) or dropped before anything reaches the renderer.
+
+Camera conventions (USD / Omniverse):
+- the camera looks at `target` with world +Z as up (Isaac Sim stages are Z-up),
+- pixels are square: fx = fy = focal_length / horizontal_aperture * width,
+  principal point at the image center.
+"""
+
+from __future__ import annotations
+
+from typing import Dict, Optional, Sequence, Tuple
+
+import numpy as np
+
+from pose_schedule import PoseField
+
+# rep.create.camera / UsdGeom.Camera defaults (millimeters)
+DEFAULT_FOCAL_LENGTH = 24.0
+DEFAULT_HORIZONTAL_APERTURE = 20.955
+FILTER_MODES = ("off", "resample", "reject")
+
+
+def camera_intrinsics(
+    width: int,
+    height: int,
+    focal_length: float = DEFAULT_FOCAL_LENGTH,
+    horizontal_aperture: float = DEFAULT_HORIZONTAL_APERTURE,
+) -> Tuple[float, float, float, float]:
+    """Pinhole intrinsics (fx, fy, cx, cy) in pixels."""
+    fx = focal_length / horizontal_aperture * width
+    return fx, fx, width / 2.0, height / 2.0
+
+
+def look_at_rotation(cam_pos: np.ndarray, target: Sequence[float] = (0.0, 0.0, 0.0)) -> np.ndarray:
+    """
+    (N, 3, 3) rotations whose rows are the camera's right, up and forward axes in world
+    coordinates, so `R @ (p - cam_pos)` gives (x right, y up, z forward/depth).
+    """
+    cam_pos = np.asarray(cam_pos, dtype=np.float64).reshape(-1, 3)
+    forward = np.asarray(target, dtype=np.float64) - cam_pos
+    forward /= np.maximum(np.linalg.norm(forward, axis=1, keepdims=True), 1e-12)
+    up_hint = np.broadcast_to(np.array([0.0, 0.0, 1.0]), forward.shape).copy()
+    # Looking straight up/down: any horizontal up vector works
+    degenerate = np.abs(forward[:, 2]) > 0.999
+    up_hint[degenerate] = (0.0, 1.0, 0.0)
+    right = np.cross(forward, up_hint)
+    right /= np.linalg.norm(right, axis=1, keepdims=True)
+    up = np.cross(right, forward)
+    return np.stack([right, up, forward], axis=1)
+
+
+def to_camera_frame(points: np.ndarray, cam_pos: np.ndarray, rot: np.ndarray) -> np.ndarray:
+    """World points (N, P, 3) -> camera coordinates (N, P, 3) for per-frame cameras (N, 3)."""
+    rel = np.asarray(points, dtype=np.float64) - np.asarray(cam_pos, dtype=np.float64)[:, None, :]
+    return np.einsum("nij,npj->npi", rot, rel)
+
+
+def project_points(
+    points: np.ndarray, cam_pos: np.ndarray, intrinsics: Tuple[float, float, float, float], target=(0.0, 0.0, 0.0)
+) -> Tuple[np.ndarray, np.ndarray]:
+    """Pixel coordinates (N, P, 2) (u right, v down) and depth (N, P) of world points."""
+    fx, fy, cx, cy = intrinsics
+    cam = to_camera_frame(points, cam_pos, look_at_rotation(cam_pos, target))
+    depth = cam[..., 2]
+    safe = np.where(np.abs(depth) < 1e-12, 1e-12, depth)
+    uv = np.stack([cx + fx * cam[..., 0] / safe, cy - fy * cam[..., 1] / safe], axis=-1)
+    return uv, depth
+
+
+def spheres_in_view(
+    cam_pos: np.ndarray,
+    centers: np.ndarray,
+    radii,
+    width: int,
+    height: int,
+    intrinsics: Optional[Tuple[float, float, float, float]] = None,
+    near: float = 0.1,
+    target: Sequence[float] = (0.0, 0.0, 0.0),
+    min_radius_px: float = 0.0,
+) -> np.ndarray:
+    """
+    (N, P) bool: sphere p of frame n intersects the view frustum (conservative plane test)
+    and, with `min_radius_px`, projects to at least that many pixels of radius.
+    """
+    fx, fy, _cx, _cy = intrinsics or camera_intrinsics(width, height)
+    cam_pos = np.asarray(cam_pos, dtype=np.float64).reshape(-1, 3)
+    centers = np.asarray(centers, dtype=np.float64).reshape(cam_pos.shape[0], -1, 3)
+    radii = np.broadcast_to(np.asarray(radii, dtype=np.float64), centers.shape[:2])
+    cam = to_camera_frame(centers, cam_pos, look_at_rotation(cam_pos, target))
+    x, y, z = cam[..., 0], cam[..., 1], cam[..., 2]
+
+    tan_x = (width / 2.0) / fx
+    tan_y = (height / 2.0) / fy
+    norm_x = np.sqrt(1.0 + tan_x**2)
+    norm_y = np.sqrt(1.0 + tan_y**2)
+    visible = z + radii > near
+    visible &= (np.abs(x) - tan_x * z) / norm_x <= radii
+    visible &= (np.abs(y) - tan_y * z) / norm_y <= radii
+    if min_radius_px > 0:
+        visible &= fx * radii / np.maximum(z, near) >= min_radius_px
+    return visible
+
+
+def frames_in_view(visible: np.ndarray, active: Optional[np.ndarray] = None, min_visible: int = 1) -> np.ndarray:
+    """(N,) bool: at least `min_visible` active spheres are in view."""
+    if active is not None:
+        visible = visible & active
+    return visible.sum(axis=1) >= max(1, int(min_visible))
+
+
+def apply_frustum_filter(
+    schedule: Dict[str, np.ndarray],
+    fields: Dict[str, PoseField],
+    radius_at_unit_scale: np.ndarray,
+    width: int,
+    height: int,
+    intrinsics: Tuple[float, float, float, float],
+    mode: str = "resample",
+    min_visible: int = 1,
+    max_attempts: int = 20,
+    active: Optional[np.ndarray] = None,
+    seed: int = 0,
+    min_radius_px: float = 0.0,
+) -> Tuple[Dict[str, np.ndarray], dict, np.ndarray]:
+    """
+    Filter a pose schedule (see pose_schedule.py) so every frame has a target in view.
+    - resample: redraw cam_pos/obj_pos of failing frames (uniform, seeded per global frame) up to
+      `max_attempts` times.
+    - reject:   drop failing frames (the run renders fewer frames).
+    `radius_at_unit_scale` is per object prim (P,); the world radius is that times the
+    largest sampled scale component. `active` (N, P) marks prims visible in each frame.
+    Returns (schedule, stats, kept_mask over the input frames).
+    """
+    if mode not in FILTER_MODES:
+        raise ValueError(f"Unknown frustum filter mode '{mode}' (expected one of: {', '.join(FILTER_MODES)})")
+    schedule = {k: v.copy() for k, v in schedule.items()}
+    n = len(schedule["frame_index"])
+    radius_at_unit_scale = np.asarray(radius_at_unit_scale, dtype=np.float64)
+
+    def _ok(idx: np.ndarray) -> np.ndarray:
+        radii = radius_at_unit_scale[None, :] * np.abs(schedule["obj_scale"][idx]).max(axis=-1)
+        vis = spheres_in_view(
+            schedule["cam_pos"][idx], schedule["obj_pos"][idx], radii, width, height, intrinsics,
+            min_radius_px=min_radius_px,
+        )
+        return frames_in_view(vis, None if active is None else active[idx], min_visible)
+
+    all_idx = np.arange(n)
+    ok = _ok(all_idx)
+    initially_failed = int((~ok).sum())
+    resampled = 0
+    if mode == "resample":
+        dims = fields["cam_pos"].dims + fields["obj_pos"].dims
+        for attempt in range(max_attempts):
+            bad = np.flatnonzero(~ok)
+            if bad.size == 0:
+                break
+            # Keyed by global frame index so shards resample identically
+            unit = np.stack(
+                [
+                    np.random.default_rng([seed, 0xF857, int(schedule["frame_index"][i]), attempt]).random(dims)
+                    for i in bad
+                ]
+            )
+            split = fields["cam_pos"].dims
+            for name, block in (("cam_pos", unit[:, :split]), ("obj_pos", unit[:, split:])):
+                schedule[name][bad] = fields[name].scale_unit(block).astype(schedule[name].dtype)
+            fixed = _ok(bad)
+            ok[bad] = fixed
+            resampled += int(fixed.sum())
+        kept = np.ones(n, dtype=bool)
+    elif mode == "reject":
+        kept = ok.copy()
+        schedule = {k: v[kept] for k, v in schedule.items()}
+    else:
+        kept = np.ones(n, dtype=bool)
+
+    stats = {
+        "mode": mode,
+        "frames_in": n,
+        "frames_without_target": initially_failed,
+        "frames_resampled": resampled,
+        "frames_rejected": int(n - kept.sum()),
+        "frames_still_without_target": int((~ok[kept]).sum()) if mode != "off" else initially_failed,
+        "min_visible": int(min_visible),
+    }
+    return schedule, stats, kept
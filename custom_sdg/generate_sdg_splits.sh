@@ -32,7 +32,11 @@ CUSTOM_ASSET_PATHS=${CUSTOM_ASSET_PATHS:-"$HOME/Downloads/source/TDNS06.usd"}
 CUSTOM_OBJECT_CLASSES=${CUSTOM_OBJECT_CLASSES:-"custom"}
 CUSTOM_PRIM_PREFIX=${CUSTOM_PRIM_PREFIX:-"custom"}
 FALLBACK_COUNT=${FALLBACK_COUNT:-2}
+INSTANCE_POOL_MAX=${INSTANCE_POOL_MAX:-""}
+INSTANCE_COUNT=${INSTANCE_COUNT:-""}
 CUSTOM_MATERIALS_DIRS=${CUSTOM_MATERIALS_DIRS:-"$HOME/Downloads/source/Materials"}
+MATERIAL_MODE=${MATERIAL_MODE:-""}
+MATERIAL_REROLL_INTERVAL=${MATERIAL_REROLL_INTERVAL:-""}
 DISTRACTORS=${DISTRACTORS:-"warehouse"}
 DISTRACTORS_TRAIN=${DISTRACTORS_TRAIN:-"$DISTRACTORS"}
 DISTRACTORS_VAL=${DISTRACTORS_VAL:-"$DISTRACTORS"}
@@ -47,6 +51,49 @@ OBJ_ROT=${OBJ_ROT:-""}
 DIST_POS=${DIST_POS:-""}
 DIST_ROT=${DIST_ROT:-""}
 DIST_SCALE=${DIST_SCALE:-""}
+# Writer output profile: detection (RGB + bbox), segmentation (+ instance), full (+ semantic + instance).
+# Empty keeps the generator default (full for CocoWriter, detection for the streaming writer).
+OUTPUT_PROFILE=${OUTPUT_PROFILE:-""}
+OUTPUT_PROFILE_TRAIN=${OUTPUT_PROFILE_TRAIN:-"$OUTPUT_PROFILE"}
+OUTPUT_PROFILE_VAL=${OUTPUT_PROFILE_VAL:-"$OUTPUT_PROFILE"}
+OUTPUT_PROFILE_TEST=${OUTPUT_PROFILE_TEST:-"$OUTPUT_PROFILE"}
+# Assumed sustained disk write speed for the pre-launch write-time estimate
+DISK_WRITE_MBPS=${DISK_WRITE_MBPS:-200}
+WRITER=${WRITER:-""}
+# Extra resolutions from the same render (streaming writer), e.g. "960x544:resize,640x640".
+# Each variant lands in ${OUT_ROOT}_<W>x<H>/<split>; set WIDTH/HEIGHT to the largest resolution.
+RESOLUTION_VARIANTS=${RESOLUTION_VARIANTS:-""}
+WRITER_WORKERS=${WRITER_WORKERS:-""}
+WRITER_MAX_PENDING=${WRITER_MAX_PENDING:-""}
+# Direct label emission during generation (makes coco2yolo.py / prepare_tao_coco.py optional)
+EMIT_YOLO_LABELS=${EMIT_YOLO_LABELS:-""}
+EMIT_TAO_COCO=${EMIT_TAO_COCO:-""}
+# Pre-sampled pose schedule (e.g. POSE_SAMPLER=uniform). Splits share one global schedule per
+# POSE_SEED at disjoint frame offsets, so train/val/test never reuse a pose.
+POSE_SAMPLER=${POSE_SAMPLER:-""}
+POSE_SEED=${POSE_SEED:-0}
+# Frustum pre-filter for pre-sampled poses: resample | reject (needs POSE_SAMPLER)
+FRUSTUM_FILTER=${FRUSTUM_FILTER:-""}
+GATE_MIN_OBJECTS=${GATE_MIN_OBJECTS:-""}
+GATE_MIN_BBOX_PX=${GATE_MIN_BBOX_PX:-""}
+GATE_MAX_OCCLUSION=${GATE_MAX_OCCLUSION:-""}
+# Embed instance masks as COCO RLE after generation (needs OUTPUT_PROFILE=segmentation|full);
+# RLE_DELETE_MASKS=1 then removes the per-frame mask images
+RLE_MASKS=${RLE_MASKS:-""}
+RLE_DELETE_MASKS=${RLE_DELETE_MASKS:-""}
+RLE_WORKERS=${RLE_WORKERS:-""}
+# Offline copy-paste augmentation after generation (needs instance masks: OUTPUT_PROFILE=segmentation|full)
+COPY_PASTE_MULTIPLIER=${COPY_PASTE_MULTIPLIER:-""}
+COPY_PASTE_SPLITS=${COPY_PASTE_SPLITS:-"train"}
+COPY_PASTE_WORKERS=${COPY_PASTE_WORKERS:-""}
+ASSET_CACHE_DIR=${ASSET_CACHE_DIR:-""}
+ASSET_ROOT=${ASSET_ROOT:-""}
+# Incremental class addition: ADD_ASSETS=1 renders only CUSTOM_ASSET_PATHS (the new assets) into
+# OUT_ROOT/increments/<INCREMENT_TAG>/<split> and merges them into the existing OUT_ROOT
+ADD_ASSETS=${ADD_ASSETS:-""}
+INCREMENT_TAG=${INCREMENT_TAG:-"inc_$(date +%Y%m%d_%H%M%S)"}
+# Validate-only preflight of every split before the first Isaac Sim launch (PREFLIGHT=0 to skip)
+PREFLIGHT=${PREFLIGHT:-1}
 
 # Resolve paths relative to this script
 SCRIPT_DIR="$(cd "$(dirname "${BASH_SOURCE[0]}")" >/dev/null 2>&1 && pwd)"
@@ -110,8 +157,33 @@ for c in "${CLASSES[@]}"; do
   fi
 done
 
+# Root of the split directories this run writes (the increment root when adding assets)
+RUN_ROOT="$OUT_ROOT"
+if [[ "$ADD_ASSETS" == "1" || "$ADD_ASSETS" == "true" ]]; then
+  ADD_ASSETS=1
+  for split in train val test; do
+    if [[ ! -d "$OUT_ROOT/$split" ]]; then
+      echo "Error: ADD_ASSETS=1 needs an existing dataset; $OUT_ROOT/$split is missing." >&2
+      exit 1
+    fi
+  done
+  if [[ -n "$RESOLUTION_VARIANTS" ]]; then
+    echo "Error: RESOLUTION_VARIANTS is not supported with ADD_ASSETS=1." >&2
+    exit 1
+  fi
+  RUN_ROOT="$OUT_ROOT/increments/$INCREMENT_TAG"
+  if [[ -e "$RUN_ROOT" ]]; then
+    echo "Error: increment $RUN_ROOT already exists; set another INCREMENT_TAG." >&2
+    exit 1
+  fi
+  # Labels are written by merge_increment.py with the merged class ids
+  EMIT_YOLO_LABELS=""
+  EMIT_TAO_COCO=""
+  echo "Adding assets to $OUT_ROOT (classes: $(IFS=,; echo "${UNIQUE_CLASSES[*]}")); rendering into $RUN_ROOT"
+fi
+
 # Handle existing output root: prompt to delete for a clean reset
-if [[ -d "$OUT_ROOT" ]]; then
+if [[ "$ADD_ASSETS" != "1" && -d "$OUT_ROOT" ]]; then
   if [[ "${AUTO_CLEAN:-}" == "1" || "${AUTO_CLEAN:-}" == "true" ]]; then
     echo "AUTO_CLEAN enabled. Removing existing $OUT_ROOT ..."
     rm -rf "$OUT_ROOT"
@@ -136,16 +208,55 @@ if [[ -d "$OUT_ROOT" ]]; then
   fi
 fi
 
-mkdir -p "$OUT_ROOT"
+mkdir -p "$OUT_ROOT" "$RUN_ROOT"
+
+# Print disk usage / write time per output profile for a split (plain python3, no Isaac Sim).
+estimate_split() {
+  local split=$1
+  local frames=$2
+  local profile=$3
+  local per_asset=${INSTANCE_POOL_MAX:-25}
+  if [[ -n "$INSTANCE_COUNT" ]]; then
+    per_asset=$(tr ':;' ',,' <<< "$INSTANCE_COUNT" | tr ',' '\n' | sort -n | tail -n 1)
+  fi
+  local workers=1
+  [[ "$WRITER" == "streaming" ]] && workers=${WRITER_WORKERS:-4}
+  [[ -z "$profile" ]] && { [[ "$WRITER" == "streaming" ]] && profile=detection || profile=full; }
+  echo "Estimated output for $split ($frames frames, ${WIDTH}x${HEIGHT}, profile '$profile' marked *):"
+  python3 "$SCRIPT_DIR/output_profiles.py" \
+    --width "$WIDTH" --height "$HEIGHT" --frames "$frames" \
+    --instances $(( per_asset * ${#ASSETS[@]} )) \
+    --writer_workers "$workers" --disk_write_mbps "$DISK_WRITE_MBPS" \
+    --profile "$profile"
+}
+
+# Global pose-schedule offset of a split: frames rendered by the splits before it
+# (gating renders up to 3x --num_frames, the generator's default --gate_max_render_factor)
+split_frame_offset() {
+  local budget=1
+  [[ -n "$GATE_MIN_OBJECTS" && "$GATE_MIN_OBJECTS" != "0" ]] && budget=3
+  case "$1" in
+    train) echo 0 ;;
+    val)   echo $(( FRAMES_TRAIN * budget )) ;;
+    test)  echo $(( (FRAMES_TRAIN + FRAMES_VAL) * budget )) ;;
+    *)     echo 0 ;;
+  esac
+}
 
 run_split() {
   local split=$1
   local frames=$2
   local dist=${3:-"$DISTRACTORS"}
+  local profile=${4:-""}
+  local mode=${5:-"generate"}
   local material_args=()
   local scale_args=()
   local pos_rot_args=()
   local warehouse_robot_args=()
+  local asset_cache_args=()
+  local instance_args=()
+  local gate_args=()
+  local writer_args=()
   local asset_args=(--asset_paths)
   local class_args=(--object_classes)
   if [[ -n "$CUSTOM_MATERIALS_DIRS" ]]; then
@@ -154,6 +265,8 @@ run_split() {
       [[ -n "$dir" ]] && material_args+=(--materials_dir "$dir")
     done
   fi
+  [[ -n "$MATERIAL_MODE" ]] && material_args+=(--material_mode "$MATERIAL_MODE")
+  [[ -n "$MATERIAL_REROLL_INTERVAL" ]] && material_args+=(--material_reroll_interval "$MATERIAL_REROLL_INTERVAL")
   if [[ -n "$OBJECT_SCALE" ]]; then
     scale_args+=(--object_scale "$OBJECT_SCALE")
   fi
@@ -172,33 +285,124 @@ run_split() {
       warehouse_robot_args+=(--warehouse_robot_paths "${robot_paths[@]}")
     fi
   fi
+  [[ -n "$INSTANCE_POOL_MAX" ]] && instance_args+=(--instance_pool_max "$INSTANCE_POOL_MAX")
+  if [[ -n "$POSE_SAMPLER" ]]; then
+    pos_rot_args+=(--pose_sampler "$POSE_SAMPLER" --pose_seed "$POSE_SEED" --frame_offset "$(split_frame_offset "$split")")
+    [[ -n "$FRUSTUM_FILTER" ]] && pos_rot_args+=(--frustum_filter "$FRUSTUM_FILTER")
+  fi
+  [[ -n "$INSTANCE_COUNT" ]] && instance_args+=(--instance_count "$INSTANCE_COUNT")
+  [[ -n "$WRITER" ]] && writer_args+=(--writer "$WRITER")
+  [[ -n "$profile" ]] && writer_args+=(--output_profile "$profile" --disk_write_mbps "$DISK_WRITE_MBPS")
+  [[ -n "$WRITER_WORKERS" ]] && writer_args+=(--writer_workers "$WRITER_WORKERS")
+  [[ -n "$RESOLUTION_VARIANTS" ]] && writer_args+=(--resolution_variants "$RESOLUTION_VARIANTS")
+  [[ -n "$WRITER_MAX_PENDING" ]] && writer_args+=(--writer_max_pending "$WRITER_MAX_PENDING")
+  [[ -n "$EMIT_YOLO_LABELS" ]] && writer_args+=(--emit_yolo_labels "$EMIT_YOLO_LABELS")
+  [[ -n "$EMIT_TAO_COCO" ]] && writer_args+=(--emit_tao_coco "$EMIT_TAO_COCO")
+  if [[ -n "$EMIT_YOLO_LABELS" || -n "$EMIT_TAO_COCO" ]]; then
+    writer_args+=(--label_out_root "$OUT_ROOT")
+  fi
+  [[ -n "$GATE_MIN_OBJECTS" ]] && gate_args+=(--gate_min_objects "$GATE_MIN_OBJECTS")
+  [[ -n "$GATE_MIN_BBOX_PX" ]] && gate_args+=(--gate_min_bbox_px "$GATE_MIN_BBOX_PX")
+  [[ -n "$GATE_MAX_OCCLUSION" ]] && gate_args+=(--gate_max_occlusion "$GATE_MAX_OCCLUSION")
+  [[ -n "$ASSET_CACHE_DIR" ]] && asset_cache_args+=(--asset_cache_dir "$ASSET_CACHE_DIR")
+  [[ -n "$ASSET_ROOT" ]] && asset_cache_args+=(--asset_root "$ASSET_ROOT")
   for a in "${ASSETS[@]}"; do asset_args+=("$a"); done
   for c in "${CLASSES[@]}"; do class_args+=("$c"); done
-  echo "Generating $split with $frames frames..."
-  env -u CONDA_DEFAULT_ENV -u CONDA_PREFIX -u CONDA_PYTHON_EXE -u CONDA_SHLVL -u _CE_CONDA -u _CE_M \
+  local cmd=(env -u CONDA_DEFAULT_ENV -u CONDA_PREFIX -u CONDA_PYTHON_EXE -u CONDA_SHLVL -u _CE_CONDA -u _CE_M \
     bash "$SIM_PY" "$GEN_PY" \
     --headless "$HEADLESS" \
     --num_frames "$frames" \
     --width "$WIDTH" --height "$HEIGHT" \
     --distractors "$dist" \
     "${warehouse_robot_args[@]}" \
-    --data_dir "$OUT_ROOT/$split" \
+    "${asset_cache_args[@]}" \
+    --data_dir "$RUN_ROOT/$split" \
     "${asset_args[@]}" \
     "${class_args[@]}" \
     --prim_prefix "$CUSTOM_PRIM_PREFIX" \
     --fallback_count "$FALLBACK_COUNT" \
+    "${instance_args[@]}" \
+    "${gate_args[@]}" \
+    "${writer_args[@]}" \
     "${material_args[@]}" \
     "${scale_args[@]}" \
-    "${pos_rot_args[@]}"
+    "${pos_rot_args[@]}")
+  if [[ "$mode" == "preflight" ]]; then
+    local plan="$RUN_ROOT/run_plan_${split}.json"
+    echo "Preflight $split (validate only) -> $plan"
+    if ! "${cmd[@]}" --validate_only True > "$plan"; then
+      cat "$plan" >&2
+      echo "Error: preflight failed for $split; fix the inputs above before launching Isaac Sim." >&2
+      exit 1
+    fi
+    return 0
+  fi
+  echo "Generating $split with $frames frames..."
+  "${cmd[@]}"
 }
 
-run_split train "$FRAMES_TRAIN" "$DISTRACTORS_TRAIN"
-run_split val   "$FRAMES_VAL"   "$DISTRACTORS_VAL"
-run_split test  "$FRAMES_TEST"  "$DISTRACTORS_TEST"
+if command -v python3 >/dev/null 2>&1; then
+  estimate_split train "$FRAMES_TRAIN" "$OUTPUT_PROFILE_TRAIN"
+  estimate_split val   "$FRAMES_VAL"   "$OUTPUT_PROFILE_VAL"
+  estimate_split test  "$FRAMES_TEST"  "$OUTPUT_PROFILE_TEST"
+fi
+
+if [[ "$PREFLIGHT" == "1" || "$PREFLIGHT" == "true" ]]; then
+  run_split train "$FRAMES_TRAIN" "$DISTRACTORS_TRAIN" "$OUTPUT_PROFILE_TRAIN" preflight
+  run_split val   "$FRAMES_VAL"   "$DISTRACTORS_VAL"   "$OUTPUT_PROFILE_VAL"   preflight
+  run_split test  "$FRAMES_TEST"  "$DISTRACTORS_TEST"  "$OUTPUT_PROFILE_TEST"  preflight
+fi
+
+run_split train "$FRAMES_TRAIN" "$DISTRACTORS_TRAIN" "$OUTPUT_PROFILE_TRAIN"
+run_split val   "$FRAMES_VAL"   "$DISTRACTORS_VAL"   "$OUTPUT_PROFILE_VAL"
+run_split test  "$FRAMES_TEST"  "$DISTRACTORS_TEST"  "$OUTPUT_PROFILE_TEST"
+
+if [[ "$RLE_MASKS" == "1" || "$RLE_MASKS" == "true" ]]; then
+  for split in train val test; do
+    [[ -d "$RUN_ROOT/$split" ]] || continue
+    rle_args=(--data_dir "$RUN_ROOT/$split")
+    [[ -n "$RLE_WORKERS" ]] && rle_args+=(--workers "$RLE_WORKERS")
+    [[ "$RLE_DELETE_MASKS" == "1" || "$RLE_DELETE_MASKS" == "true" ]] && rle_args+=(--delete_masks)
+    echo "Embedding RLE masks for $split..."
+    python3 "$SCRIPT_DIR/embed_rle_masks.py" "${rle_args[@]}"
+  done
+fi
+
+if [[ -n "$COPY_PASTE_MULTIPLIER" ]]; then
+  IFS=':' read -r -a cp_splits <<< "$COPY_PASTE_SPLITS"
+  for split in "${cp_splits[@]}"; do
+    [[ -z "$split" ]] && continue
+    cp_args=(--data_dir "$RUN_ROOT/$split" --multiplier "$COPY_PASTE_MULTIPLIER")
+    [[ -n "$COPY_PASTE_WORKERS" ]] && cp_args+=(--workers "$COPY_PASTE_WORKERS")
+    echo "Copy-paste augmentation for $split (x$COPY_PASTE_MULTIPLIER)..."
+    python3 "$SCRIPT_DIR/copy_paste_augment.py" "${cp_args[@]}"
+  done
+fi
+
+if [[ "$ADD_ASSETS" == "1" ]]; then
+  # Append the new frames/classes to OUT_ROOT; existing class ids stay unchanged
+  echo "Merging increment $INCREMENT_TAG into $OUT_ROOT..."
+  python3 "$SCRIPT_DIR/merge_increment.py" --out_root "$OUT_ROOT" --increment "$RUN_ROOT" \
+    --assets "${ASSETS[@]}" --classes "${CLASSES[@]}"
+  echo "Done. Added $(IFS=,; echo "${UNIQUE_CLASSES[*]}") to $OUT_ROOT (classes: $(paste -sd, "$OUT_ROOT/classes_unique.txt"))"
+  exit 0
+fi
 
 # Persist meta for training-time validation
 printf "%s\n" "${ASSETS[@]}" > "$OUT_ROOT/assets_used.txt"
 printf "%s\n" "${CLASSES[@]}" > "$OUT_ROOT/classes_per_asset.txt"
 printf "%s\n" "${UNIQUE_CLASSES[@]}" > "$OUT_ROOT/classes_unique.txt"
 
+# Each resolution variant is a complete OUT_ROOT of its own; give it the same meta files
+if [[ -n "$RESOLUTION_VARIANTS" ]]; then
+  IFS=',' read -r -a variant_specs <<< "${RESOLUTION_VARIANTS// /}"
+  for spec in "${variant_specs[@]}"; do
+    [[ -z "$spec" ]] && continue
+    variant_root="${OUT_ROOT%/}_${spec%%:*}"
+    mkdir -p "$variant_root"
+    cp "$OUT_ROOT/assets_used.txt" "$OUT_ROOT/classes_per_asset.txt" "$OUT_ROOT/classes_unique.txt" "$variant_root/"
+    echo "Resolution variant ${spec%%:*}: $variant_root"
+  done
+fi
+
 echo "Done. COCO split outputs in $OUT_ROOT"
@@ -23,6 +23,14 @@ OBJECT_SCALE=${OBJECT_SCALE:-""}
 WAREHOUSE_ROBOT_PATHS=${WAREHOUSE_ROBOT_PATHS:-""}
 WAREHOUSE_ROBOT_CONFIG=${WAREHOUSE_ROBOT_CONFIG:-""}
 WAREHOUSE_ROBOT_REPEAT=${WAREHOUSE_ROBOT_REPEAT:-""}
+ASSET_CACHE_DIR=${ASSET_CACHE_DIR:-""}
+ASSET_ROOT=${ASSET_ROOT:-""}
+# Queue directory of a running warm server (standalone_custom_sdg.py --serve); empty = launch Isaac Sim per pass.
+# The server is started with the ASSET_CACHE_DIR / ASSET_ROOT it should use.
+SDG_QUEUE=${SDG_QUEUE:-""}
+DAEMON_PATH="${ISAAC_SIM_PATH}/custom_sdg/sdg_daemon.py"
+# Validate-only preflight of every pass before the first Isaac Sim launch (PREFLIGHT=0 to skip)
+PREFLIGHT=${PREFLIGHT:-1}
 if [[ -z "$WAREHOUSE_ROBOT_CONFIG" ]]; then
   default_robots_cfg="${ISAAC_SIM_PATH}/custom_sdg/warehouse_robots.default.yaml"
   [[ -f "$default_robots_cfg" ]] && WAREHOUSE_ROBOT_CONFIG="$default_robots_cfg"
@@ -70,11 +78,13 @@ run_generation() {
   local name=$1
   local frames=$2
   local distractors=$3
+  local mode=${4:-"generate"}
   local asset_args=(--asset_paths)
   local class_args=(--object_classes)
   local pos_rot_args=()
   local scale_args=()
   local warehouse_robot_args=()
+  local asset_cache_args=()
   for a in "${ASSETS[@]}"; do asset_args+=("$a"); done
   for c in "${CLASSES[@]}"; do class_args+=("$c"); done
 
@@ -94,12 +104,10 @@ run_generation() {
       warehouse_robot_args+=(--warehouse_robot_paths "${robot_paths[@]}")
     fi
   fi
+  [[ -n "$ASSET_CACHE_DIR" ]] && asset_cache_args+=(--asset_cache_dir "$ASSET_CACHE_DIR")
+  [[ -n "$ASSET_ROOT" ]] && asset_cache_args+=(--asset_root "$ASSET_ROOT")
 
-  echo "Launching generation for ${name} (${frames} frames, distractors=${distractors})"
-  env -u CONDA_DEFAULT_ENV -u CONDA_PREFIX -u CONDA_PYTHON_EXE -u CONDA_SHLVL -u _CE_CONDA -u _CE_M \
-    ./python.sh "${SCRIPT_PATH}" \
-    --headless True \
-    --height 544 \
+  local job_args=(--height 544 \
     --width 960 \
     --num_frames "${frames}" \
     --distractors "${distractors}" \
@@ -110,9 +118,34 @@ run_generation() {
     --prim_prefix "${CUSTOM_PRIM_PREFIX}" \
     --fallback_count "${FALLBACK_COUNT}" \
     "${scale_args[@]}" \
-    "${pos_rot_args[@]}"
+    "${pos_rot_args[@]}")
+  local cmd=(env -u CONDA_DEFAULT_ENV -u CONDA_PREFIX -u CONDA_PYTHON_EXE -u CONDA_SHLVL -u _CE_CONDA -u _CE_M \
+    ./python.sh "${SCRIPT_PATH}" --headless True "${asset_cache_args[@]}" "${job_args[@]}")
+  if [[ "${mode}" == "preflight" ]]; then
+    local plan="${DATA_ROOT}/run_plan_${name}.json"
+    echo "Preflight ${name} (validate only) -> ${plan}"
+    if ! "${cmd[@]}" --validate_only True > "${plan}"; then
+      cat "${plan}" >&2
+      echo "Error: preflight failed for ${name}; fix the inputs above before launching Isaac Sim." >&2
+      exit 1
+    fi
+    return 0
+  fi
+  if [[ -n "$SDG_QUEUE" ]]; then
+    echo "Queueing generation for ${name} on the warm server at ${SDG_QUEUE} (${frames} frames, distractors=${distractors})"
+    python3 "${DAEMON_PATH}" submit "${SDG_QUEUE}" --name "${name}" --wait -- "${job_args[@]}"
+    return
+  fi
+  echo "Launching generation for ${name} (${frames} frames, distractors=${distractors})"
+  "${cmd[@]}"
 }
 
+if [[ "${PREFLIGHT}" == "1" || "${PREFLIGHT}" == "true" ]]; then
+  run_generation "distractors_warehouse" 2000 "warehouse" preflight
+  run_generation "distractors_additional" 2000 "additional" preflight
+  run_generation "no_distractors" 1000 "None" preflight
+fi
+
 run_generation "distractors_warehouse" 2000 "warehouse"
 run_generation "distractors_additional" 2000 "additional"
 run_generation "no_distractors" 1000 "None"
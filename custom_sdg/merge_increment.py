@@ -0,0 +1,279 @@
+#!/usr/bin/env python3
+"""
+Merge frames rendered for newly added assets/classes into an existing SDG output root.
+
+Why this exists:
+- Adding one asset used to mean re-rendering every split for all assets. Existing frames
+  stay valid: they never contained the new asset, so they are correct negatives for it.
+
+How it works (run by generate_sdg_splits.sh with ADD_ASSETS=1, which renders only the new
+assets into OUT_ROOT/increments/<tag>/<split>):
+1) classes: new class names are appended to classes_unique.txt, so every existing class
+   keeps its id (COCO id i+1, YOLO/TAO id i); the new assets/classes are appended to
+   assets_used.txt / classes_per_asset.txt.
+2) frames: each increment image is moved to <split>/Replicator/<tag>/<tag>_<name> (mask
+   images keep their names next to it) and appended to the split's COCO json with fresh
+   image/annotation ids and category ids remapped by class name. The previous json is kept
+   as <json>.pre_<tag>. If copy-paste already ran on the split, the increment's original
+   (non copy-paste) frames are also appended to <json>.pre_copypaste, the source of the next
+   copy_paste_augment.py run.
+3) labels: if the YOLO layout exists (labels/<split>), labels and image links are written for
+   the new frames only; old label files are unchanged because ids are stable. An existing
+   TAO <split>/coco_annotations.json, classmap.txt and my_dataset.yaml are refreshed.
+
+Usage:
+  python merge_increment.py --out_root $OUT_ROOT --increment $OUT_ROOT/increments/<tag> \
+      --assets /path/new.usd --classes new_class
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import shutil
+import time
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+from coco_masks import find_source_json
+from copy_paste_augment import BACKUP_SUFFIX
+from embed_rle_masks import mask_files_for
+from sdg_writers import LabelEmitter
+
+SPLITS = ("train", "val", "test")
+MERGE_LOG_NAME = "increments.json"
+
+
+def _read_lines(path: Path) -> List[str]:
+    if not path.exists():
+        return []
+    return [line.strip() for line in path.read_text().splitlines() if line.strip()]
+
+
+def _write_lines(path: Path, lines: List[str]) -> None:
+    path.write_text("\n".join(lines) + "\n")
+
+
+def _write_json(path: Path, data: dict) -> None:
+    tmp = path.with_name(path.name + ".tmp")
+    tmp.write_text(json.dumps(data))
+    os.replace(tmp, path)
+
+
+def _category_names(coco: dict) -> List[str]:
+    return [str(c["name"]) for c in sorted(coco.get("categories", []), key=lambda c: int(c["id"]))]
+
+
+def extend_classes(existing: List[str], new: List[str]) -> List[str]:
+    """`existing` followed by the names of `new` it does not contain yet (ids of `existing` never move)."""
+    merged = list(existing)
+    for name in new:
+        if name not in merged:
+            merged.append(name)
+    return merged
+
+
+def _remap_annotations(coco: dict, class_names: List[str]) -> List[dict]:
+    """Annotations of `coco` with category ids following `class_names` (1..N); unknown classes are dropped."""
+    name_to_id = {name: i + 1 for i, name in enumerate(class_names)}
+    old_to_new = {int(c["id"]): name_to_id.get(str(c["name"])) for c in coco.get("categories", [])}
+    return [
+        dict(a, category_id=old_to_new[int(a["category_id"])])
+        for a in coco.get("annotations", [])
+        if old_to_new.get(int(a["category_id"])) is not None
+    ]
+
+
+def _move(src: Path, dst: Path) -> None:
+    dst.parent.mkdir(parents=True, exist_ok=True)
+    shutil.move(str(src), str(dst))  # a rename when the increment lives on the same filesystem
+
+
+def _append_frames(
+    base: dict, inc: dict, file_names: Dict[int, str], class_names: List[str]
+) -> Tuple[dict, List[dict], int]:
+    """
+    `base` with categories following `class_names` plus the increment images in `file_names`
+    (increment image id -> new file_name) and their annotations, under fresh ids.
+    Returns (merged COCO dict, new image entries, number of new annotations).
+    """
+    merged = dict(base)
+    merged["categories"] = [{"id": i + 1, "name": name} for i, name in enumerate(class_names)]
+    merged["annotations"] = _remap_annotations(base, class_names)
+    merged["images"] = list(base.get("images", []))
+
+    next_img = max((int(im["id"]) for im in merged["images"]), default=-1) + 1
+    next_ann = max((int(a["id"]) for a in merged["annotations"]), default=-1) + 1
+    img_id_map = {}
+    new_images = []
+    for im in inc.get("images", []):
+        if im["id"] not in file_names:
+            continue
+        new_images.append(dict(im, id=next_img, file_name=file_names[im["id"]]))
+        img_id_map[im["id"]] = next_img
+        next_img += 1
+    merged["images"] += new_images
+
+    new_anns = []
+    for a in _remap_annotations(inc, class_names):
+        if a["image_id"] in img_id_map:
+            new_anns.append(dict(a, id=next_ann, image_id=img_id_map[a["image_id"]]))
+            next_ann += 1
+    merged["annotations"] += new_anns
+    return merged, new_images, len(new_anns)
+
+
+def merge_split(
+    base_dir: Path, inc_dir: Path, tag: str, class_names: List[str], dry_run: bool = False
+) -> Dict[str, object]:
+    """
+    Append the frames of the increment split `inc_dir` to the split `base_dir` (see module docstring).
+    Returns the merged COCO dict (key "coco") and the new image entries (key "new_images").
+    """
+    base_json = find_source_json(base_dir)
+    base = json.loads(base_json.read_text())
+    inc_json = find_source_json(inc_dir)
+    inc = json.loads(inc_json.read_text())
+
+    file_names = {}
+    for im in inc.get("images", []):
+        rel = Path(im["file_name"])
+        parts = rel.parts[1:] if rel.parts and rel.parts[0] == "Replicator" else rel.parts
+        sub = Path(*parts[:-1]) if len(parts) > 1 else Path()
+        dst_rel = Path("Replicator") / tag / sub / f"{tag}_{rel.name}"
+        if not dry_run:
+            src = inc_dir / rel
+            for mask in mask_files_for(src):
+                _move(mask, base_dir / dst_rel.parent / mask.name)
+            _move(src, base_dir / dst_rel)
+        file_names[im["id"]] = dst_rel.as_posix()
+    merged, new_images, n_anns = _append_frames(base, inc, file_names, class_names)
+
+    # copy_paste_augment rebuilds the split from <json>.pre_copypaste on re-runs; without the
+    # increment's original frames there, the next run would silently drop them again
+    cp_backup = base_json.with_name(base_json.name + BACKUP_SUFFIX)
+    cp_merged = None
+    if cp_backup.exists():
+        inc_backup = inc_json.with_name(inc_json.name + BACKUP_SUFFIX)
+        originals = None
+        if inc_backup.exists():
+            originals = {im["id"] for im in json.loads(inc_backup.read_text()).get("images", [])}
+        cp_merged, _, _ = _append_frames(
+            json.loads(cp_backup.read_text()),
+            inc,
+            {i: f for i, f in file_names.items() if originals is None or i in originals},
+            class_names,
+        )
+
+    if not dry_run:
+        for path, data in ((base_json, merged), (cp_backup, cp_merged)):
+            if data is None:
+                continue
+            backup = path.with_name(f"{path.name}.pre_{tag}")
+            if not backup.exists():
+                shutil.copy2(path, backup)
+            _write_json(path, data)
+    return {
+        "coco": merged,
+        "json": base_json,
+        "new_images": new_images,
+        "new_annotations": n_anns,
+        "copy_paste_source": cp_backup if cp_merged is not None else None,
+    }
+
+
+def _write_dataset_yaml(path: Path, class_names: List[str]) -> None:
+    """Replace the `names:` list of an existing my_dataset.yaml (other keys are kept)."""
+    head = []
+    for line in path.read_text().splitlines():
+        if line.startswith("names:"):
+            break
+        head.append(line)
+    _write_lines(path, head + ["names:"] + [f"  - {name}" for name in class_names])
+
+
+def merge_increment(
+    out_root, increment, assets: Optional[List[str]] = None, classes: Optional[List[str]] = None,
+    dry_run: bool = False, log=print,
+) -> dict:
+    """Merge every split of `increment` into `out_root` and update meta/label files. Returns stats."""
+    root = Path(out_root).expanduser().resolve()
+    inc_root = Path(increment).expanduser().resolve()
+    tag = inc_root.name
+    merge_log_path = root / MERGE_LOG_NAME
+    merge_log = json.loads(merge_log_path.read_text()) if merge_log_path.exists() else []
+    if any(entry.get("tag") == tag for entry in merge_log):
+        raise SystemExit(f"[merge] increment '{tag}' was already merged into {root}")
+
+    old_classes = _read_lines(root / "classes_unique.txt")
+    if not old_classes:
+        old_classes = _category_names(json.loads(find_source_json(root / "train").read_text()))
+    splits = [s for s in SPLITS if (inc_root / s).is_dir()]
+    if not splits:
+        raise SystemExit(f"[merge] no train/val/test directories under {inc_root}")
+    new_names = list(classes or [])
+    for split in splits:
+        new_names += _category_names(json.loads(find_source_json(inc_root / split).read_text()))
+    class_names = extend_classes(old_classes, new_names)
+    added = class_names[len(old_classes):]
+    log(f"[merge] classes: {len(old_classes)} existing, added {added or 'none'} (existing ids unchanged)")
+
+    stats = {"tag": tag, "classes_added": added, "merged": time.time(), "splits": {}}
+    tao_classmap = False
+    for split in splits:
+        base_dir = root / split
+        result = merge_split(base_dir, inc_root / split, tag, class_names, dry_run)
+        new_images = result["new_images"]
+        stats["splits"][split] = {"images": len(new_images), "annotations": result["new_annotations"]}
+        log(f"[merge] {split}: +{len(new_images)} frame(s), +{result['new_annotations']} annotation(s) -> {result['json']}")
+        if result["copy_paste_source"] is not None:
+            log(f"[merge] {split}: appended the original increment frames to {result['copy_paste_source']}")
+        if dry_run:
+            continue
+        labels_dir = root / "labels" / split
+        tao_path = base_dir / "coco_annotations.json"
+        emitter = LabelEmitter(
+            class_names,
+            yolo_labels_dir=str(labels_dir) if labels_dir.is_dir() else None,
+            yolo_images_dir=str(root / "images" / split) if labels_dir.is_dir() else None,
+            tao_coco_path=str(tao_path) if tao_path.exists() else None,
+        )
+        if labels_dir.is_dir():
+            emitter.emit_from_coco(dict(result["coco"], images=new_images), str(base_dir))
+            log(f"[merge] {split}: wrote {len(new_images)} YOLO label(s) in {labels_dir}")
+        if tao_path.exists():
+            emitter.finalize(result["coco"])
+            tao_classmap = True
+            log(f"[merge] {split}: refreshed {tao_path}")
+
+    if dry_run:
+        return stats
+    _write_lines(root / "classes_unique.txt", class_names)
+    if assets:
+        _write_lines(root / "assets_used.txt", _read_lines(root / "assets_used.txt") + list(assets))
+    if classes:
+        _write_lines(root / "classes_per_asset.txt", _read_lines(root / "classes_per_asset.txt") + list(classes))
+    if tao_classmap or (root / "classmap.txt").exists():
+        _write_lines(root / "classmap.txt", class_names)
+    if (root / "my_dataset.yaml").exists():
+        _write_dataset_yaml(root / "my_dataset.yaml", class_names)
+    merge_log_path.write_text(json.dumps(merge_log + [stats], indent=2))
+    return stats
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser(description="Merge frames rendered for new assets into an existing SDG output root.")
+    ap.add_argument("--out_root", required=True, help="Existing output root (train/val/test + meta files).")
+    ap.add_argument("--increment", required=True, help="Increment root holding train/val/test of the new assets.")
+    ap.add_argument("--assets", nargs="*", default=[], help="New asset paths (appended to assets_used.txt).")
+    ap.add_argument("--classes", nargs="*", default=[], help="Class per new asset (appended to classes_per_asset.txt).")
+    ap.add_argument("--dry_run", action="store_true", help="Report the merge without moving or writing anything.")
+    args = ap.parse_args()
+    if args.assets and args.classes and len(args.assets) != len(args.classes):
+        ap.error("--assets and --classes must have the same length")
+    merge_increment(args.out_root, args.increment, args.assets, args.classes, args.dry_run)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,140 @@
+#!/usr/bin/env python3
+"""
+Named writer output profiles and a rough disk / write-time estimate per profile.
+
+Profiles:
+- detection:    RGB + tight 2D bboxes (all the YOLO and RT-DETR paths need).
+- segmentation: detection + instance masks.
+- full:         detection + semantic + instance masks (the historic CocoWriter setup).
+
+Plain Python on purpose: generate_sdg_splits.sh prints the estimates with the system
+python before any Isaac Sim launch, and standalone_custom_sdg.py reuses them in its run plan.
+
+Usage:
+  python3 output_profiles.py --width 640 --height 640 --frames 2500 --profile detection
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+from typing import Dict, Iterable, Optional, Tuple
+
+# Writer outputs enabled by each profile (names match the CocoWriter write_<name> toggles).
+OUTPUT_PROFILES: Dict[str, Tuple[str, ...]] = {
+    "detection": ("rgb", "bbox_2d_tight"),
+    "segmentation": ("rgb", "bbox_2d_tight", "instance"),
+    "full": ("rgb", "bbox_2d_tight", "semantic", "instance"),
+}
+DEFAULT_PROFILE = "full"
+
+# Rough per-frame output size estimates (bytes per pixel) for the writer outputs.
+# Ray-traced RGB compresses poorly; semantic/instance PNGs are mostly flat colors.
+OUTPUT_BYTES_PER_PIXEL = {"rgb": 1.6, "semantic": 0.12, "instance": 0.15}
+ANNOTATION_BYTES_PER_INSTANCE = 300
+# Rough single-core PNG encode cost (seconds per megapixel) for each image output.
+OUTPUT_ENCODE_SECONDS_PER_MPIX = {"rgb": 0.045, "semantic": 0.012, "instance": 0.015}
+DEFAULT_DISK_WRITE_MBPS = 200.0
+
+
+def profile_outputs(profile: str) -> Tuple[str, ...]:
+    if profile not in OUTPUT_PROFILES:
+        raise ValueError(f"Unknown output profile '{profile}' (expected one of: {', '.join(OUTPUT_PROFILES)})")
+    return OUTPUT_PROFILES[profile]
+
+
+def estimate_output_bytes(width: int, height: int, num_frames: int, outputs, instances_per_frame: int) -> dict:
+    """Estimate bytes written for `num_frames` frames of the given writer outputs."""
+    pixels = int(width) * int(height)
+    per_frame = {name: int(pixels * OUTPUT_BYTES_PER_PIXEL[name]) for name in outputs if name in OUTPUT_BYTES_PER_PIXEL}
+    per_frame["annotations"] = int(instances_per_frame * ANNOTATION_BYTES_PER_INSTANCE)
+    frame_bytes = sum(per_frame.values())
+    return {
+        "bytes_per_frame": per_frame,
+        "total_bytes": frame_bytes * int(num_frames),
+        "total_gib": round(frame_bytes * int(num_frames) / float(1 << 30), 3),
+    }
+
+
+def estimate_write_seconds(
+    width: int,
+    height: int,
+    num_frames: int,
+    outputs: Iterable[str],
+    total_bytes: int,
+    writer_workers: int = 1,
+    disk_write_mbps: float = DEFAULT_DISK_WRITE_MBPS,
+) -> dict:
+    """
+    Estimate time spent encoding and writing outputs. Encoding is spread over
+    `writer_workers` threads; disk bandwidth is shared.
+    """
+    mpix = int(width) * int(height) / 1e6
+    encode_per_frame = sum(OUTPUT_ENCODE_SECONDS_PER_MPIX.get(name, 0.0) * mpix for name in outputs)
+    encode_total = encode_per_frame * int(num_frames) / max(1, int(writer_workers))
+    disk_total = total_bytes / (max(disk_write_mbps, 1e-6) * 1e6)
+    # Encode and disk I/O overlap once several frames are in flight; the slower one bounds the run.
+    total = max(encode_total, disk_total) if writer_workers > 1 else encode_total + disk_total
+    return {
+        "encode_seconds": round(encode_total, 1),
+        "disk_seconds": round(disk_total, 1),
+        "total_seconds": round(total, 1),
+    }
+
+
+def estimate_profile(
+    profile: str,
+    width: int,
+    height: int,
+    num_frames: int,
+    instances_per_frame: int,
+    writer_workers: int = 1,
+    disk_write_mbps: float = DEFAULT_DISK_WRITE_MBPS,
+) -> dict:
+    outputs = profile_outputs(profile)
+    disk = estimate_output_bytes(width, height, num_frames, outputs, instances_per_frame)
+    disk["write_time"] = estimate_write_seconds(
+        width, height, num_frames, outputs, disk["total_bytes"], writer_workers, disk_write_mbps
+    )
+    disk["profile"] = profile
+    disk["outputs"] = list(outputs)
+    return disk
+
+
+def format_table(estimates: Dict[str, dict], selected: Optional[str] = None) -> str:
+    lines = [f"  {'profile':<14}{'outputs':<40}{'disk (GiB)':>12}{'write (s)':>12}"]
+    for name, est in estimates.items():
+        mark = "*" if name == selected else " "
+        lines.append(
+            f"{mark} {name:<14}{'+'.join(est['outputs']):<40}{est['total_gib']:>12.2f}"
+            f"{est['write_time']['total_seconds']:>12.1f}"
+        )
+    return "\n".join(lines)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Estimate SDG disk usage and write time per output profile.")
+    parser.add_argument("--width", type=int, required=True)
+    parser.add_argument("--height", type=int, required=True)
+    parser.add_argument("--frames", type=int, required=True)
+    parser.add_argument("--instances", type=int, default=2, help="Annotated instances per frame.")
+    parser.add_argument("--writer_workers", type=int, default=1)
+    parser.add_argument("--disk_write_mbps", type=float, default=DEFAULT_DISK_WRITE_MBPS)
+    parser.add_argument("--profile", choices=sorted(OUTPUT_PROFILES), default=None, help="Profile to mark as selected.")
+    parser.add_argument("--json", action="store_true", help="Print JSON instead of a table.")
+    args = parser.parse_args()
+
+    estimates = {
+        name: estimate_profile(
+            name, args.width, args.height, args.frames, args.instances, args.writer_workers, args.disk_write_mbps
+        )
+        for name in OUTPUT_PROFILES
+    }
+    if args.json:
+        print(json.dumps(estimates, indent=2))
+    else:
+        print(format_table(estimates, args.profile))
+
+
+if __name__ == "__main__":
+    main()
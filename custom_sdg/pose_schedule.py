@@ -0,0 +1,354 @@
+#!/usr/bin/env python3
+"""
+Pre-sampled per-frame pose schedules for standalone_custom_sdg.py (NumPy only, no Kit).
+
+Instead of drawing poses inside the Replicator graph (rep.distribution.uniform), every
+camera / object / distractor pose of a run is sampled up front from the parsed ranges,
+saved to an npz, and fed to Replicator by frame index (rep.distribution.sequence).
+
+Reproducibility and sharding:
+- Each field (cam_pos, obj_pos, ...) has its own random stream derived from
+  (seed, field name, block of BLOCK_FRAMES frames). A frame's poses therefore depend only
+  on the seed, the field, the frame's *global* index and the prim count of that field,
+  so runs started at different `frame_offset`s cover disjoint, exactly reproducible slices
+  of one global schedule.
+
+Samplers:
+- uniform: independent uniform draws.
+- halton:  scrambled Halton sequence (NumPy; random digit permutations per dimension). Best for
+           few dimensions, e.g. camera position or small object pools.
+- sobol:   scrambled Sobol sequence (scipy.stats.qmc; ships with Isaac Sim python).
+Low-discrepancy samplers index the sequence by global frame, so sharding stays exact.
+`coverage_report` measures how evenly a schedule fills its ranges (voxel occupancy and
+centered L2 discrepancy), to compare samplers at equal frame counts.
+
+Schedule arrays:
+- frame_index: (N,)           global frame indices
+- <field>:     (N, 3)         per-frame fields (count == 0, e.g. cam_pos)
+               (N, count, 3)  per-prim fields (object / distractor poses)
+
+Usage:
+  python pose_schedule.py inspect <data_dir>/pose_schedule.npz
+  python pose_schedule.py coverage <data_dir>/pose_schedule.npz --frames 250,500,1000
+  python pose_schedule.py sample --sampler sobol --frames 1000 \
+      --field cam_pos=-0.75,-0.75,0.75,0.75,0.75,1.0 --out /tmp/sobol.npz
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import math
+import warnings
+import zlib
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+BLOCK_FRAMES = 256
+SCHEDULE_VERSION = 1
+
+
+class PoseField:
+    """
+    One sampled pose attribute.
+    - lo/hi: per-axis range (3-vectors) as returned by _parse_vec3_range.
+    - count: prims sampled per frame; 0 means one value per frame (camera).
+    - uniform_scale: one scalar per sample broadcast to xyz (scalar --object_scale ranges).
+    """
+
+    def __init__(self, name: str, lo, hi, count: int = 0, uniform_scale: bool = False):
+        self.name = name
+        self.lo = np.broadcast_to(np.asarray(lo, dtype=np.float64), (3,)).copy()
+        self.hi = np.broadcast_to(np.asarray(hi, dtype=np.float64), (3,)).copy()
+        self.count = int(count)
+        self.uniform_scale = bool(uniform_scale)
+
+    @property
+    def components(self) -> int:
+        return 1 if self.uniform_scale else 3
+
+    @property
+    def dims(self) -> int:
+        """Unit-cube dimensions consumed per frame."""
+        return max(1, self.count) * self.components
+
+    def stream_key(self) -> int:
+        return zlib.crc32(self.name.encode("utf-8"))
+
+    def to_meta(self) -> dict:
+        return {
+            "name": self.name,
+            "lo": self.lo.tolist(),
+            "hi": self.hi.tolist(),
+            "count": self.count,
+            "uniform_scale": self.uniform_scale,
+        }
+
+    def scale_unit(self, unit: np.ndarray) -> np.ndarray:
+        """Map (N, dims) unit samples to (N, 3) or (N, count, 3) values in [lo, hi]."""
+        n = unit.shape[0]
+        u = unit.reshape(n, max(1, self.count), self.components)
+        if self.uniform_scale:
+            # Scalar ranges have lo/hi equal across axes; sample once, apply to xyz
+            u = np.repeat(u, 3, axis=-1)
+        values = self.lo + u * (self.hi - self.lo)
+        return values if self.count else values[:, 0, :]
+
+
+def _uniform_unit(field: PoseField, seed: int, frame_offset: int, num_frames: int) -> np.ndarray:
+    """(num_frames, dims) uniform samples for global frames [frame_offset, frame_offset + num_frames)."""
+    first_block = frame_offset // BLOCK_FRAMES
+    last_block = (frame_offset + num_frames - 1) // BLOCK_FRAMES
+    blocks = [
+        np.random.default_rng([seed, field.stream_key(), block]).random((BLOCK_FRAMES, field.dims))
+        for block in range(first_block, last_block + 1)
+    ]
+    start = frame_offset - first_block * BLOCK_FRAMES
+    return np.concatenate(blocks, axis=0)[start : start + num_frames]
+
+
+def _first_primes(n: int) -> List[int]:
+    primes: List[int] = []
+    candidate = 2
+    while len(primes) < n:
+        if all(candidate % p for p in primes if p * p <= candidate):
+            primes.append(candidate)
+        candidate += 1
+    return primes
+
+
+def _halton_unit(field: PoseField, seed: int, frame_offset: int, num_frames: int) -> np.ndarray:
+    """Scrambled Halton points for global frames [frame_offset, frame_offset + num_frames)."""
+    rng = np.random.default_rng([seed, field.stream_key()])
+    # Skip index 0 (the origin in every dimension)
+    index = np.arange(frame_offset + 1, frame_offset + num_frames + 1, dtype=np.int64)
+    out = np.empty((num_frames, field.dims), dtype=np.float64)
+    for d, base in enumerate(_first_primes(field.dims)):
+        n_digits = max(1, math.ceil(52 / math.log2(base)))
+        perms = np.array([rng.permutation(base) for _ in range(n_digits)])
+        value = np.zeros(num_frames, dtype=np.float64)
+        rest = index.copy()
+        scale = 1.0 / base
+        for k in range(n_digits):
+            value += perms[k][rest % base] * scale
+            rest //= base
+            scale /= base
+        out[:, d] = value
+    return np.minimum(out, np.nextafter(1.0, 0.0))
+
+
+def _sobol_unit(field: PoseField, seed: int, frame_offset: int, num_frames: int) -> np.ndarray:
+    """Scrambled Sobol points for global frames [frame_offset, frame_offset + num_frames)."""
+    try:
+        from scipy.stats import qmc
+    except ImportError as exc:
+        raise RuntimeError("--pose_sampler sobol needs scipy (scipy.stats.qmc)") from exc
+    engine = qmc.Sobol(d=field.dims, scramble=True, seed=np.random.default_rng([seed, field.stream_key()]))
+    if frame_offset:
+        engine.fast_forward(frame_offset)
+    with warnings.catch_warnings():
+        # Balance properties hold for powers of two; other frame counts are still fine for sampling
+        warnings.simplefilter("ignore", UserWarning)
+        return engine.random(num_frames)
+
+
+# Unit-cube samplers: fn(field, seed, frame_offset, num_frames) -> (num_frames, field.dims) in [0, 1)
+SAMPLERS = {
+    "uniform": _uniform_unit,
+    "halton": _halton_unit,
+    "sobol": _sobol_unit,
+}
+
+
+def build_pose_schedule(
+    fields: Sequence[PoseField],
+    num_frames: int,
+    seed: int = 0,
+    frame_offset: int = 0,
+    sampler: str = "uniform",
+) -> Dict[str, np.ndarray]:
+    """Sample every field for `num_frames` frames starting at global frame `frame_offset`."""
+    if sampler not in SAMPLERS:
+        raise ValueError(f"Unknown pose sampler '{sampler}' (expected one of: {', '.join(SAMPLERS)})")
+    if num_frames <= 0:
+        raise ValueError(f"num_frames must be > 0 (got {num_frames})")
+    if frame_offset < 0:
+        raise ValueError(f"frame_offset must be >= 0 (got {frame_offset})")
+    schedule = {"frame_index": np.arange(frame_offset, frame_offset + num_frames, dtype=np.int64)}
+    for field in fields:
+        unit = SAMPLERS[sampler](field, seed, frame_offset, num_frames)
+        schedule[field.name] = field.scale_unit(unit).astype(np.float32)
+    return schedule
+
+
+def schedule_meta(fields: Sequence[PoseField], seed: int, frame_offset: int, sampler: str) -> dict:
+    return {
+        "version": SCHEDULE_VERSION,
+        "sampler": sampler,
+        "seed": int(seed),
+        "frame_offset": int(frame_offset),
+        "fields": [f.to_meta() for f in fields],
+    }
+
+
+def save_pose_schedule(path: str, schedule: Dict[str, np.ndarray], meta: dict) -> None:
+    np.savez_compressed(path, __meta__=np.array(json.dumps(meta)), **schedule)
+
+
+def load_pose_schedule(path: str) -> Tuple[Dict[str, np.ndarray], dict]:
+    with np.load(path, allow_pickle=False) as data:
+        meta = json.loads(str(data["__meta__"])) if "__meta__" in data.files else {}
+        schedule = {k: data[k] for k in data.files if k != "__meta__"}
+    return schedule, meta
+
+
+def check_schedule(
+    schedule: Dict[str, np.ndarray], fields: Sequence[PoseField], num_frames: int
+) -> List[str]:
+    """Shape mismatches between a loaded schedule and the current scene (empty list when usable)."""
+    errors = []
+    if len(schedule.get("frame_index", ())) < num_frames:
+        errors.append(f"schedule has {len(schedule.get('frame_index', ()))} frames, need {num_frames}")
+    for field in fields:
+        arr = schedule.get(field.name)
+        expected = (3,) if field.count == 0 else (field.count, 3)
+        if arr is None:
+            errors.append(f"schedule is missing '{field.name}'")
+        elif tuple(arr.shape[1:]) != expected:
+            errors.append(f"'{field.name}' has per-frame shape {tuple(arr.shape[1:])}, expected {expected}")
+    return errors
+
+
+def as_sequence(values: np.ndarray, num_frames: Optional[int] = None) -> List[Tuple[float, float, float]]:
+    """
+    Flatten a schedule field into the order a Replicator sequence distribution consumes it:
+    frame by frame, and within a frame prim by prim.
+    """
+    arr = values if num_frames is None else values[:num_frames]
+    return [tuple(float(v) for v in row) for row in arr.reshape(-1, 3)]
+
+
+# ---------- coverage ----------
+
+COVERAGE_FIELDS = ("cam_pos", "obj_pos", "obj_rot")
+MAX_DISCREPANCY_POINTS = 2048
+
+
+def _unit_points(values: np.ndarray, lo: np.ndarray, hi: np.ndarray) -> np.ndarray:
+    """Normalize samples to [0, 1] over the axes that actually vary."""
+    pts = values.reshape(-1, 3).astype(np.float64)
+    span = hi - lo
+    active = span > 0
+    return (pts[:, active] - lo[active]) / span[active]
+
+
+def centered_l2_discrepancy(points: np.ndarray) -> float:
+    """Hickernell's centered L2 discrepancy of points in [0, 1]^d (lower is more even)."""
+    n, d = points.shape
+    if n == 0 or d == 0:
+        return 0.0
+    z = np.abs(points - 0.5)
+    term1 = (13.0 / 12.0) ** d
+    term2 = (2.0 / n) * np.prod(1.0 + 0.5 * z - 0.5 * z**2, axis=1).sum()
+    pair = 1.0 + 0.5 * z[:, None, :] + 0.5 * z[None, :, :] - 0.5 * np.abs(points[:, None, :] - points[None, :, :])
+    term3 = np.prod(pair, axis=2).sum() / (n * n)
+    return float(np.sqrt(max(term1 - term2 + term3, 0.0)))
+
+
+def voxel_occupancy(points: np.ndarray, bins: Optional[int] = None) -> Tuple[float, int]:
+    """Fraction of grid cells holding at least one point; `bins` per axis defaults to ~1 point per cell."""
+    n, d = points.shape
+    if n == 0 or d == 0:
+        return 0.0, 0
+    if bins is None:
+        bins = int(max(2, min(64, math.floor(n ** (1.0 / d)))))
+    cells = np.minimum((points * bins).astype(np.int64), bins - 1)
+    flat = np.ravel_multi_index(cells.T, (bins,) * d)
+    return float(np.unique(flat).size / float(bins**d)), bins
+
+
+def coverage_report(
+    schedule: Dict[str, np.ndarray], meta: dict, num_frames: Optional[int] = None, bins: Optional[int] = None
+) -> Dict[str, dict]:
+    """Per-field coverage of the first `num_frames` frames (all frames when None)."""
+    ranges = {f["name"]: f for f in meta.get("fields", [])}
+    report = {}
+    for name in COVERAGE_FIELDS:
+        if name not in schedule or name not in ranges:
+            continue
+        values = schedule[name][:num_frames] if num_frames else schedule[name]
+        pts = _unit_points(values, np.asarray(ranges[name]["lo"]), np.asarray(ranges[name]["hi"]))
+        occupancy, used_bins = voxel_occupancy(pts, bins)
+        report[name] = {
+            "points": int(pts.shape[0]),
+            "dims": int(pts.shape[1]),
+            "bins_per_axis": used_bins,
+            "voxel_occupancy": round(occupancy, 4),
+            "cl2_discrepancy": round(centered_l2_discrepancy(pts[:MAX_DISCREPANCY_POINTS]), 6),
+        }
+    return report
+
+
+def _parse_field_arg(value: str) -> PoseField:
+    name, _, nums = value.partition("=")
+    vals = [float(v) for v in nums.replace(":", ",").split(",") if v]
+    if len(vals) == 2:
+        return PoseField(name, (vals[0],) * 3, (vals[1],) * 3)
+    if len(vals) == 6:
+        return PoseField(name, vals[:3], vals[3:])
+    raise argparse.ArgumentTypeError(f"--field expects NAME=min,max or NAME=x1,y1,z1,x2,y2,z2 (got '{value}')")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Inspect, sample and score SDG pose schedules.")
+    sub = parser.add_subparsers(dest="command", required=True)
+    ins = sub.add_parser("inspect", help="Print meta, shapes and per-field ranges.")
+    ins.add_argument("npz")
+    cov = sub.add_parser("coverage", help="Voxel occupancy and discrepancy of cam_pos/obj_pos/obj_rot.")
+    cov.add_argument("npz", nargs="+")
+    cov.add_argument("--frames", type=str, default="", help="Comma-separated frame-count prefixes to score.")
+    cov.add_argument("--bins", type=int, default=None, help="Grid cells per axis (default: ~1 point per cell).")
+    smp = sub.add_parser("sample", help="Sample a per-frame schedule without Isaac Sim (for sampler comparisons).")
+    smp.add_argument("--sampler", choices=sorted(SAMPLERS), default="uniform")
+    smp.add_argument("--frames", type=int, required=True)
+    smp.add_argument("--seed", type=int, default=0)
+    smp.add_argument("--frame_offset", type=int, default=0)
+    smp.add_argument("--field", type=_parse_field_arg, action="append", required=True)
+    smp.add_argument("--out", required=True)
+    args = parser.parse_args()
+
+    if args.command == "sample":
+        schedule = build_pose_schedule(args.field, args.frames, args.seed, args.frame_offset, args.sampler)
+        save_pose_schedule(args.out, schedule, schedule_meta(args.field, args.seed, args.frame_offset, args.sampler))
+        print(f"Wrote {args.out}")
+        return
+    if args.command == "coverage":
+        prefixes = [int(v) for v in args.frames.split(",") if v] or [None]
+        result = {}
+        for path in args.npz:
+            schedule, meta = load_pose_schedule(path)
+            result[path] = {
+                str(n or len(schedule["frame_index"])): coverage_report(schedule, meta, n, args.bins) for n in prefixes
+            }
+        print(json.dumps(result, indent=2))
+        return
+
+    schedule, meta = load_pose_schedule(args.npz)
+    report = {"meta": meta, "fields": {}}
+    for name, arr in schedule.items():
+        if name == "frame_index":
+            report["frames"] = [int(arr[0]), int(arr[-1])] if len(arr) else []
+            continue
+        flat = arr.reshape(-1, 3)
+        report["fields"][name] = {
+            "shape": list(arr.shape),
+            "min": flat.min(axis=0).round(4).tolist(),
+            "max": flat.max(axis=0).round(4).tolist(),
+            "mean": flat.mean(axis=0).round(4).tolist(),
+        }
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,390 @@
+#!/usr/bin/env python3
+"""
+File-queue protocol and job loop for a warm SDG server (no Kit imports).
+
+`standalone_custom_sdg.py --serve QUEUE_DIR` starts Isaac Sim once, loads the warehouse
+stage and then runs generation jobs from QUEUE_DIR one after another. This module holds
+everything that does not need Kit, so the protocol and the scheduling can be exercised
+with the fake backend:
+
+  QUEUE_DIR/
+    pending/<seq>-<name>.json   submitted jobs, run in submission order
+    running/                    the job being rendered (claimed with an atomic rename)
+    done/ failed/               finished jobs: spec + status, timings, result or error
+    server.json                 server heartbeat (pid, state, current job, counters)
+    stop                        ask the server to exit after the current job
+
+A job spec is the standalone CLI as JSON, either raw or with shorthands:
+  {"name": "train", "argv": ["--num_frames", "100", ...]}
+  {"name": "train", "assets": ["/a.usd"], "classes": ["box"], "frames": 100,
+   "data_dir": "/out/train", "distractors": "warehouse", "args": {"cam_pos": "..."}}
+
+Usage:
+  python3 sdg_daemon.py submit QUEUE --name train --wait -- --asset_paths /a.usd --num_frames 100 --data_dir /out/train
+  python3 sdg_daemon.py status QUEUE
+  python3 sdg_daemon.py stop QUEUE
+  python3 sdg_daemon.py serve QUEUE --fake       # protocol test without Isaac Sim
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import re
+import sys
+import time
+from pathlib import Path
+from typing import Callable, List, Optional
+
+QUEUE_STATES = ("pending", "running", "done", "failed")
+SERVER_FILE = "server.json"
+STOP_FILE = "stop"
+
+# Job spec shorthands -> standalone_custom_sdg.py flags
+SPEC_FLAGS = {
+    "assets": "--asset_paths",
+    "classes": "--object_classes",
+    "frames": "--num_frames",
+    "data_dir": "--data_dir",
+    "distractors": "--distractors",
+    "width": "--width",
+    "height": "--height",
+}
+# Fixed when Kit starts; a job cannot change them on a warm server.
+SERVER_ONLY_FLAGS = (
+    "--headless",
+    "--serve",
+    "--serve_idle_timeout",
+    "--validate_only",
+    "--localize_assets",
+    "--asset_cache_dir",
+    "--asset_root",
+)
+
+
+def _flag_values(value) -> List[str]:
+    if isinstance(value, bool):
+        return [str(value)]
+    if isinstance(value, (list, tuple)):
+        return [str(v) for v in value]
+    return [str(value)]
+
+
+def job_argv(spec: dict) -> List[str]:
+    """Standalone CLI arguments of a job spec (shorthands first, then "args", then raw "argv")."""
+    argv: List[str] = []
+    for key, flag in SPEC_FLAGS.items():
+        if spec.get(key) is not None:
+            argv += [flag] + _flag_values(spec[key])
+    for key, value in (spec.get("args") or {}).items():
+        if value is None:
+            continue
+        argv += [key if key.startswith("--") else f"--{key}"] + _flag_values(value)
+    argv += [str(a) for a in spec.get("argv") or []]
+    return argv
+
+
+def argv_value(argv: List[str], flag: str, default: Optional[str] = None) -> Optional[str]:
+    """Last value given for `flag` (argparse semantics for single-value flags)."""
+    value = default
+    for i, arg in enumerate(argv):
+        if arg == flag and i + 1 < len(argv):
+            value = argv[i + 1]
+        elif arg.startswith(flag + "="):
+            value = arg.split("=", 1)[1]
+    return value
+
+
+def validate_spec(spec: dict) -> List[str]:
+    errors = []
+    if not isinstance(spec, dict):
+        return ["job spec must be a JSON object"]
+    unknown = set(spec) - set(SPEC_FLAGS) - {"name", "args", "argv", "fake_fail"}
+    if unknown:
+        errors.append(f"unknown job spec keys: {', '.join(sorted(unknown))}")
+    argv = job_argv(spec)
+    for flag in SERVER_ONLY_FLAGS:
+        if any(a == flag or a.startswith(flag + "=") for a in argv):
+            errors.append(f"{flag} is fixed by the server and cannot be set per job")
+    if not argv_value(argv, "--data_dir"):
+        errors.append("job needs an output directory (data_dir / --data_dir)")
+    return errors
+
+
+class JobQueue:
+    """Directory-backed FIFO. Claims are atomic renames, so a job runs at most once."""
+
+    def __init__(self, root):
+        self.root = Path(root).expanduser().resolve()
+        for state in QUEUE_STATES:
+            (self.root / state).mkdir(parents=True, exist_ok=True)
+
+    def _dir(self, state: str) -> Path:
+        return self.root / state
+
+    def submit(self, spec: dict, name: Optional[str] = None) -> str:
+        errors = validate_spec(spec)
+        if errors:
+            raise ValueError("; ".join(errors))
+        name = re.sub(r"[^A-Za-z0-9_.-]+", "_", name or spec.get("name") or "job")
+        job_id = f"{time.time_ns():020d}-{name}"
+        tmp = self._dir("pending") / f".{job_id}.tmp"
+        tmp.write_text(json.dumps(dict(spec, name=name, submitted=time.time()), indent=2))
+        os.replace(tmp, self._dir("pending") / f"{job_id}.json")
+        return job_id
+
+    def jobs(self, state: str) -> List[str]:
+        return sorted(p.stem for p in self._dir(state).glob("*.json"))
+
+    def claim(self) -> Optional[dict]:
+        """Move the oldest pending job to running/ and return it, or None when the queue is empty."""
+        for job_id in self.jobs("pending"):
+            src = self._dir("pending") / f"{job_id}.json"
+            dst = self._dir("running") / f"{job_id}.json"
+            try:
+                os.rename(src, dst)
+            except FileNotFoundError:
+                continue  # claimed by someone else
+            job = json.loads(dst.read_text())
+            job["job_id"] = job_id
+            return job
+        return None
+
+    def finish(self, job: dict, state: str, **fields) -> Path:
+        if state not in ("done", "failed"):
+            raise ValueError(f"finish state must be 'done' or 'failed', got '{state}'")
+        record = dict(job, status=state, **fields)
+        dst = self._dir(state) / f"{job['job_id']}.json"
+        dst.write_text(json.dumps(record, indent=2))
+        (self._dir("running") / f"{job['job_id']}.json").unlink(missing_ok=True)
+        return dst
+
+    def requeue_running(self) -> List[str]:
+        """Jobs left in running/ by a server that died are put back in front of the queue."""
+        moved = []
+        for job_id in self.jobs("running"):
+            os.replace(self._dir("running") / f"{job_id}.json", self._dir("pending") / f"{job_id}.json")
+            moved.append(job_id)
+        return moved
+
+    def result(self, job_id: str) -> Optional[dict]:
+        for state in ("done", "failed"):
+            path = self._dir(state) / f"{job_id}.json"
+            if path.is_file():
+                return json.loads(path.read_text())
+        return None
+
+    def counts(self) -> dict:
+        return {state: len(self.jobs(state)) for state in QUEUE_STATES}
+
+    # ---- server control ----
+
+    def request_stop(self) -> None:
+        (self.root / STOP_FILE).touch()
+
+    def stop_requested(self) -> bool:
+        return (self.root / STOP_FILE).exists()
+
+    def write_server_state(self, state: dict) -> None:
+        tmp = self.root / f".{SERVER_FILE}.tmp"
+        tmp.write_text(json.dumps(dict(state, heartbeat=time.time()), indent=2))
+        os.replace(tmp, self.root / SERVER_FILE)
+
+    def server_state(self) -> Optional[dict]:
+        path = self.root / SERVER_FILE
+        return json.loads(path.read_text()) if path.is_file() else None
+
+
+class FakeBackend:
+    """
+    Stand-in for Isaac Sim: pays a one-off start-up cost, then "renders" each job by
+    sleeping and writing `<data_dir>/fake_job.json`. Specs with "fake_fail": true raise.
+    """
+
+    def __init__(self, startup_seconds: float = 0.0, seconds_per_frame: float = 0.0):
+        self.startup_seconds = startup_seconds
+        self.seconds_per_frame = seconds_per_frame
+        self.starts = 0
+        self.jobs_run: List[str] = []
+
+    def start(self) -> None:
+        self.starts += 1
+        time.sleep(self.startup_seconds)
+
+    def run(self, job: dict) -> dict:
+        argv = job_argv(job)
+        if job.get("fake_fail"):
+            raise RuntimeError("fake backend failure")
+        frames = int(argv_value(argv, "--num_frames", "0"))
+        time.sleep(self.seconds_per_frame * frames)
+        data_dir = Path(argv_value(argv, "--data_dir")).expanduser()
+        data_dir.mkdir(parents=True, exist_ok=True)
+        (data_dir / "fake_job.json").write_text(json.dumps({"job_id": job["job_id"], "argv": argv}, indent=2))
+        self.jobs_run.append(job["job_id"])
+        return {"frames": frames, "data_dir": str(data_dir), "warm_jobs": len(self.jobs_run)}
+
+    def close(self) -> None:
+        pass
+
+
+def serve(
+    queue: JobQueue,
+    backend,
+    poll_interval: float = 1.0,
+    idle_timeout: float = 0.0,
+    max_jobs: int = 0,
+    log: Callable[[str], None] = print,
+) -> dict:
+    """
+    Run queued jobs on `backend` (start() once, run(job) per job, close() at the end) until
+    a stop is requested, `max_jobs` jobs ran, or the queue stayed empty for `idle_timeout`
+    seconds (0 = wait forever). A failing job is recorded in failed/ and the server moves on.
+    """
+    for job_id in queue.requeue_running():
+        log(f"[SDG] Requeued interrupted job {job_id}")
+    state = {"pid": os.getpid(), "state": "starting", "job": None, "jobs_done": 0, "jobs_failed": 0}
+    queue.write_server_state(state)
+    t_start = time.time()
+    backend.start()
+    state.update(state="idle", warm_since=time.time(), startup_seconds=round(time.time() - t_start, 3))
+    queue.write_server_state(state)
+    log(f"[SDG] Server warm after {state['startup_seconds']:.1f}s, watching {queue.root}")
+
+    idle_since = time.time()
+    try:
+        while not queue.stop_requested():
+            if max_jobs and state["jobs_done"] + state["jobs_failed"] >= max_jobs:
+                break
+            job = queue.claim()
+            if job is None:
+                if idle_timeout and time.time() - idle_since >= idle_timeout:
+                    log(f"[SDG] Queue idle for {idle_timeout:.0f}s; shutting down.")
+                    break
+                queue.write_server_state(state)
+                time.sleep(poll_interval)
+                continue
+
+            state.update(state="running", job=job["job_id"])
+            queue.write_server_state(state)
+            log(f"[SDG] Job {job['job_id']}: {' '.join(job_argv(job))}")
+            started = time.time()
+            try:
+                result = backend.run(job)
+            except (Exception, SystemExit) as exc:
+                state["jobs_failed"] += 1
+                queue.finish(
+                    job, "failed", started=started, finished=time.time(),
+                    seconds=round(time.time() - started, 3), error=f"{type(exc).__name__}: {exc}",
+                )
+                log(f"[SDG] Job {job['job_id']} failed: {exc}")
+            else:
+                state["jobs_done"] += 1
+                queue.finish(
+                    job, "done", started=started, finished=time.time(),
+                    seconds=round(time.time() - started, 3), result=result,
+                )
+                log(f"[SDG] Job {job['job_id']} done in {time.time() - started:.1f}s")
+            state.update(state="idle", job=None)
+            queue.write_server_state(state)
+            idle_since = time.time()
+    finally:
+        backend.close()
+        if queue.stop_requested():
+            (queue.root / STOP_FILE).unlink(missing_ok=True)
+        state.update(state="stopped", job=None)
+        queue.write_server_state(state)
+    return state
+
+
+def wait_for(queue: JobQueue, job_id: str, poll_interval: float = 2.0, timeout: float = 0.0) -> Optional[dict]:
+    """Block until `job_id` is done or failed (None on timeout)."""
+    deadline = time.time() + timeout if timeout else None
+    while True:
+        record = queue.result(job_id)
+        if record is not None:
+            return record
+        if deadline and time.time() >= deadline:
+            return None
+        time.sleep(poll_interval)
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser(description="Job queue for the warm SDG server (standalone_custom_sdg.py --serve).")
+    sub = ap.add_subparsers(dest="command", required=True)
+
+    p_submit = sub.add_parser("submit", help="Queue a job: standalone CLI args after '--' and/or --spec json.")
+    p_submit.add_argument("queue")
+    p_submit.add_argument("--spec", default=None, help="Job spec json file.")
+    p_submit.add_argument("--name", default=None)
+    p_submit.add_argument("--wait", action="store_true", help="Block until the job finishes; exit 1 if it failed.")
+    p_submit.add_argument("--timeout", type=float, default=0.0, help="Seconds to --wait (0 = no limit).")
+
+    p_status = sub.add_parser("status", help="Queue counts and server heartbeat.")
+    p_status.add_argument("queue")
+    p_status.add_argument("--json", action="store_true")
+
+    p_stop = sub.add_parser("stop", help="Ask the server to exit after the current job.")
+    p_stop.add_argument("queue")
+
+    p_serve = sub.add_parser("serve", help="Run the queue on the fake backend (Isaac Sim: standalone --serve).")
+    p_serve.add_argument("queue")
+    p_serve.add_argument("--fake", action="store_true", required=True)
+    p_serve.add_argument("--startup_seconds", type=float, default=0.0)
+    p_serve.add_argument("--seconds_per_frame", type=float, default=0.0)
+    p_serve.add_argument("--poll_interval", type=float, default=0.5)
+    p_serve.add_argument("--idle_timeout", type=float, default=0.0)
+    p_serve.add_argument("--max_jobs", type=int, default=0)
+    argv = sys.argv[1:]
+    job_extra: List[str] = []
+    if "--" in argv:
+        split = argv.index("--")
+        argv, job_extra = argv[:split], argv[split + 1 :]
+    args = ap.parse_args(argv)
+
+    queue = JobQueue(args.queue)
+    if args.command == "submit":
+        spec = json.loads(Path(args.spec).read_text()) if args.spec else {}
+        if job_extra:
+            spec["argv"] = list(spec.get("argv") or []) + job_extra
+        try:
+            job_id = queue.submit(spec, name=args.name)
+        except ValueError as exc:
+            raise SystemExit(f"[SDG] Invalid job: {exc}")
+        print(job_id)
+        if args.wait:
+            record = wait_for(queue, job_id, timeout=args.timeout)
+            if record is None:
+                raise SystemExit(f"[SDG] Timed out waiting for {job_id}")
+            if record["status"] != "done":
+                print(f"[SDG] Job {job_id} failed: {record.get('error')}", file=sys.stderr)
+                raise SystemExit(1)
+    elif args.command == "status":
+        status = {"queue": str(queue.root), "jobs": queue.counts(), "server": queue.server_state()}
+        if args.json:
+            print(json.dumps(status, indent=2))
+        else:
+            server = status["server"]
+            print(f"queue {status['queue']}: " + ", ".join(f"{k} {v}" for k, v in status["jobs"].items()))
+            if server is None:
+                print("server: never started")
+            else:
+                age = time.time() - server.get("heartbeat", 0)
+                print(
+                    f"server: pid {server.get('pid')} {server.get('state')}"
+                    f"{' (' + server['job'] + ')' if server.get('job') else ''}, "
+                    f"done {server.get('jobs_done', 0)}, failed {server.get('jobs_failed', 0)}, "
+                    f"heartbeat {age:.0f}s ago"
+                )
+    elif args.command == "stop":
+        queue.request_stop()
+        print(f"[SDG] Stop requested for {queue.root}")
+    else:
+        backend = FakeBackend(args.startup_seconds, args.seconds_per_frame)
+        serve(
+            queue, backend, args.poll_interval, args.idle_timeout, args.max_jobs, log=lambda msg: print(msg, flush=True)
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,494 @@
+"""
+Writer-side helpers for standalone_custom_sdg.py that do not depend on Kit.
+
+Everything here works on plain annotator payloads (dicts / numpy structured
+arrays as returned by Replicator annotators), so it can be exercised with
+synthetic data outside Isaac Sim. The Replicator Writer subclasses that use
+these helpers live in standalone_custom_sdg.py, after Kit has started.
+"""
+
+from __future__ import annotations
+
+import json
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+
+def find_annotator_payload(data: dict, prefix: str) -> Optional[dict]:
+    """Return the first writer payload whose key starts with `prefix` (handles render-product suffixes)."""
+    for key, value in data.items():
+        if key.startswith(prefix):
+            return value
+    return None
+
+
+def _label_classes(labels) -> List[str]:
+    """idToLabels values look like {'class': 'cup'} or {'class': 'cup,other'}."""
+    if isinstance(labels, dict):
+        labels = labels.get("class", "")
+    return [c.strip() for c in str(labels).split(",") if c.strip()]
+
+
+def _field(row, name: str, default=None):
+    try:
+        return row[name]
+    except (KeyError, ValueError, IndexError):
+        return default
+
+
+def target_boxes(bbox_payload: dict, target_classes: Iterable[str]) -> List[Tuple[str, float, float, float, float, float]]:
+    """
+    Extract (class, x_min, y_min, x_max, y_max, occlusion) rows of target classes from a
+    bounding_box_2d_tight payload: {'data': rows, 'info': {'idToLabels': {...}}}.
+    Rows need semanticId/x_min/y_min/x_max/y_max; occlusionRatio is optional (0 when absent).
+    """
+    targets = set(target_classes)
+    id_to_labels = (bbox_payload.get("info") or {}).get("idToLabels") or {}
+    out = []
+    for row in bbox_payload.get("data", []):
+        sem_id = _field(row, "semanticId")
+        labels = id_to_labels.get(str(int(sem_id)), id_to_labels.get(int(sem_id), {})) if sem_id is not None else {}
+        hit = [c for c in _label_classes(labels) if c in targets]
+        if not hit:
+            continue
+        occlusion = _field(row, "occlusionRatio", 0.0)
+        out.append(
+            (
+                hit[0],
+                float(row["x_min"]),
+                float(row["y_min"]),
+                float(row["x_max"]),
+                float(row["y_max"]),
+                float(occlusion) if occlusion is not None else 0.0,
+            )
+        )
+    return out
+
+
+class FrameGate:
+    """
+    Accept/reject frames by target-class visibility before they are written.
+
+    A target box counts as visible when its area is at least `min_bbox_px` pixels and
+    its occlusion ratio is at most `max_occlusion`. A frame is accepted when at least
+    `min_objects` target boxes are visible and every class in `required_classes`
+    has at least one visible box. Once `target_frames` frames were accepted, further
+    frames are rejected so late in-flight frames cannot overshoot the request.
+    """
+
+    def __init__(
+        self,
+        target_classes: Iterable[str],
+        min_objects: int = 1,
+        min_bbox_px: float = 0.0,
+        max_occlusion: float = 1.0,
+        required_classes: Iterable[str] = (),
+        target_frames: Optional[int] = None,
+    ):
+        self.target_classes = list(target_classes)
+        self.min_objects = int(min_objects)
+        self.min_bbox_px = float(min_bbox_px)
+        self.max_occlusion = float(max_occlusion)
+        self.required_classes = list(required_classes)
+        self.target_frames = target_frames
+        self.seen = 0
+        self.accepted = 0
+        self.rejections: Dict[str, int] = {}
+
+    @property
+    def done(self) -> bool:
+        return self.target_frames is not None and self.accepted >= self.target_frames
+
+    def visible_boxes(self, bbox_payload: Optional[dict]) -> List[tuple]:
+        if not bbox_payload:
+            return []
+        visible = []
+        for box in target_boxes(bbox_payload, self.target_classes):
+            _cls, x0, y0, x1, y1, occlusion = box
+            area = max(0.0, x1 - x0) * max(0.0, y1 - y0)
+            if area >= self.min_bbox_px and occlusion <= self.max_occlusion:
+                visible.append(box)
+        return visible
+
+    def evaluate(self, bbox_payload: Optional[dict]) -> Tuple[bool, str]:
+        """Return (accept, reason) for one frame without updating counters."""
+        if self.done:
+            return False, "target_reached"
+        visible = self.visible_boxes(bbox_payload)
+        if len(visible) < self.min_objects:
+            return False, "too_few_visible"
+        present = {box[0] for box in visible}
+        if any(c not in present for c in self.required_classes):
+            return False, "missing_required_class"
+        return True, "ok"
+
+    def __call__(self, bbox_payload: Optional[dict]) -> bool:
+        accept, reason = self.evaluate(bbox_payload)
+        self.seen += 1
+        if accept:
+            self.accepted += 1
+        else:
+            self.rejections[reason] = self.rejections.get(reason, 0) + 1
+        return accept
+
+    def summary(self) -> dict:
+        # Frames arriving after the target was reached say nothing about scene quality.
+        judged = self.seen - self.rejections.get("target_reached", 0)
+        return {
+            "frames_rendered": self.seen,
+            "frames_accepted": self.accepted,
+            "acceptance_rate": round(self.accepted / judged, 4) if judged else 0.0,
+            "rejections": dict(self.rejections),
+            "thresholds": {
+                "min_objects": self.min_objects,
+                "min_bbox_px": self.min_bbox_px,
+                "max_occlusion": self.max_occlusion,
+                "required_classes": self.required_classes,
+            },
+        }
+
+
+# ---------- streaming COCO output ----------
+
+
+def bbox_payload_to_coco(bbox_payload: Optional[dict], class_to_category: Dict[str, int]) -> List[dict]:
+    """Convert a tight bbox payload into COCO annotation dicts (without image/annotation ids)."""
+    if not bbox_payload:
+        return []
+    anns = []
+    for cls, x0, y0, x1, y1, occlusion in target_boxes(bbox_payload, class_to_category.keys()):
+        w = max(0.0, x1 - x0)
+        h = max(0.0, y1 - y0)
+        if w <= 0 or h <= 0:
+            continue
+        anns.append(
+            {
+                "category_id": class_to_category[cls],
+                "bbox": [x0, y0, w, h],
+                "area": w * h,
+                "iscrowd": 0,
+                "occlusion": occlusion,
+            }
+        )
+    return anns
+
+
+class BoundedWorkQueue:
+    """
+    Thread pool with a bounded number of in-flight jobs.
+
+    `submit` blocks the caller (the render thread) when `max_pending` jobs are already
+    queued or running; the time spent blocked is the back-pressure the renderer sees.
+    """
+
+    def __init__(self, max_workers: int = 4, max_pending: int = 32):
+        self.max_pending = max(1, int(max_pending))
+        self._pool = ThreadPoolExecutor(max_workers=max(1, int(max_workers)), thread_name_prefix="sdg-writer")
+        self._slots = threading.BoundedSemaphore(self.max_pending)
+        self._lock = threading.Lock()
+        self._pending = 0
+        self.submitted = 0
+        self.completed = 0
+        self.errors: List[str] = []
+        self.max_depth = 0
+        self.blocked_submits = 0
+        self.blocked_seconds = 0.0
+
+    def _run(self, fn: Callable, args: tuple) -> None:
+        try:
+            fn(*args)
+        except Exception as exc:
+            with self._lock:
+                self.errors.append(repr(exc))
+        finally:
+            with self._lock:
+                self._pending -= 1
+                self.completed += 1
+            self._slots.release()
+
+    def submit(self, fn: Callable, *args) -> None:
+        if not self._slots.acquire(blocking=False):
+            start = time.monotonic()
+            self._slots.acquire()
+            with self._lock:
+                self.blocked_submits += 1
+                self.blocked_seconds += time.monotonic() - start
+        with self._lock:
+            self._pending += 1
+            self.submitted += 1
+            self.max_depth = max(self.max_depth, self._pending)
+        self._pool.submit(self._run, fn, args)
+
+    @property
+    def depth(self) -> int:
+        return self._pending
+
+    def close(self) -> None:
+        self._pool.shutdown(wait=True)
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "submitted": self.submitted,
+                "completed": self.completed,
+                "queue_depth": self._pending,
+                "max_queue_depth": self.max_depth,
+                "max_pending": self.max_pending,
+                "blocked_submits": self.blocked_submits,
+                "blocked_seconds": round(self.blocked_seconds, 3),
+                "errors": len(self.errors),
+            }
+
+
+class JsonlLog:
+    """Append-only, thread-safe JSON-lines log; each record is flushed as it completes."""
+
+    def __init__(self, path: str):
+        self.path = path
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self._lock = threading.Lock()
+        self._f = open(path, "a", encoding="utf-8")
+
+    def append(self, record: dict) -> None:
+        line = json.dumps(record, separators=(",", ":"))
+        with self._lock:
+            self._f.write(line + "\n")
+            self._f.flush()
+
+    def close(self) -> None:
+        with self._lock:
+            self._f.close()
+
+
+def consolidate_coco_jsonl(jsonl_path: str, categories: List[dict], out_path: str) -> dict:
+    """
+    Build a standard COCO json from per-frame JSONL records written by the streaming writer:
+    {"frame": int, "image": {file_name, width, height}, "annotations": [...]}.
+    Image ids follow frame order; annotation ids are assigned sequentially.
+    Returns the COCO dict that was written.
+    """
+    records = []
+    with open(jsonl_path, "r", encoding="utf-8") as f:
+        for line in f:
+            line = line.strip()
+            if line:
+                records.append(json.loads(line))
+    records.sort(key=lambda r: r["frame"])
+
+    images, annotations = [], []
+    for image_id, rec in enumerate(records):
+        images.append(dict(rec["image"], id=image_id))
+        for ann in rec.get("annotations", []):
+            annotations.append(dict(ann, id=len(annotations), image_id=image_id))
+
+    coco = {
+        "info": {"description": "SDG streaming writer output"},
+        "images": images,
+        "annotations": annotations,
+        "categories": categories,
+    }
+    tmp = out_path + ".tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(coco, f)
+    os.replace(tmp, out_path)
+    return coco
+
+
+def save_rgb_png(rgb, path: str) -> None:
+    """Encode an HxWx3/4 uint8 array as PNG (Pillow ships with Isaac Sim python)."""
+    from PIL import Image
+
+    arr = rgb[..., :3] if getattr(rgb, "ndim", 3) == 3 and rgb.shape[-1] == 4 else rgb
+    tmp = path + ".tmp.png"
+    Image.fromarray(arr).save(tmp, compress_level=1)
+    os.replace(tmp, path)
+
+
+# ---------- direct YOLO / TAO label emission ----------
+
+
+def yolo_label_text(anns: List[dict], width: int, height: int, category_to_yolo: Dict[int, int]) -> str:
+    """YOLO txt content for one image; same normalization/clamping as yolov8/coco2yolo.py."""
+    lines = []
+    for a in anns:
+        if a.get("iscrowd", 0) or a["category_id"] not in category_to_yolo:
+            continue
+        x, y, w, h = a["bbox"]
+        cx, cy, nw, nh = (x + w / 2) / width, (y + h / 2) / height, w / width, h / height
+        cx, cy, nw, nh = (max(0.0, min(1.0, v)) for v in (cx, cy, nw, nh))
+        lines.append(f"{category_to_yolo[a['category_id']]} {cx:.6f} {cy:.6f} {nw:.6f} {nh:.6f}")
+    return "\n".join(lines)
+
+
+class LabelEmitter:
+    """
+    Writes training-ready labels next to the SDG output while frames are produced:
+    - YOLO: <yolo_labels_dir>/<image stem>.txt, plus a symlink of the image in <yolo_images_dir>.
+    - TAO:  contiguous 0..N-1 category ids in <split>/coco_annotations.json and classmap.txt.
+    Class ids follow `class_names` order (UNIQUE_CLASSES); COCO category ids are 1..N in that order.
+    """
+
+    def __init__(
+        self,
+        class_names: List[str],
+        yolo_labels_dir: Optional[str] = None,
+        yolo_images_dir: Optional[str] = None,
+        tao_coco_path: Optional[str] = None,
+        classmap_path: Optional[str] = None,
+    ):
+        self.class_names = list(class_names)
+        self.category_to_yolo = {i + 1: i for i in range(len(self.class_names))}
+        self.yolo_labels_dir = yolo_labels_dir
+        self.yolo_images_dir = yolo_images_dir
+        self.tao_coco_path = tao_coco_path
+        self.classmap_path = classmap_path
+        for d in (yolo_labels_dir, yolo_images_dir):
+            if d:
+                os.makedirs(d, exist_ok=True)
+
+    def emit_frame(self, image_path: str, width: int, height: int, anns: List[dict]) -> None:
+        if not self.yolo_labels_dir:
+            return
+        stem = os.path.splitext(os.path.basename(image_path))[0]
+        txt = os.path.join(self.yolo_labels_dir, stem + ".txt")
+        with open(txt, "w", encoding="utf-8") as f:
+            f.write(yolo_label_text(anns, width, height, self.category_to_yolo))
+        if self.yolo_images_dir:
+            link = os.path.join(self.yolo_images_dir, os.path.basename(image_path))
+            if os.path.lexists(link):
+                os.unlink(link)
+            os.symlink(os.path.abspath(image_path), link)
+
+    def emit_from_coco(self, coco: dict, image_root: str) -> int:
+        """Emit YOLO labels for every image of an already written COCO dict. Returns image count."""
+        cat_name = {int(c["id"]): c.get("name") for c in coco.get("categories", [])}
+        by_name = {name: i + 1 for i, name in enumerate(self.class_names)}
+        by_img: Dict[int, List[dict]] = {}
+        for a in coco.get("annotations", []):
+            cid = by_name.get(cat_name.get(int(a["category_id"])))
+            if cid is not None:
+                by_img.setdefault(a["image_id"], []).append(dict(a, category_id=cid))
+        for im in coco.get("images", []):
+            path = os.path.join(image_root, im["file_name"])
+            self.emit_frame(path, im["width"], im["height"], by_img.get(im["id"], []))
+        return len(coco.get("images", []))
+
+    def finalize(self, coco: dict) -> None:
+        """Write the TAO-ready COCO (contiguous ids, remapped by class name) and classmap."""
+        if self.tao_coco_path:
+            name_to_new = {name: i for i, name in enumerate(self.class_names)}
+            old_to_new = {}
+            for c in coco.get("categories", []):
+                if c.get("name") in name_to_new:
+                    old_to_new[int(c["id"])] = name_to_new[c["name"]]
+            tao = dict(coco)
+            tao["categories"] = [{"id": i, "name": name} for i, name in enumerate(self.class_names)]
+            tao["annotations"] = [
+                dict(a, category_id=old_to_new[int(a["category_id"])])
+                for a in coco.get("annotations", [])
+                if int(a["category_id"]) in old_to_new
+            ]
+            tmp = self.tao_coco_path + ".tmp"
+            with open(tmp, "w", encoding="utf-8") as f:
+                json.dump(tao, f)
+            os.replace(tmp, self.tao_coco_path)
+        if self.classmap_path:
+            with open(self.classmap_path, "w", encoding="utf-8") as f:
+                f.write("\n".join(self.class_names) + "\n")
+
+
+# ---------- multi-resolution variants ----------
+
+LETTERBOX_FILL = (114, 114, 114)  # Ultralytics letterbox padding color
+
+
+class ResolutionVariant:
+    """
+    An extra output resolution derived from the rendered frame.
+    - letterbox: keep aspect ratio, scale to fit, pad with LETTERBOX_FILL (centered).
+    - resize:    scale x and y independently to the target size.
+    """
+
+    MODES = ("letterbox", "resize")
+
+    def __init__(self, width: int, height: int, mode: str = "letterbox"):
+        if width <= 0 or height <= 0:
+            raise ValueError(f"Variant size must be positive, got {width}x{height}")
+        if mode not in self.MODES:
+            raise ValueError(f"Variant mode must be one of {self.MODES}, got '{mode}'")
+        self.width = int(width)
+        self.height = int(height)
+        self.mode = mode
+
+    @property
+    def name(self) -> str:
+        return f"{self.width}x{self.height}"
+
+    def transform(self, src_w: int, src_h: int) -> Tuple[float, float, int, int, int, int]:
+        """Return (scale_x, scale_y, pad_x, pad_y, scaled_w, scaled_h) for a src_w x src_h frame."""
+        if self.mode == "resize":
+            return self.width / src_w, self.height / src_h, 0, 0, self.width, self.height
+        s = min(self.width / src_w, self.height / src_h)
+        new_w = min(self.width, max(1, int(round(src_w * s))))
+        new_h = min(self.height, max(1, int(round(src_h * s))))
+        return s, s, (self.width - new_w) // 2, (self.height - new_h) // 2, new_w, new_h
+
+    def apply_image(self, rgb):
+        """Resize (and pad) an HxWx3/4 uint8 array; returns an HxWx3 uint8 array."""
+        import numpy as np
+        from PIL import Image
+
+        arr = rgb[..., :3] if rgb.ndim == 3 and rgb.shape[-1] == 4 else rgb
+        src_h, src_w = arr.shape[:2]
+        _sx, _sy, pad_x, pad_y, new_w, new_h = self.transform(src_w, src_h)
+        scaled = np.asarray(Image.fromarray(arr).resize((new_w, new_h), Image.BILINEAR))
+        if (new_w, new_h) == (self.width, self.height):
+            return scaled
+        out = np.empty((self.height, self.width, 3), dtype=np.uint8)
+        out[...] = LETTERBOX_FILL
+        out[pad_y : pad_y + new_h, pad_x : pad_x + new_w] = scaled
+        return out
+
+    def apply_annotations(self, anns: List[dict], src_w: int, src_h: int) -> List[dict]:
+        """Rescale COCO bboxes into this variant; boxes that collapse below 1px are dropped."""
+        sx, sy, pad_x, pad_y, _w, _h = self.transform(src_w, src_h)
+        out = []
+        for a in anns:
+            x, y, w, h = a["bbox"]
+            x0 = min(max(x * sx + pad_x, 0.0), self.width)
+            y0 = min(max(y * sy + pad_y, 0.0), self.height)
+            x1 = min(max((x + w) * sx + pad_x, 0.0), self.width)
+            y1 = min(max((y + h) * sy + pad_y, 0.0), self.height)
+            nw, nh = x1 - x0, y1 - y0
+            if nw < 1.0 or nh < 1.0:
+                continue
+            out.append(dict(a, bbox=[x0, y0, nw, nh], area=nw * nh))
+        return out
+
+
+def parse_resolution_variants(spec: Optional[str]) -> List[ResolutionVariant]:
+    """Parse 'WxH[:mode],WxH[:mode]' (mode: letterbox|resize, default letterbox)."""
+    variants: List[ResolutionVariant] = []
+    for item in (spec or "").replace(" ", "").split(","):
+        if not item:
+            continue
+        size, _, mode = item.partition(":")
+        try:
+            w, h = (int(v) for v in size.lower().split("x"))
+        except ValueError:
+            raise ValueError(f"Invalid resolution variant '{item}' (expected WxH[:letterbox|resize])")
+        variants.append(ResolutionVariant(w, h, mode or "letterbox"))
+    names = [v.name for v in variants]
+    if len(set(names)) != len(names):
+        raise ValueError(f"Duplicate resolution variants: {spec}")
+    return variants
+
+
+def variant_data_dir(data_dir: str, variant: ResolutionVariant) -> str:
+    """<root>/<split> -> <root>_<W>x<H>/<split>, so each variant is a complete OUT_ROOT of its own."""
+    data_dir = os.path.abspath(data_dir).rstrip(os.sep)
+    root, split = os.path.split(data_dir)
+    return os.path.join(f"{root}_{variant.name}", split)
@@ -20,13 +20,45 @@
 # LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING
 # FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER
 
-from omni.isaac.kit import SimulationApp
 import os
+import sys
 import argparse
+import json
 import random
 import glob
+import time
 from typing import List, Optional, Tuple
 
+import numpy as np
+
+from asset_cache import AssetCache, localize as localize_into_cache
+from frustum_filter import FILTER_MODES as FRUSTUM_FILTER_MODES, apply_frustum_filter, camera_intrinsics
+from output_profiles import OUTPUT_PROFILES, estimate_profile
+from sdg_daemon import JobQueue, job_argv, serve
+from pose_schedule import (
+    SAMPLERS as POSE_SAMPLERS,
+    PoseField,
+    as_sequence,
+    build_pose_schedule,
+    check_schedule,
+    coverage_report,
+    load_pose_schedule,
+    save_pose_schedule,
+    schedule_meta,
+)
+from sdg_writers import (
+    BoundedWorkQueue,
+    FrameGate,
+    JsonlLog,
+    LabelEmitter,
+    bbox_payload_to_coco,
+    consolidate_coco_jsonl,
+    find_annotator_payload,
+    parse_resolution_variants,
+    save_rgb_png,
+    variant_data_dir,
+)
+
 
 def _str_to_bool(value):
     if isinstance(value, bool):
@@ -115,6 +147,28 @@ def _parse_vec3_range(value: str, label: str) -> tuple:
     )
 
 
+def _parse_count_range(value: str, label: str) -> Tuple[int, int]:
+    """
+    Parse an integer count range into (min, max).
+    Accepted forms (comma or colon separator):
+      - k        -> fixed count k
+      - min,max  -> uniform integer count in [min, max]
+    """
+    if value is None or value == "":
+        raise ValueError(f"Empty {label} range string")
+    s = value.replace(" ", "").replace(";", ",").replace(":", ",")
+    parts = [p for p in s.split(",") if p != ""]
+    try:
+        nums = [int(p) for p in parts]
+    except Exception:
+        raise argparse.ArgumentTypeError(f"--{label} expects integers, got: '{value}'")
+    if len(nums) == 1:
+        return nums[0], nums[0]
+    if len(nums) == 2:
+        return min(nums), max(nums)
+    raise argparse.ArgumentTypeError(f"--{label} accepts 1 or 2 integers.")
+
+
 def _is_unit_scale(mode: str, smin, smax) -> bool:
     """Return True when the resolved scale is exactly 1 on all axes."""
     if mode == "scalar":
@@ -195,6 +249,20 @@ parser.add_argument(
     default=2,
     help="Number of fallback USD references per asset when Replicator instances are missing.",
 )
+parser.add_argument(
+    "--instance_pool_max",
+    type=int,
+    default=25,
+    help="Replicator instances created once per custom asset (the pool size).",
+)
+parser.add_argument(
+    "--instance_count",
+    type=str,
+    default=None,
+    help=(
+        "Pooled instance mode: visible instances per asset per frame, 'k' (fixed) or 'min,max' (uniform). "
+        "The rest of the pool is hidden via visibility randomization. Omitted -> all pool instances visible.")
+)
 parser.add_argument(
     "--object_scale",
     type=str,
@@ -273,6 +341,237 @@ parser.add_argument(
         "If omitted, uses config 'repeat', else defaults to 2.")
 )
 
+parser.add_argument(
+    "--material_mode",
+    type=str,
+    default="per_run",
+    choices=["per_run", "per_frame"],
+    help=(
+        "'per_run' (default) binds one random material per custom instance once. 'per_frame' registers the "
+        "local USD + MDL materials as a Replicator material randomizer on the custom objects.")
+)
+parser.add_argument(
+    "--material_reroll_interval",
+    type=int,
+    default=1,
+    help="With --material_mode per_frame, re-roll materials every N frames (bounds per-frame cost).",
+)
+parser.add_argument(
+    "--gate_min_objects",
+    type=int,
+    default=0,
+    help=(
+        "Frame gating: skip writing frames with fewer visible target-class objects than this "
+        "(0 disables gating). Rendering continues until --num_frames frames are accepted.")
+)
+parser.add_argument(
+    "--gate_min_bbox_px",
+    type=float,
+    default=16.0,
+    help="Frame gating: minimum tight-bbox area (pixels) for an object to count as visible.",
+)
+parser.add_argument(
+    "--gate_max_occlusion",
+    type=float,
+    default=0.9,
+    help="Frame gating: maximum occlusion ratio (0..1) for an object to count as visible.",
+)
+parser.add_argument(
+    "--gate_require_all_classes",
+    type=_str_to_bool,
+    default=False,
+    help="Frame gating: additionally require at least one visible object of every class.",
+)
+parser.add_argument(
+    "--gate_max_render_factor",
+    type=float,
+    default=3.0,
+    help="Frame gating: stop after rendering num_frames * factor frames even if fewer were accepted.",
+)
+parser.add_argument(
+    "--pose_sampler",
+    type=str,
+    default="replicator",
+    choices=["replicator"] + sorted(POSE_SAMPLERS),
+    help=(
+        "'replicator' draws poses inside the Replicator graph (legacy). Other samplers pre-sample every "
+        "camera/object/distractor pose in NumPy, save <data_dir>/pose_schedule.npz and feed it by frame index. "
+        "'halton'/'sobol' use scrambled low-discrepancy sequences for more even coverage per frame.")
+)
+parser.add_argument("--pose_seed", type=int, default=0, help="Seed of the pre-sampled pose schedule.")
+parser.add_argument(
+    "--frame_offset",
+    type=int,
+    default=0,
+    help="Global index of this run's first frame in the pose schedule (give shards disjoint offsets).",
+)
+parser.add_argument(
+    "--pose_schedule",
+    type=str,
+    default=None,
+    help="Replay poses from an existing pose_schedule.npz instead of sampling (prim counts must match).",
+)
+parser.add_argument(
+    "--frustum_filter",
+    type=str,
+    default="off",
+    choices=list(FRUSTUM_FILTER_MODES),
+    help=(
+        "Pre-filter pre-sampled poses (needs --pose_sampler other than 'replicator'): project each object's "
+        "bounding sphere through the camera; 'resample' redraws camera/object positions of frames with no "
+        "target in view, 'reject' drops those frames.")
+)
+parser.add_argument("--frustum_min_visible", type=int, default=1, help="Objects that must be in view per frame.")
+parser.add_argument("--frustum_max_resample", type=int, default=20, help="Resample attempts per failing frame.")
+parser.add_argument(
+    "--frustum_min_radius_px",
+    type=float,
+    default=0.0,
+    help="Also require the projected bounding-sphere radius to reach this many pixels.",
+)
+parser.add_argument(
+    "--object_radius",
+    type=float,
+    default=None,
+    help="Bounding-sphere radius of the custom assets in asset units (before --object_scale). Default: measured from the USD.",
+)
+parser.add_argument("--focal_length", type=float, default=24.0, help="Camera focal length (mm).")
+parser.add_argument("--horizontal_aperture", type=float, default=20.955, help="Camera horizontal aperture (mm).")
+parser.add_argument(
+    "--output_profile",
+    type=str,
+    default=None,
+    choices=sorted(OUTPUT_PROFILES),
+    help=(
+        "Writer outputs: 'detection' (RGB + tight bbox), 'segmentation' (+ instance masks), "
+        "'full' (+ semantic and instance masks). Default: 'full' for --writer coco, 'detection' for streaming.")
+)
+parser.add_argument(
+    "--disk_write_mbps",
+    type=float,
+    default=200.0,
+    help="Assumed sustained disk write speed (MB/s) for the write-time estimate in the run plan.",
+)
+parser.add_argument(
+    "--writer",
+    type=str,
+    default="coco",
+    choices=["coco", "streaming"],
+    help=(
+        "'coco' uses Replicator's CocoWriter. 'streaming' encodes/writes images on a bounded thread pool, "
+        "appends annotations to a JSONL log per frame and consolidates coco_annotations_stream.json at the end.")
+)
+parser.add_argument(
+    "--resolution_variants",
+    type=str,
+    default="",
+    help=(
+        "Extra output resolutions made from the same render (streaming writer only), e.g. "
+        "'640x640,960x544:resize'. Mode per entry: letterbox (default) or resize. Each variant is written "
+        "to <data_dir parent>_<W>x<H>/<split> with rescaled bboxes. Render at the largest resolution.")
+)
+parser.add_argument(
+    "--emit_yolo_labels",
+    type=_str_to_bool,
+    default=False,
+    help=(
+        "Write YOLO labels/<split>/*.txt (and images/<split> symlinks) under --label_out_root while "
+        "generating, with class ids in unique-class order. Makes coco2yolo.py optional.")
+)
+parser.add_argument(
+    "--emit_tao_coco",
+    type=_str_to_bool,
+    default=False,
+    help=(
+        "Write a TAO-ready <data_dir>/coco_annotations.json (contiguous 0..N-1 ids) and "
+        "<label_out_root>/classmap.txt. Makes prepare_tao_coco.py optional.")
+)
+parser.add_argument(
+    "--label_out_root",
+    type=str,
+    default=None,
+    help="Dataset root for emitted labels/images/classmap. Default: parent of --data_dir (e.g. OUT_ROOT).",
+)
+parser.add_argument(
+    "--writer_workers",
+    type=int,
+    default=4,
+    help="Streaming writer: number of encode/write worker threads.",
+)
+parser.add_argument(
+    "--writer_max_pending",
+    type=int,
+    default=32,
+    help="Streaming writer: max frames queued for writing before the render thread blocks (back-pressure).",
+)
+parser.add_argument(
+    "--ready_timeout",
+    type=float,
+    default=120.0,
+    help=(
+        "Max seconds to wait for the environment stage (and imported materials) to finish loading. "
+        "Replaces fixed app-update warm-up loops.")
+)
+parser.add_argument(
+    "--spawn_ready_timeout",
+    type=float,
+    default=30.0,
+    help="Max seconds to wait for spawned custom objects before falling back to USD references.",
+)
+parser.add_argument(
+    "--ready_settle_updates",
+    type=int,
+    default=3,
+    help="Consecutive app updates with no pending loads required before the stage counts as ready.",
+)
+parser.add_argument(
+    "--asset_cache_dir",
+    type=str,
+    default=None,
+    help=(
+        "Local asset cache created by --localize_assets (or asset_cache.py). When set, the warehouse, "
+        "robots, textures and MDL URLs resolve to file:// cache paths, falling back to remote when missing.")
+)
+parser.add_argument(
+    "--asset_root",
+    type=str,
+    default=None,
+    help=(
+        "Override the Isaac assets root (Nucleus/S3 URL or local directory). "
+        "Default: resolved by Isaac Sim (get_assets_root_path).")
+)
+parser.add_argument(
+    "--validate_only",
+    type=_str_to_bool,
+    default=False,
+    help=(
+        "Resolve assets, classes, ranges, robot config and local material files, print a JSON run plan "
+        "(with estimated disk usage) and exit without launching Isaac Sim. Exit code 1 on errors.")
+)
+parser.add_argument(
+    "--serve",
+    type=str,
+    default=None,
+    help=(
+        "Warm server: launch Isaac Sim and load the warehouse once, then run jobs from this queue directory "
+        "one after another (submit with sdg_daemon.py). Other flags on the server command line are defaults "
+        "for every job.")
+)
+parser.add_argument(
+    "--serve_idle_timeout",
+    type=float,
+    default=0.0,
+    help="With --serve: exit after the queue stayed empty this many seconds (0 = run until sdg_daemon.py stop).",
+)
+parser.add_argument(
+    "--localize_assets",
+    type=_str_to_bool,
+    default=False,
+    help=(
+        "Mirror the environment, warehouse/additional distractors, textures and online MDLs into "
+        "--asset_cache_dir and exit. With --asset_root set, Isaac Sim is not launched.")
+)
+
 # Legacy options kept for backward compatibility.
 parser.add_argument(
     "--allow_unstable_warehouse_robots",
@@ -307,9 +606,6 @@ parser.add_argument(
         "Only existing assets are used.")
 )
 
-args, _ = parser.parse_known_args()
-
-
 def _gather_asset_paths() -> List[str]:
     candidate_paths: List[str] = []
     seen = set()
@@ -370,137 +666,148 @@ def _gather_material_dirs(asset_paths: List[str]) -> List[str]:
     return dirs
 
 
-CUSTOM_ASSET_PATHS = _gather_asset_paths()
-LOCAL_MATERIAL_DIRS = _gather_material_dirs(CUSTOM_ASSET_PATHS)
-OBJECT_CLASS = args.object_class
-OBJECT_PRIM_PREFIX = args.prim_prefix
-FALLBACK_COUNT = max(1, args.fallback_count)
+def configure(argv: Optional[List[str]] = None) -> None:
+    """
+    Parse the CLI and derive the run configuration (asset list, classes, ranges).
+    Runs once at import; the warm server (--serve) calls it again for every job.
+    """
+    global args, CUSTOM_ASSET_PATHS, LOCAL_MATERIAL_DIRS, OBJECT_CLASS, OBJECT_PRIM_PREFIX, FALLBACK_COUNT
+    global INSTANCE_POOL_MAX, RESOLUTION_VARIANTS, OUTPUT_PROFILE, INSTANCE_COUNT_MIN, INSTANCE_COUNT_MAX
+    global OBJ_SCALE_MODE, OBJ_SCALE_MIN, OBJ_SCALE_MAX, CAM_POS_MIN, CAM_POS_MAX, OBJ_POS_MIN, OBJ_POS_MAX
+    global OBJ_ROT_MIN, OBJ_ROT_MAX, DIST_POS_MIN, DIST_POS_MAX, DIST_ROT_MIN, DIST_ROT_MAX
+    global DIST_SCALE_MODE, DIST_SCALE_MIN, DIST_SCALE_MAX, ASSET_CLASSES, UNIQUE_CLASSES
+    args, _ = parser.parse_known_args(argv)
+
+    CUSTOM_ASSET_PATHS = _gather_asset_paths()
+    LOCAL_MATERIAL_DIRS = _gather_material_dirs(CUSTOM_ASSET_PATHS)
+    OBJECT_CLASS = args.object_class
+    OBJECT_PRIM_PREFIX = args.prim_prefix
+    FALLBACK_COUNT = max(1, args.fallback_count)
+    INSTANCE_POOL_MAX = max(1, args.instance_pool_max)
+    try:
+        RESOLUTION_VARIANTS = parse_resolution_variants(args.resolution_variants)
+    except ValueError as _exc:
+        raise SystemExit(f"Invalid --resolution_variants value: {args.resolution_variants} ({_exc})")
+    OUTPUT_PROFILE = args.output_profile or ("detection" if args.writer == "streaming" else "full")
 
-# Object scale range
-try:
-    if args.object_scale:
-        OBJ_SCALE_MODE, OBJ_SCALE_MIN, OBJ_SCALE_MAX = _parse_object_scale_arg(args.object_scale)
-    else:
-        # Default fixed uniform scalar (equivalent to (0.01,0.01,0.01))
-        OBJ_SCALE_MODE, OBJ_SCALE_MIN, OBJ_SCALE_MAX = "scalar", 0.01, 0.01
-except Exception as _exc:
-    raise SystemExit(f"Invalid --object_scale value: {args.object_scale} ({_exc})")
-
-# Camera position range
-try:
-    if args.cam_pos:
-        CAM_POS_MIN, CAM_POS_MAX = _parse_vec3_range(args.cam_pos, "cam_pos")
-    else:
-        CAM_POS_MIN, CAM_POS_MAX = (-0.75, -0.75, 0.75), (0.75, 0.75, 1.0)
-except Exception as _exc:
-    raise SystemExit(f"Invalid --cam_pos value: {args.cam_pos} ({_exc})")
-
-# Object group position/rotation ranges
-try:
-    if args.obj_pos:
-        OBJ_POS_MIN, OBJ_POS_MAX = _parse_vec3_range(args.obj_pos, "obj_pos")
-    else:
-        OBJ_POS_MIN, OBJ_POS_MAX = (-0.3, -0.2, 0.35), (0.3, 0.2, 0.5)
-except Exception as _exc:
-    raise SystemExit(f"Invalid --obj_pos value: {args.obj_pos} ({_exc})")
+    # Pooled instance mode: visible count range per asset per frame
+    try:
+        if args.instance_count:
+            INSTANCE_COUNT_MIN, INSTANCE_COUNT_MAX = _parse_count_range(args.instance_count, "instance_count")
+            if INSTANCE_COUNT_MIN < 0 or INSTANCE_COUNT_MAX > INSTANCE_POOL_MAX:
+                raise ValueError(f"range must lie within [0, --instance_pool_max={INSTANCE_POOL_MAX}]")
+        else:
+            INSTANCE_COUNT_MIN, INSTANCE_COUNT_MAX = INSTANCE_POOL_MAX, INSTANCE_POOL_MAX
+    except Exception as _exc:
+        raise SystemExit(f"Invalid --instance_count value: {args.instance_count} ({_exc})")
 
-try:
-    if args.obj_rot:
-        OBJ_ROT_MIN, OBJ_ROT_MAX = _parse_vec3_range(args.obj_rot, "obj_rot")
-    else:
-        OBJ_ROT_MIN, OBJ_ROT_MAX = (0, -45, 0), (0, 45, 360)
-except Exception as _exc:
-    raise SystemExit(f"Invalid --obj_rot value: {args.obj_rot} ({_exc})")
-
-# Distractor position/rotation/scale ranges
-try:
-    if args.dist_pos:
-        DIST_POS_MIN, DIST_POS_MAX = _parse_vec3_range(args.dist_pos, "dist_pos")
-    else:
-        DIST_POS_MIN, DIST_POS_MAX = (-2, -2, 0), (2, 2, 0)
-except Exception as _exc:
-    raise SystemExit(f"Invalid --dist_pos value: {args.dist_pos} ({_exc})")
+    # Object scale range
+    try:
+        if args.object_scale:
+            OBJ_SCALE_MODE, OBJ_SCALE_MIN, OBJ_SCALE_MAX = _parse_object_scale_arg(args.object_scale)
+        else:
+            # Default fixed uniform scalar (equivalent to (0.01,0.01,0.01))
+            OBJ_SCALE_MODE, OBJ_SCALE_MIN, OBJ_SCALE_MAX = "scalar", 0.01, 0.01
+    except Exception as _exc:
+        raise SystemExit(f"Invalid --object_scale value: {args.object_scale} ({_exc})")
 
-try:
-    if args.dist_rot:
-        DIST_ROT_MIN, DIST_ROT_MAX = _parse_vec3_range(args.dist_rot, "dist_rot")
-    else:
-        DIST_ROT_MIN, DIST_ROT_MAX = (0, 0, 0), (0, 30, 360)
-except Exception as _exc:
-    raise SystemExit(f"Invalid --dist_rot value: {args.dist_rot} ({_exc})")
+    # Camera position range
+    try:
+        if args.cam_pos:
+            CAM_POS_MIN, CAM_POS_MAX = _parse_vec3_range(args.cam_pos, "cam_pos")
+        else:
+            CAM_POS_MIN, CAM_POS_MAX = (-0.75, -0.75, 0.75), (0.75, 0.75, 1.0)
+    except Exception as _exc:
+        raise SystemExit(f"Invalid --cam_pos value: {args.cam_pos} ({_exc})")
 
-try:
-    if args.dist_scale:
-        DIST_SCALE_MODE, DIST_SCALE_MIN, DIST_SCALE_MAX = _parse_object_scale_arg(args.dist_scale)
-    else:
-        # Warehouse distractors are articulated robot assets; scaling them often
-        # creates disjoint joints that PhysX snaps to the origin.
-        if str(args.distractors).lower() == "warehouse":
-            DIST_SCALE_MODE, DIST_SCALE_MIN, DIST_SCALE_MAX = "scalar", 1.0, 1.0
+    # Object group position/rotation ranges
+    try:
+        if args.obj_pos:
+            OBJ_POS_MIN, OBJ_POS_MAX = _parse_vec3_range(args.obj_pos, "obj_pos")
         else:
-            DIST_SCALE_MODE, DIST_SCALE_MIN, DIST_SCALE_MAX = "scalar", 1.0, 1.5
-except Exception as _exc:
-    raise SystemExit(f"Invalid --dist_scale value: {args.dist_scale} ({_exc})")
+            OBJ_POS_MIN, OBJ_POS_MAX = (-0.3, -0.2, 0.35), (0.3, 0.2, 0.5)
+    except Exception as _exc:
+        raise SystemExit(f"Invalid --obj_pos value: {args.obj_pos} ({_exc})")
 
-if str(args.distractors).lower() == "warehouse" and not _is_unit_scale(
-    DIST_SCALE_MODE, DIST_SCALE_MIN, DIST_SCALE_MAX
-):
-    print(
-        "[SDG] Warning: --distractors warehouse uses articulated robots; "
-        "non-unit --dist_scale can cause joint snapping/disjointed robots."
-    )
+    try:
+        if args.obj_rot:
+            OBJ_ROT_MIN, OBJ_ROT_MAX = _parse_vec3_range(args.obj_rot, "obj_rot")
+        else:
+            OBJ_ROT_MIN, OBJ_ROT_MAX = (0, -45, 0), (0, 45, 360)
+    except Exception as _exc:
+        raise SystemExit(f"Invalid --obj_rot value: {args.obj_rot} ({_exc})")
 
-# Resolve per-asset classes with strict validation when multi-asset
-if len(CUSTOM_ASSET_PATHS) > 1:
-    if not args.object_classes:
-        raise SystemExit(
-            "Multiple assets provided but --object_classes not set. "
-            "Provide exactly one class name per asset."
-        )
-    if len(args.object_classes) != len(CUSTOM_ASSET_PATHS):
-        raise SystemExit(
-            f"Mismatch: {len(CUSTOM_ASSET_PATHS)} asset(s) but {len(args.object_classes)} class(es). "
-            "Provide exactly one class per asset."
+    # Distractor position/rotation/scale ranges
+    try:
+        if args.dist_pos:
+            DIST_POS_MIN, DIST_POS_MAX = _parse_vec3_range(args.dist_pos, "dist_pos")
+        else:
+            DIST_POS_MIN, DIST_POS_MAX = (-2, -2, 0), (2, 2, 0)
+    except Exception as _exc:
+        raise SystemExit(f"Invalid --dist_pos value: {args.dist_pos} ({_exc})")
+
+    try:
+        if args.dist_rot:
+            DIST_ROT_MIN, DIST_ROT_MAX = _parse_vec3_range(args.dist_rot, "dist_rot")
+        else:
+            DIST_ROT_MIN, DIST_ROT_MAX = (0, 0, 0), (0, 30, 360)
+    except Exception as _exc:
+        raise SystemExit(f"Invalid --dist_rot value: {args.dist_rot} ({_exc})")
+
+    try:
+        if args.dist_scale:
+            DIST_SCALE_MODE, DIST_SCALE_MIN, DIST_SCALE_MAX = _parse_object_scale_arg(args.dist_scale)
+        else:
+            # Warehouse distractors are articulated robot assets; scaling them often
+            # creates disjoint joints that PhysX snaps to the origin.
+            if str(args.distractors).lower() == "warehouse":
+                DIST_SCALE_MODE, DIST_SCALE_MIN, DIST_SCALE_MAX = "scalar", 1.0, 1.0
+            else:
+                DIST_SCALE_MODE, DIST_SCALE_MIN, DIST_SCALE_MAX = "scalar", 1.0, 1.5
+    except Exception as _exc:
+        raise SystemExit(f"Invalid --dist_scale value: {args.dist_scale} ({_exc})")
+
+    if str(args.distractors).lower() == "warehouse" and not _is_unit_scale(
+        DIST_SCALE_MODE, DIST_SCALE_MIN, DIST_SCALE_MAX
+    ):
+        print(
+            "[SDG] Warning: --distractors warehouse uses articulated robots; "
+            "non-unit --dist_scale can cause joint snapping/disjointed robots.",
+            file=sys.stderr,  # stdout of --validate_only is the run plan JSON
         )
-    ASSET_CLASSES = list(args.object_classes)
-else:
-    # Single asset path: default to --object_class (backward compatible)
-    ASSET_CLASSES = [OBJECT_CLASS]
-
-# Unique classes in first-seen order (stable ids across splits)
-UNIQUE_CLASSES = []
-_seen = set()
-for c in ASSET_CLASSES:
-    if c not in _seen:
-        UNIQUE_CLASSES.append(c)
-        _seen.add(c)
 
-# App config
-CONFIG = {
-    "renderer": "RayTracedLighting",
-    "headless": args.headless,
-    "width": args.width,
-    "height": args.height,
-    "num_frames": args.num_frames,
-}
+    # Resolve per-asset classes with strict validation when multi-asset
+    if len(CUSTOM_ASSET_PATHS) > 1:
+        if not args.object_classes:
+            raise SystemExit(
+                "Multiple assets provided but --object_classes not set. "
+                "Provide exactly one class name per asset."
+            )
+        if len(args.object_classes) != len(CUSTOM_ASSET_PATHS):
+            raise SystemExit(
+                f"Mismatch: {len(CUSTOM_ASSET_PATHS)} asset(s) but {len(args.object_classes)} class(es). "
+                "Provide exactly one class per asset."
+            )
+        ASSET_CLASSES = list(args.object_classes)
+    else:
+        # Single asset path: default to --object_class (backward compatible)
+        ASSET_CLASSES = [OBJECT_CLASS]
 
-simulation_app = SimulationApp(launch_config=CONFIG)
+    # Unique classes in first-seen order (stable ids across splits)
+    UNIQUE_CLASSES = []
+    _seen = set()
+    for c in ASSET_CLASSES:
+        if c not in _seen:
+            UNIQUE_CLASSES.append(c)
+            _seen.add(c)
 
-# Scene (environment)
-ENV_URL = "/Isaac/Environments/Simple_Warehouse/warehouse.usd"
 
-import carb
-import omni
-import omni.client
-import omni.usd
-from omni.isaac.core.utils.nucleus import get_assets_root_path
-from omni.isaac.core.utils.stage import get_current_stage, open_stage
-from pxr import Semantics, Usd, UsdGeom, Sdf, UsdShade, Gf
-import omni.replicator.core as rep
-from omni.isaac.core.utils.semantics import get_semantics  # noqa
+args, _ = parser.parse_known_args()
+if not args.serve:
+    configure()
 
-# Replicator settings
-rep.settings.carb_settings("/omni/replicator/RTSubframes", 4)
+# Scene (environment)
+ENV_URL = "/Isaac/Environments/Simple_Warehouse/warehouse.usd"
 
 
 # Your object(s) (resolved at runtime)
@@ -678,21 +985,35 @@ def update_semantics(stage, keep_semantics=[]):
 
 
 _ASSETS_ROOT_PATH = None
+ASSET_CACHE = AssetCache(args.asset_cache_dir) if args.asset_cache_dir else None
 
 
 def _get_assets_root_cached() -> str:
     global _ASSETS_ROOT_PATH
     if _ASSETS_ROOT_PATH is None:
-        _ASSETS_ROOT_PATH = get_assets_root_path()
+        _ASSETS_ROOT_PATH = args.asset_root.rstrip("/") if args.asset_root else get_assets_root_path()
         if _ASSETS_ROOT_PATH is None:
             raise Exception("Nucleus server not found, could not access Isaac Sim assets folder")
     return _ASSETS_ROOT_PATH
 
 
 def prefix_with_isaac_asset_server(relative_path: str) -> str:
+    if ASSET_CACHE is not None:
+        cached = ASSET_CACHE.lookup_url(relative_path)
+        if cached:
+            return cached
     return _get_assets_root_cached() + relative_path
 
 
+def resolve_cached_url(url: str) -> str:
+    """Return the file:// cache path for an absolute URL (e.g. MDL), or the URL itself."""
+    if ASSET_CACHE is not None:
+        cached = ASSET_CACHE.lookup_url(url)
+        if cached:
+            return cached
+    return url
+
+
 def _dedupe_keep_order(items):
     seen = set()
     out = []
@@ -890,8 +1211,82 @@ def full_textures_list():
     return [prefix_with_isaac_asset_server(t) for t in TEXTURES]
 
 
+def _pending_stage_loads() -> int:
+    """Return the number of files the USD context is still loading (0 when idle)."""
+    context = omni.usd.get_context()
+    if context is None:
+        return 0
+    try:
+        _msg, _loaded, loading = context.get_stage_loading_status()
+    except Exception:
+        return 0
+    return int(loading)
+
+
+def _stage_has_prim_prefix(stage, prefix: str) -> bool:
+    prim = stage.GetPrimAtPath(prefix) if Sdf.Path.IsValidPathString(prefix) else None
+    if prim and prim.IsValid():
+        return True
+    for prim in stage.Traverse():
+        if str(prim.GetPath()).startswith(prefix):
+            return True
+    return False
+
+
+def wait_for_stage_ready(label: str, expected_prefixes=(), timeout: Optional[float] = None) -> bool:
+    """
+    Step the app until the stage has no pending loads and all expected prims exist.
+    `expected_prefixes` are prim paths or path prefixes (e.g. '/Replicator/Ref_Xform').
+    The stage must stay idle for --ready_settle_updates consecutive updates.
+    Returns True when ready, False when the timeout expired first.
+    """
+    timeout = args.ready_timeout if timeout is None else timeout
+    settle = max(1, args.ready_settle_updates)
+    stage = get_current_stage()
+    missing = list(expected_prefixes)
+    updates = 0
+    idle_streak = 0
+    start = time.monotonic()
+    while True:
+        simulation_app.update()
+        updates += 1
+        pending = _pending_stage_loads()
+        if pending == 0 and missing:
+            missing = [p for p in missing if not _stage_has_prim_prefix(stage, p)]
+        if pending == 0 and not missing:
+            idle_streak += 1
+            if idle_streak >= settle:
+                print(f"[SDG] {label} ready after {updates} app update(s) ({time.monotonic() - start:.2f}s)")
+                return True
+        else:
+            idle_streak = 0
+        if time.monotonic() - start > timeout:
+            carb.log_warn(
+                f"[SDG] {label} not ready after {updates} app update(s) ({timeout:.1f}s timeout); "
+                f"pending loads={pending}, missing prims={missing}"
+            )
+            return False
+
+
+def build_visibility_schedule(num_frames: int, pool_size: int, count_min: int, count_max: int, rng=random) -> List[bool]:
+    """
+    Flattened per-frame visibility flags for one instance pool: for every frame draw a
+    visible count k in [count_min, count_max] and show a random subset of k instances.
+    Consumed pool_size values at a time by a Replicator sequence distribution.
+    """
+    schedule: List[bool] = []
+    indices = range(pool_size)
+    for _ in range(num_frames):
+        visible = set(rng.sample(indices, rng.randint(count_min, count_max)))
+        schedule.extend(i in visible for i in indices)
+    return schedule
+
+
 def add_custom_objects():
-    """Spawn via Replicator first; if nothing appears, fall back to USD references under /World."""
+    """
+    Spawn via Replicator first; if nothing appears, fall back to USD references under /World.
+    Returns (group, per-asset pools); pools is None on the fallback path.
+    """
     stage = get_current_stage()
     asset_paths = [normalize_asset_path(p) for p in get_custom_asset_paths()]
 
@@ -906,22 +1301,17 @@ def add_custom_objects():
     rep_obj_list = []
     for p, cls in zip(asset_paths, ASSET_CLASSES):
         rep_obj_list.append(
-            rep.create.from_usd(p, semantics=[("class", cls)], count=25)
+            rep.create.from_usd(p, semantics=[("class", cls)], count=INSTANCE_POOL_MAX)
         )
     rep_custom_group = rep.create.group(rep_obj_list)
 
-    for _ in range(10):
-        simulation_app.update()
-
-    found_replicator_instances = False
-    for prim in stage.Traverse():
-        if str(prim.GetPath()).startswith("/Replicator/Ref_Xform"):
-            found_replicator_instances = True
-            break
+    found_replicator_instances = wait_for_stage_ready(
+        "Custom objects", expected_prefixes=["/Replicator/Ref_Xform"], timeout=args.spawn_ready_timeout
+    )
 
     if found_replicator_instances:
         carb.log_info("[SDG] Spawned via Replicator (Ref_Xform found).")
-        return rep_custom_group
+        return rep_custom_group, rep_obj_list
 
     carb.log_warn("[SDG] Replicator instances not found; falling back to USD references under /World.")
     # For fallback, reference each asset FALLBACK_COUNT times and tag with its class
@@ -936,28 +1326,194 @@ def add_custom_objects():
             sem.GetSemanticTypeAttr().Set("class")
             sem.GetSemanticDataAttr().Set(cls)
 
-    for _ in range(10):
-        simulation_app.update()
+    wait_for_stage_ready(
+        "Fallback custom objects", expected_prefixes=[f"/World/{OBJECT_PRIM_PREFIX}_"], timeout=args.spawn_ready_timeout
+    )
 
-    return rep.get.prims(path_pattern=f"/World/{OBJECT_PRIM_PREFIX}_*")
+    return rep.get.prims(path_pattern=f"/World/{OBJECT_PRIM_PREFIX}_*"), None
 
 
 def add_distractors(distractor_type="warehouse"):
+    """Returns (group, number of distractor prims)."""
     full_distractors = full_distractors_list(distractor_type)
     distractors = [rep.create.from_usd(path, count=1) for path in full_distractors]
-    return rep.create.group(distractors)
+    return rep.create.group(distractors), len(full_distractors)
 
 
-def run_orchestrator():
-    rep.orchestrator.run()
-    while not rep.orchestrator.get_is_started():
-        simulation_app.update()
-    while rep.orchestrator.get_is_started():
-        simulation_app.update()
+def build_pose_fields(num_objects: int, num_distractors: int) -> List[PoseField]:
+    """Pose schedule fields for the scene; per-prim fields consume one value per prim and frame."""
+    fields = [
+        PoseField("cam_pos", CAM_POS_MIN, CAM_POS_MAX),
+        PoseField("obj_pos", OBJ_POS_MIN, OBJ_POS_MAX, count=num_objects),
+        PoseField("obj_rot", OBJ_ROT_MIN, OBJ_ROT_MAX, count=num_objects),
+        PoseField("obj_scale", OBJ_SCALE_MIN, OBJ_SCALE_MAX, count=num_objects, uniform_scale=OBJ_SCALE_MODE == "scalar"),
+    ]
+    if num_distractors > 0:
+        fields += [
+            PoseField("dist_pos", DIST_POS_MIN, DIST_POS_MAX, count=num_distractors),
+            PoseField("dist_rot", DIST_ROT_MIN, DIST_ROT_MAX, count=num_distractors),
+            PoseField(
+                "dist_scale",
+                DIST_SCALE_MIN,
+                DIST_SCALE_MAX,
+                count=num_distractors,
+                uniform_scale=DIST_SCALE_MODE == "scalar",
+            ),
+        ]
+    return fields
+
+
+def measure_asset_radius(asset_path: str) -> Optional[float]:
+    """Largest distance from the asset origin to a corner of its bounds, in asset units."""
+    try:
+        asset_stage = Usd.Stage.Open(asset_path.replace("file://", ""))
+        cache = UsdGeom.BBoxCache(Usd.TimeCode.Default(), [UsdGeom.Tokens.default_, UsdGeom.Tokens.render])
+        box = cache.ComputeWorldBound(asset_stage.GetPseudoRoot()).ComputeAlignedRange()
+    except Exception as exc:
+        carb.log_warn(f"[SDG] Could not measure bounds of {asset_path}: {exc}")
+        return None
+    if box.IsEmpty():
+        return None
+    corner = np.maximum(np.abs(np.array(box.GetMin())), np.abs(np.array(box.GetMax())))
+    return float(np.linalg.norm(corner))
+
+
+def object_prim_radii(per_asset: int) -> List[float]:
+    """Unit-scale bounding radius per object prim (asset-major, like the Replicator group)."""
+    radii = []
+    for path in CUSTOM_ASSET_PATHS:
+        radius = args.object_radius or measure_asset_radius(normalize_asset_path(path))
+        if not radius:
+            radius = 10.0
+            carb.log_warn(f"[SDG] Using a {radius} unit bounding radius for {path}; set --object_radius to override.")
+        radii.extend([radius] * per_asset)
+    return radii
+
+
+def prepare_pose_schedule(
+    num_frames: int, num_objects: int, num_distractors: int, active: Optional[np.ndarray] = None
+) -> Tuple[dict, np.ndarray]:
+    """
+    Sample (or replay with --pose_schedule) the per-frame poses, apply --frustum_filter and
+    save them next to the output. Returns (schedule, kept mask over the sampled frames).
+    """
+    fields = build_pose_fields(num_objects, num_distractors)
+    if args.pose_schedule:
+        schedule, meta = load_pose_schedule(_expand_path(args.pose_schedule))
+        errors = check_schedule(schedule, fields, num_frames)
+        if errors:
+            raise SystemExit(f"[SDG] --pose_schedule {args.pose_schedule} does not fit this scene: {'; '.join(errors)}")
+        schedule = {k: v[:num_frames] for k, v in schedule.items()}
+    else:
+        schedule = build_pose_schedule(fields, num_frames, args.pose_seed, args.frame_offset, args.pose_sampler)
+        meta = schedule_meta(fields, args.pose_seed, args.frame_offset, args.pose_sampler)
+    kept = np.ones(len(schedule["frame_index"]), dtype=bool)
+    if args.frustum_filter != "off":
+        schedule, stats, kept = apply_frustum_filter(
+            schedule,
+            {f.name: f for f in fields},
+            np.asarray(object_prim_radii(num_objects // max(1, len(CUSTOM_ASSET_PATHS)))),
+            args.width,
+            args.height,
+            camera_intrinsics(args.width, args.height, args.focal_length, args.horizontal_aperture),
+            mode=args.frustum_filter,
+            min_visible=args.frustum_min_visible,
+            max_attempts=args.frustum_max_resample,
+            active=active,
+            seed=args.pose_seed,
+            min_radius_px=args.frustum_min_radius_px,
+        )
+        meta["frustum_filter"] = stats
+        print(
+            f"[SDG] Frustum filter ({stats['mode']}): {stats['frames_without_target']}/{stats['frames_in']} frames "
+            f"had no target in view; resampled {stats['frames_resampled']}, rejected {stats['frames_rejected']}, "
+            f"still empty {stats['frames_still_without_target']}"
+        )
+        if not kept.any():
+            raise SystemExit("[SDG] --frustum_filter reject dropped every frame; check the camera/object ranges.")
+    os.makedirs(args.data_dir, exist_ok=True)
+    save_pose_schedule(os.path.join(args.data_dir, "pose_schedule.npz"), schedule, meta)
+    frames = schedule["frame_index"]
+    print(
+        f"[SDG] Pose schedule ({meta.get('sampler')}, seed {meta.get('seed')}): "
+        f"global frames {int(frames[0])}..{int(frames[-1])}, {num_objects} object / {num_distractors} distractor prims"
+    )
+    coverage = coverage_report(schedule, meta)
+    with open(os.path.join(args.data_dir, "pose_coverage.json"), "w", encoding="utf-8") as f:
+        json.dump(coverage, f, indent=2)
+    for name, cov in coverage.items():
+        print(
+            f"[SDG]   {name}: voxel occupancy {cov['voxel_occupancy']:.1%} "
+            f"({cov['bins_per_axis']}^{cov['dims']} cells), CL2 discrepancy {cov['cl2_discrepancy']:.4f}"
+        )
+    return schedule, kept
+
+
+def run_orchestrator(gate: Optional[FrameGate] = None, max_frames: int = 0):
+    if gate is None:
+        rep.orchestrator.run()
+        while not rep.orchestrator.get_is_started():
+            simulation_app.update()
+        while rep.orchestrator.get_is_started():
+            simulation_app.update()
+    else:
+        # Step frame by frame so rendering stops as soon as enough frames were accepted.
+        rendered = 0
+        while not gate.done and rendered < max_frames:
+            rep.orchestrator.step()
+            rendered += 1
     rep.BackendDispatch.wait_until_done()
     rep.orchestrator.stop()
 
 
+def build_label_emitter() -> Optional[LabelEmitter]:
+    """LabelEmitter for --emit_yolo_labels / --emit_tao_coco, or None when neither is set."""
+    if not (args.emit_yolo_labels or args.emit_tao_coco):
+        return None
+    data_dir = os.path.abspath(args.data_dir)
+    root = _expand_path(args.label_out_root) if args.label_out_root else os.path.dirname(data_dir)
+    split = os.path.basename(data_dir.rstrip(os.sep))
+    return LabelEmitter(
+        UNIQUE_CLASSES,
+        yolo_labels_dir=os.path.join(root, "labels", split) if args.emit_yolo_labels else None,
+        yolo_images_dir=os.path.join(root, "images", split) if args.emit_yolo_labels else None,
+        tao_coco_path=os.path.join(data_dir, "coco_annotations.json") if args.emit_tao_coco else None,
+        classmap_path=os.path.join(root, "classmap.txt") if args.emit_tao_coco else None,
+    )
+
+
+def emit_labels_from_coco_writer(output_dir: str, emitter: LabelEmitter) -> None:
+    """CocoWriter names its own files, so labels are emitted from its json once the run ends."""
+    candidates = [
+        p
+        for p in glob.glob(os.path.join(output_dir, "coco_*.json"))
+        if os.path.basename(p) != "coco_annotations.json"
+    ]
+    if not candidates:
+        carb.log_warn(f"[SDG] No CocoWriter json found in {output_dir}; skipping label emission.")
+        return
+    src = max(candidates, key=os.path.getmtime)
+    with open(src, "r", encoding="utf-8") as f:
+        coco = json.load(f)
+    n_images = emitter.emit_from_coco(coco, output_dir)
+    emitter.finalize(coco)
+    print(f"[SDG] Emitted labels for {n_images} image(s) from {os.path.basename(src)}")
+
+
+def make_gated_writer(base_writer_name: str, gate: FrameGate):
+    """Register a subclass of `base_writer_name` that only writes frames accepted by `gate`."""
+    base_cls = type(rep.WriterRegistry.get(base_writer_name))
+
+    class GatedWriter(base_cls):
+        def write(self, data):
+            if gate(find_annotator_payload(data, "bounding_box_2d_tight")):
+                super().write(data)
+
+    GatedWriter.__name__ = f"Gated{base_writer_name}"
+    rep.WriterRegistry.register(GatedWriter)
+    return rep.WriterRegistry.get(GatedWriter.__name__)
+
+
 # ---------- material helpers ----------
 
 def ensure_looks_scope(scope_path: str = "/World/Looks"):
@@ -1140,30 +1696,376 @@ def assign_random_materials_to_targets(material_paths):
     carb.log_info(f"[SDG] Assigned {len(material_paths)} materials randomly to {len(targets)} targets.")
 
 
+def localize_assets() -> int:
+    """Mirror every remote asset a run can touch into --asset_cache_dir. Returns an exit code."""
+    if ASSET_CACHE is None:
+        print("[SDG] --localize_assets requires --asset_cache_dir.")
+        return 2
+    robot_paths, _repeat, source = _resolve_warehouse_robot_inputs()
+    keys = [ENV_URL]
+    for raw in robot_paths:
+        p = _normalize_robot_asset_path(raw)
+        if p and not p.startswith(("omniverse://", "http://", "https://", "file://")) and not p.startswith("/Isaac/"):
+            p = "/Isaac/" + p.lstrip("/")
+        keys.append(p)
+    keys.extend(DISTRACTORS_ADDITIONAL)
+    keys.extend(TEXTURES)
+    keys.extend(ONLINE_MDL_URLS)
+    print(f"[SDG] Localizing {len(_dedupe_keep_order(keys))} asset(s) into {ASSET_CACHE.root} (robots from {source})")
+    stats = localize_into_cache(ASSET_CACHE, _get_assets_root_cached(), keys)
+    print(
+        f"[SDG] Localize done: fetched={stats['fetched']} already_cached={stats['cached']} "
+        f"new_blobs={stats['new_blobs']} failed={len(stats['failed'])}"
+    )
+    for key in stats["failed"]:
+        print(f"[SDG]   failed: {key}")
+    return 1 if stats["failed"] else 0
+
+
+def _range_plan(mode: str, vmin, vmax) -> dict:
+    return {"mode": mode, "min": vmin, "max": vmax}
+
+
+def build_run_plan() -> Tuple[dict, List[str]]:
+    """Resolve the full run configuration without Kit. Returns (plan, errors)."""
+    errors: List[str] = []
+    warnings: List[str] = []
+
+    if args.num_frames <= 0:
+        errors.append(f"--num_frames must be > 0 (got {args.num_frames})")
+    if args.frame_offset < 0:
+        errors.append(f"--frame_offset must be >= 0 (got {args.frame_offset})")
+    if args.frustum_filter != "off" and args.pose_sampler == "replicator" and not args.pose_schedule:
+        errors.append("--frustum_filter needs pre-sampled poses (--pose_sampler uniform|halton|sobol or --pose_schedule)")
+    if args.pose_sampler == "sobol" and not args.pose_schedule:
+        try:
+            from scipy.stats import qmc  # noqa: F401
+        except ImportError:
+            errors.append("--pose_sampler sobol needs scipy (scipy.stats.qmc); use halton or uniform instead")
+    if args.pose_schedule and not os.path.isfile(_expand_path(args.pose_schedule)):
+        errors.append(f"--pose_schedule not found: {args.pose_schedule}")
+    if args.material_reroll_interval < 1:
+        errors.append(f"--material_reroll_interval must be >= 1 (got {args.material_reroll_interval})")
+    if args.width <= 0 or args.height <= 0:
+        errors.append(f"--width/--height must be > 0 (got {args.width}x{args.height})")
+    if RESOLUTION_VARIANTS and args.writer != "streaming":
+        errors.append("--resolution_variants requires --writer streaming")
+    for variant in RESOLUTION_VARIANTS:
+        if variant.width > args.width or variant.height > args.height:
+            errors.append(
+                f"Resolution variant {variant.name} exceeds the render resolution {args.width}x{args.height}; "
+                "render at the largest resolution and derive the smaller ones")
+    if args.writer == "streaming" and OUTPUT_PROFILE != "detection":
+        errors.append(f"--writer streaming only supports --output_profile detection (got {OUTPUT_PROFILE})")
+    if str(args.distractors) not in {"warehouse", "additional", "None"}:
+        warnings.append(f"--distractors '{args.distractors}' is not 'warehouse'/'additional'; no distractors will be added")
+
+    for mat_dir in args.materials_dir or []:
+        if not os.path.isdir(_expand_path(mat_dir)):
+            errors.append(f"--materials_dir not found: {mat_dir}")
+    local_material_files = get_local_material_files()
+    if LOCAL_MATERIAL_DIRS and not local_material_files:
+        warnings.append(f"No local USD material files under: {', '.join(LOCAL_MATERIAL_DIRS)}")
+
+    robot_paths, robot_repeat, robot_source = [], 0, ""
+    if str(args.distractors).lower() == "warehouse":
+        try:
+            robot_paths, robot_repeat, robot_source = _resolve_warehouse_robot_inputs()
+        except SystemExit as exc:
+            errors.append(str(exc))
+
+    cache_plan = None
+    if ASSET_CACHE is not None:
+        cache_keys = [ENV_URL] + TEXTURES + ONLINE_MDL_URLS
+        if robot_paths:
+            cache_keys += [_normalize_robot_asset_path(p) for p in robot_paths]
+        missing = [k for k in _dedupe_keep_order(cache_keys) if not ASSET_CACHE.lookup(k)]
+        cache_plan = {"dir": str(ASSET_CACHE.root), "missing": missing}
+        if missing:
+            warnings.append(f"{len(missing)} asset(s) not in --asset_cache_dir; they will be fetched remotely")
+
+    plan = {
+        "ok": not errors,
+        "errors": errors,
+        "warnings": warnings,
+        "data_dir": args.data_dir,
+        "resolution": [args.width, args.height],
+        "num_frames": args.num_frames,
+        "headless": args.headless,
+        "distractors": args.distractors,
+        "assets": [{"path": p, "class": c} for p, c in zip(CUSTOM_ASSET_PATHS, ASSET_CLASSES)],
+        "unique_classes": UNIQUE_CLASSES,
+        "instances": {
+            "pool_max_per_asset": INSTANCE_POOL_MAX,
+            "visible_per_asset": [INSTANCE_COUNT_MIN, INSTANCE_COUNT_MAX],
+        },
+        "ranges": {
+            "object_scale": _range_plan(OBJ_SCALE_MODE, OBJ_SCALE_MIN, OBJ_SCALE_MAX),
+            "cam_pos": _range_plan("vector", CAM_POS_MIN, CAM_POS_MAX),
+            "obj_pos": _range_plan("vector", OBJ_POS_MIN, OBJ_POS_MAX),
+            "obj_rot": _range_plan("vector", OBJ_ROT_MIN, OBJ_ROT_MAX),
+            "dist_pos": _range_plan("vector", DIST_POS_MIN, DIST_POS_MAX),
+            "dist_rot": _range_plan("vector", DIST_ROT_MIN, DIST_ROT_MAX),
+            "dist_scale": _range_plan(DIST_SCALE_MODE, DIST_SCALE_MIN, DIST_SCALE_MAX),
+        },
+        "warehouse_robots": {"source": robot_source, "repeat": robot_repeat, "paths": robot_paths},
+        "materials": {
+            "mode": args.material_mode,
+            "reroll_interval": args.material_reroll_interval,
+            "dirs": LOCAL_MATERIAL_DIRS,
+            "local_files": local_material_files,
+            "online_mdl": ONLINE_MDL_URLS,
+        },
+        "asset_cache": cache_plan,
+        "poses": {
+            "sampler": args.pose_sampler,
+            "seed": args.pose_seed,
+            "frame_offset": args.frame_offset,
+            "replay": args.pose_schedule,
+        },
+        "frustum_filter": {
+            "mode": args.frustum_filter,
+            "min_visible": args.frustum_min_visible,
+            "max_resample": args.frustum_max_resample,
+            "min_radius_px": args.frustum_min_radius_px,
+            "object_radius": args.object_radius,
+            "intrinsics": dict(
+                zip(
+                    ("fx", "fy", "cx", "cy"),
+                    camera_intrinsics(args.width, args.height, args.focal_length, args.horizontal_aperture),
+                )
+            ),
+        },
+        "frame_gate": {
+            "enabled": args.gate_min_objects > 0,
+            "min_objects": args.gate_min_objects,
+            "min_bbox_px": args.gate_min_bbox_px,
+            "max_occlusion": args.gate_max_occlusion,
+            "require_all_classes": args.gate_require_all_classes,
+            "max_rendered_frames": max(args.num_frames, int(args.num_frames * args.gate_max_render_factor))
+            if args.gate_min_objects > 0
+            else args.num_frames,
+        },
+        "labels": {
+            "emit_yolo_labels": args.emit_yolo_labels,
+            "emit_tao_coco": args.emit_tao_coco,
+            "label_out_root": args.label_out_root or os.path.dirname(os.path.abspath(args.data_dir)),
+        },
+        "writer": {
+            "type": args.writer,
+            "workers": args.writer_workers,
+            "max_pending": args.writer_max_pending,
+        },
+        "output_profile": OUTPUT_PROFILE,
+        "resolution_variants": [
+            {"size": [v.width, v.height], "mode": v.mode, "data_dir": variant_data_dir(args.data_dir, v)}
+            for v in RESOLUTION_VARIANTS
+        ],
+        "estimated_disk": estimate_profile(
+            OUTPUT_PROFILE,
+            args.width,
+            args.height,
+            args.num_frames,
+            INSTANCE_COUNT_MAX * len(CUSTOM_ASSET_PATHS),
+            writer_workers=args.writer_workers if args.writer == "streaming" else 1,
+            disk_write_mbps=args.disk_write_mbps,
+        ),
+    }
+    return plan, errors
+
+
+# ---------- Kit launch ----------
+# Everything above is plain Python; Kit only starts here so that non-rendering
+# modes (--validate_only, --localize_assets with --asset_root) exit without launching it.
+
+if args.serve and (args.validate_only or args.localize_assets):
+    raise SystemExit("--serve runs jobs from a queue; validate or localize with a normal (non --serve) run.")
+
+if args.validate_only:
+    _plan, _errors = build_run_plan()
+    print(json.dumps(_plan, indent=2))
+    raise SystemExit(1 if _errors else 0)
+
+if args.localize_assets and args.asset_root:
+    raise SystemExit(localize_assets())
+
+from omni.isaac.kit import SimulationApp
+
+# App config
+CONFIG = {
+    "renderer": "RayTracedLighting",
+    "headless": args.headless,
+    "width": args.width,
+    "height": args.height,
+    "num_frames": args.num_frames,
+}
+
+simulation_app = SimulationApp(launch_config=CONFIG)
+
+import carb
+import omni
+import omni.client
+import omni.kit.commands
+import omni.usd
+from omni.isaac.core.utils.nucleus import get_assets_root_path
+from omni.isaac.core.utils.stage import get_current_stage, open_stage
+from pxr import Semantics, Usd, UsdGeom, Sdf, UsdShade, Gf
+import omni.replicator.core as rep
+from omni.isaac.core.utils.semantics import get_semantics  # noqa
+
+# Replicator settings
+rep.settings.carb_settings("/omni/replicator/RTSubframes", 4)
+
+
+STREAM_JSONL_NAME = "coco_frames.jsonl"
+STREAM_COCO_NAME = "coco_annotations_stream.json"
+STREAM_STATS_NAME = "writer_stats.json"
+
+
+class StreamingCocoWriter(rep.Writer):
+    """
+    COCO writer that keeps disk I/O off the render thread.
+    RGB encoding and file writes run on a bounded thread pool; each finished frame appends
+    its annotations to coco_frames.jsonl, which is consolidated into a standard COCO json
+    (same Replicator/rgb_XXXX.png layout as CocoWriter) when the run ends.
+    Optional resolution variants are resized from the same render on the pool and get the
+    same layout (with rescaled bboxes) under their own data dir.
+    """
+
+    def __init__(
+        self,
+        output_dir=None,
+        categories=None,
+        max_workers=4,
+        max_pending=32,
+        image_subdir="Replicator",
+        label_emitter=None,
+        variants=None,
+    ):
+        self.annotators = [
+            rep.AnnotatorRegistry.get_annotator("rgb"),
+            rep.AnnotatorRegistry.get_annotator("bounding_box_2d_tight"),
+        ]
+        self.output_dir = output_dir
+        self._categories = list((categories or {}).values())
+        self._class_to_category = {name: cat["id"] for name, cat in (categories or {}).items()}
+        self._image_subdir = image_subdir
+        self._label_emitter = label_emitter
+        self._frame_id = 0
+        self._finalized = False
+        self._queue = BoundedWorkQueue(max_workers, max_pending)
+        self._log = None
+        # (variant, data_dir, JsonlLog) per extra resolution
+        self._variants = []
+        if output_dir:
+            os.makedirs(os.path.join(output_dir, image_subdir), exist_ok=True)
+            self._log = JsonlLog(os.path.join(output_dir, STREAM_JSONL_NAME))
+            for variant in variants or []:
+                vdir = variant_data_dir(output_dir, variant)
+                os.makedirs(os.path.join(vdir, image_subdir), exist_ok=True)
+                self._variants.append((variant, vdir, JsonlLog(os.path.join(vdir, STREAM_JSONL_NAME))))
+
+    def write(self, data):
+        rgb = find_annotator_payload(data, "rgb")
+        if isinstance(rgb, dict):
+            rgb = rgb.get("data")
+        anns = bbox_payload_to_coco(find_annotator_payload(data, "bounding_box_2d_tight"), self._class_to_category)
+        frame_id = self._frame_id
+        self._frame_id += 1
+        # Annotator buffers can be reused by the renderer; hand the workers their own (read-only) copy.
+        rgb = rgb.copy()
+        self._queue.submit(self._write_frame, frame_id, rgb, anns)
+        for index in range(len(self._variants)):
+            self._queue.submit(self._write_variant, index, frame_id, rgb, anns)
+        if frame_id % 100 == 0:
+            stats = self._queue.stats()
+            carb.log_info(
+                f"[SDG] Streaming writer frame {frame_id}: queue depth {stats['queue_depth']}/{stats['max_pending']}, "
+                f"blocked {stats['blocked_submits']}x ({stats['blocked_seconds']}s)"
+            )
+
+    def _write_frame(self, frame_id: int, rgb, anns) -> None:
+        file_name = f"{self._image_subdir}/rgb_{frame_id:04d}.png"
+        image_path = os.path.join(self.output_dir, file_name)
+        save_rgb_png(rgb, image_path)
+        height, width = rgb.shape[:2]
+        if self._label_emitter is not None:
+            self._label_emitter.emit_frame(image_path, width, height, anns)
+        self._log.append(
+            {
+                "frame": frame_id,
+                "image": {"file_name": file_name, "width": int(width), "height": int(height)},
+                "annotations": anns,
+            }
+        )
+
+    def _write_variant(self, index: int, frame_id: int, rgb, anns) -> None:
+        variant, vdir, log = self._variants[index]
+        height, width = rgb.shape[:2]
+        file_name = f"{self._image_subdir}/rgb_{frame_id:04d}.png"
+        save_rgb_png(variant.apply_image(rgb), os.path.join(vdir, file_name))
+        log.append(
+            {
+                "frame": frame_id,
+                "image": {"file_name": file_name, "width": variant.width, "height": variant.height},
+                "annotations": variant.apply_annotations(anns, width, height),
+            }
+        )
+
+    def stats(self) -> dict:
+        return self._queue.stats()
+
+    def finalize(self) -> None:
+        if self._finalized or self._log is None:
+            return
+        self._finalized = True
+        self._queue.close()
+        self._log.close()
+        coco = consolidate_coco_jsonl(
+            os.path.join(self.output_dir, STREAM_JSONL_NAME),
+            self._categories,
+            os.path.join(self.output_dir, STREAM_COCO_NAME),
+        )
+        if self._label_emitter is not None:
+            self._label_emitter.finalize(coco)
+        stats = dict(self._queue.stats(), images=len(coco["images"]), annotations=len(coco["annotations"]))
+        for variant, vdir, log in self._variants:
+            log.close()
+            vcoco = consolidate_coco_jsonl(
+                os.path.join(vdir, STREAM_JSONL_NAME), self._categories, os.path.join(vdir, STREAM_COCO_NAME)
+            )
+            stats.setdefault("variants", {})[variant.name] = {
+                "mode": variant.mode,
+                "data_dir": vdir,
+                "images": len(vcoco["images"]),
+                "annotations": len(vcoco["annotations"]),
+            }
+        with open(os.path.join(self.output_dir, STREAM_STATS_NAME), "w", encoding="utf-8") as f:
+            json.dump(stats, f, indent=2)
+        print(f"[SDG] Streaming writer done: {stats}")
+
+    def on_final_frame(self):
+        self.finalize()
+
+
+
 # ---------- main ----------
 
-def main():
+def load_environment():
     print(f"Loading Stage {ENV_URL}")
     open_stage(prefix_with_isaac_asset_server(ENV_URL))
-    stage = get_current_stage()
 
     # Allow environment to finish loading
-    for i in range(100):
-        if i % 10 == 0:
-            print(f"App update {i}..")
-        simulation_app.update()
+    if not wait_for_stage_ready("Environment stage"):
+        carb.log_warn("[SDG] Continuing with a partially loaded environment stage.")
 
-    textures = full_textures_list()
-    rep_custom_group = add_custom_objects()
-    rep_distractor_group = add_distractors(distractor_type=args.distractors)
 
-    # Keep only the requested object semantics (all unique classes)
-    update_semantics(stage=stage, keep_semantics=UNIQUE_CLASSES)
+# Material prims already on the stage, by source (kept across warm-server jobs)
+_LOADED_MATERIALS = {}
 
-    # Camera
-    cam = rep.create.camera(clipping_range=(0.1, 1_000_000))
 
-    # ---- Import & create materials (once) ----
+def load_materials() -> List[str]:
+    """Import local USD materials and create the MDL materials; sources loaded before are reused."""
     material_prim_paths = []
 
     # Import local USD materials (if present) and add them to the list
@@ -1176,66 +2078,184 @@ def main():
         )
 
     # For each USD file, import all UsdShade.Material prims found inside
-    imported_set = set()
     for local_file in local_material_files:
-        try:
-            prims = list_material_prims_in_usd(local_file)
-        except Exception as e:
-            carb.log_error(f"[SDG] Error scanning materials in {local_file}: {e}")
-            prims = []
-        if not prims:
-            continue
-        for prim_hint in prims:
+        if local_file not in _LOADED_MATERIALS:
+            _LOADED_MATERIALS[local_file] = []
             try:
-                mp = import_usd_material(local_file, prim_hint=prim_hint)
-                if mp and mp not in imported_set:
-                    material_prim_paths.append(mp)
-                    imported_set.add(mp)
+                prims = list_material_prims_in_usd(local_file)
             except Exception as e:
-                carb.log_error(f"[SDG] Error importing material prim {prim_hint} from {local_file}: {e}")
+                carb.log_error(f"[SDG] Error scanning materials in {local_file}: {e}")
+                prims = []
+            for prim_hint in prims:
+                try:
+                    mp = import_usd_material(local_file, prim_hint=prim_hint)
+                    if mp:
+                        _LOADED_MATERIALS[local_file].append(mp)
+                except Exception as e:
+                    carb.log_error(f"[SDG] Error importing material prim {prim_hint} from {local_file}: {e}")
+        material_prim_paths.extend(_LOADED_MATERIALS[local_file])
 
     # Create MDL materials from online MDL URLs and add them
     for mdlu in ONLINE_MDL_URLS:
-        mdl_name = os.path.splitext(os.path.basename(mdlu))[0]
-        try:
-            mdl_prim_path = make_mdl_material(mdlu, mdl_name)
-            if mdl_prim_path:
-                material_prim_paths.append(mdl_prim_path)
-        except Exception as e:
-            carb.log_warn(f"[SDG] Could not create MDL material for {mdlu}: {e}")
-
-    # wait a little for USD composition to settle
-    for _ in range(10):
-        simulation_app.update()
+        if mdlu not in _LOADED_MATERIALS:
+            mdl_name = os.path.splitext(os.path.basename(mdlu))[0]
+            try:
+                mdl_prim_path = make_mdl_material(resolve_cached_url(mdlu), mdl_name)
+                _LOADED_MATERIALS[mdlu] = [mdl_prim_path] if mdl_prim_path else []
+            except Exception as e:
+                carb.log_warn(f"[SDG] Could not create MDL material for {mdlu}: {e}")
+                _LOADED_MATERIALS[mdlu] = []
+        material_prim_paths.extend(_LOADED_MATERIALS[mdlu])
 
-    # assign one random material from the combined set to each instance (keeps constant during run)
-    if material_prim_paths:
-        assign_random_materials_to_targets(material_prim_paths)
-    else:
+    material_prim_paths = _dedupe_keep_order(material_prim_paths)
+    # wait for USD composition of the material references to settle
+    wait_for_stage_ready("Materials", expected_prefixes=material_prim_paths)
+    return material_prim_paths
+
+
+def clear_job_scene() -> None:
+    """Remove what a job added (Replicator prims/graphs, fallback objects); keep the environment and materials."""
+    stage = get_current_stage()
+    paths = []
+    replicator = stage.GetPrimAtPath("/Replicator")
+    if replicator:
+        paths += [str(p.GetPath()) for p in replicator.GetChildren()]
+    world = stage.GetPrimAtPath("/World")
+    if world:
+        paths += [str(p.GetPath()) for p in world.GetChildren() if p.GetName().startswith(f"{OBJECT_PRIM_PREFIX}_")]
+    if paths:
+        omni.kit.commands.execute("DeletePrims", paths=paths)
+    simulation_app.update()
+
+
+def run_job() -> dict:
+    """Build the randomized scene for the current configuration, render it and return a summary."""
+    stage = get_current_stage()
+    textures = full_textures_list()
+    rep_custom_group, rep_custom_pools = add_custom_objects()
+    rep_distractor_group, num_distractors = add_distractors(distractor_type=args.distractors)
+
+    # Keep only the requested object semantics (all unique classes)
+    update_semantics(stage=stage, keep_semantics=UNIQUE_CLASSES)
+
+    # Camera
+    cam = rep.create.camera(
+        clipping_range=(0.1, 1_000_000),
+        focal_length=args.focal_length,
+        horizontal_aperture=args.horizontal_aperture,
+    )
+
+    # ---- Import & create materials (once per source) ----
+    material_prim_paths = load_materials()
+
+    per_frame_materials = args.material_mode == "per_frame" and bool(material_prim_paths)
+    if not material_prim_paths:
         carb.log_warn("[SDG] No materials were successfully created/imported; continuing without material binding.")
+    elif not per_frame_materials:
+        # assign one random material from the combined set to each instance (keeps constant during run)
+        assign_random_materials_to_targets(material_prim_paths)
+
+    # Frame gating renders extra frames to make up for rejected ones
+    frame_gate = None
+    max_frames = CONFIG["num_frames"]
+    if args.gate_min_objects > 0:
+        frame_gate = FrameGate(
+            UNIQUE_CLASSES,
+            min_objects=args.gate_min_objects,
+            min_bbox_px=args.gate_min_bbox_px,
+            max_occlusion=args.gate_max_occlusion,
+            required_classes=UNIQUE_CLASSES if args.gate_require_all_classes else (),
+            target_frames=CONFIG["num_frames"],
+        )
+        max_frames = max(CONFIG["num_frames"], int(CONFIG["num_frames"] * args.gate_max_render_factor))
+
+    # Pooled instance mode: precompute which pool members are visible in each frame
+    pooled_visibility = None
+    if args.instance_count:
+        if rep_custom_pools is None:
+            carb.log_warn("[SDG] --instance_count needs Replicator instances; fallback references stay visible.")
+        else:
+            pooled_visibility = [
+                build_visibility_schedule(
+                    max_frames, INSTANCE_POOL_MAX, INSTANCE_COUNT_MIN, INSTANCE_COUNT_MAX
+                )
+                for _ in rep_custom_pools
+            ]
+            carb.log_info(
+                f"[SDG] Pooled instances: {INSTANCE_POOL_MAX} per asset, "
+                f"{INSTANCE_COUNT_MIN}-{INSTANCE_COUNT_MAX} visible per frame"
+            )
+
+    # Pre-sampled poses (NumPy) replace the in-graph uniform distributions
+    poses = None
+    if args.pose_schedule or args.pose_sampler != "replicator":
+        num_objects = len(CUSTOM_ASSET_PATHS) * (INSTANCE_POOL_MAX if rep_custom_pools is not None else FALLBACK_COUNT)
+        active = None
+        if pooled_visibility:
+            # (frames, object prims) visibility, asset-major like the pose arrays
+            active = np.concatenate(
+                [np.asarray(v, dtype=bool).reshape(max_frames, INSTANCE_POOL_MAX) for v in pooled_visibility], axis=1
+            )
+        poses, kept = prepare_pose_schedule(
+            max_frames, num_objects, num_distractors if args.distractors != "None" else 0, active
+        )
+        if not kept.all():
+            # Rejected frames are dropped from every per-frame schedule
+            max_frames = int(kept.sum())
+            if pooled_visibility:
+                pooled_visibility = [
+                    np.asarray(v, dtype=bool).reshape(-1, INSTANCE_POOL_MAX)[kept].ravel().tolist()
+                    for v in pooled_visibility
+                ]
+            if frame_gate is None and max_frames < CONFIG["num_frames"]:
+                carb.log_warn(f"[SDG] Frustum filter rejected frames; rendering {max_frames} of {CONFIG['num_frames']}.")
 
     # ---- Replicator trigger ----
-    # use max_execs (num_frames)
-    with rep.trigger.on_frame(max_execs=CONFIG["num_frames"]):
+    # use max_execs (num_frames, or the gating render budget)
+    with rep.trigger.on_frame(max_execs=max_frames):
 
         # Camera motion
         with cam:
             rep.modify.pose(
-                position=rep.distribution.uniform(CAM_POS_MIN, CAM_POS_MAX),
+                position=(
+                    rep.distribution.sequence(as_sequence(poses["cam_pos"]))
+                    if poses
+                    else rep.distribution.uniform(CAM_POS_MIN, CAM_POS_MAX)
+                ),
                 look_at=(0, 0, 0),
             )
 
         # Object pose randomization (scale from CLI; default fixed 0.01)
         with rep_custom_group:
-            _scale_dist = rep.distribution.uniform(OBJ_SCALE_MIN, OBJ_SCALE_MAX)
-            rep.modify.pose(
-                position=rep.distribution.uniform(OBJ_POS_MIN, OBJ_POS_MAX),
-                rotation=rep.distribution.uniform(OBJ_ROT_MIN, OBJ_ROT_MAX),
-                scale=_scale_dist,
-            )
+            if poses:
+                rep.modify.pose(
+                    position=rep.distribution.sequence(as_sequence(poses["obj_pos"])),
+                    rotation=rep.distribution.sequence(as_sequence(poses["obj_rot"])),
+                    scale=rep.distribution.sequence(as_sequence(poses["obj_scale"])),
+                )
+            else:
+                _scale_dist = rep.distribution.uniform(OBJ_SCALE_MIN, OBJ_SCALE_MAX)
+                rep.modify.pose(
+                    position=rep.distribution.uniform(OBJ_POS_MIN, OBJ_POS_MAX),
+                    rotation=rep.distribution.uniform(OBJ_ROT_MIN, OBJ_ROT_MAX),
+                    scale=_scale_dist,
+                )
+
+        # Pooled instances: show this frame's subset, hide the rest (hidden prims are skipped by the renderer)
+        if pooled_visibility:
+            for pool, schedule in zip(rep_custom_pools, pooled_visibility):
+                with pool:
+                    rep.modify.visibility(rep.distribution.sequence(schedule))
 
         # Distractors (if any)
-        if args.distractors != "None":
+        if args.distractors != "None" and poses and "dist_pos" in poses:
+            with rep_distractor_group:
+                rep.modify.pose(
+                    position=rep.distribution.sequence(as_sequence(poses["dist_pos"])),
+                    rotation=rep.distribution.sequence(as_sequence(poses["dist_rot"])),
+                    scale=rep.distribution.sequence(as_sequence(poses["dist_scale"])),
+                )
+        elif args.distractors != "None":
             with rep_distractor_group:
                 _dist_scale = (
                     rep.distribution.uniform(DIST_SCALE_MIN, DIST_SCALE_MAX)
@@ -1275,8 +2295,28 @@ def main():
         with rep.get.prims(path_pattern="SM_Wall"):
             rep.randomizer.materials(random_mat_wall)
 
+    # Per-frame material re-roll on the custom objects, on its own interval trigger
+    if per_frame_materials:
+        material_targets = _find_model_bind_targets()
+        interval = max(1, args.material_reroll_interval)
+        max_rerolls = (max_frames + interval - 1) // interval
+        carb.log_info(
+            f"[SDG] Per-frame materials: {len(material_prim_paths)} materials on {len(material_targets)} targets, "
+            f"re-roll every {interval} frame(s)"
+        )
+        with rep.trigger.on_frame(interval=interval, max_execs=max_rerolls):
+            rep.randomizer.materials(material_prim_paths, input_prims=material_targets)
+
     # Writer (COCO for YOLOv8)
-    writer = rep.WriterRegistry.get("CocoWriter")
+    if args.writer == "streaming":
+        rep.WriterRegistry.register(StreamingCocoWriter)
+        base_writer_name = "StreamingCocoWriter"
+    else:
+        base_writer_name = "CocoWriter"
+    if frame_gate is not None:
+        writer = make_gated_writer(base_writer_name, frame_gate)
+    else:
+        writer = rep.WriterRegistry.get(base_writer_name)
     output_directory = args.data_dir
     print("Outputting data to ", output_directory)
 
@@ -1286,33 +2326,141 @@ def main():
         for i, cls in enumerate(UNIQUE_CLASSES)
     }
 
-    writer.initialize(
-        output_dir=output_directory,
-        categories=coco_categories,
-        # turn on what you need:
-        write_rgb=True,
-        write_bbox_2d_tight=True,
-        # optional toggles:
-        # write_bbox_2d_loose=False,
-        write_semantic=True,   # set True if you also want per-pixel semantic masks
-        write_instance=True,   # set True if you also want instance masks (for instance/seg models)
-    )
+    label_emitter = build_label_emitter()
+    if args.writer == "streaming":
+        writer.initialize(
+            output_dir=output_directory,
+            categories=coco_categories,
+            max_workers=args.writer_workers,
+            max_pending=args.writer_max_pending,
+            label_emitter=label_emitter,
+            variants=RESOLUTION_VARIANTS,
+        )
+    else:
+        # Outputs come from --output_profile; 'full' matches the previous always-on setup.
+        # Every toggle of 'full' is passed explicitly so profiles never rely on CocoWriter defaults.
+        profile_outputs = OUTPUT_PROFILES[OUTPUT_PROFILE]
+        writer.initialize(
+            output_dir=output_directory,
+            categories=coco_categories,
+            **{f"write_{name}": name in profile_outputs for name in OUTPUT_PROFILES["full"]},
+        )
+        print(f"[SDG] Output profile '{OUTPUT_PROFILE}': {', '.join(profile_outputs)}")
 
     RESOLUTION = (CONFIG["width"], CONFIG["height"])
     render_product = rep.create.render_product(cam, RESOLUTION)
-    writer.attach(render_product)
+    try:
+        writer.attach(render_product)
 
-    # Run
-    run_orchestrator()
-    simulation_app.update()
+        # Run
+        run_orchestrator(frame_gate, max_frames)
+        simulation_app.update()
+        if hasattr(writer, "finalize"):
+            writer.finalize()
+        elif label_emitter is not None:
+            emit_labels_from_coco_writer(output_directory, label_emitter)
+
+        if frame_gate is not None:
+            stats = frame_gate.summary()
+            print(
+                f"[SDG] Frame gate: accepted {stats['frames_accepted']}/{stats['frames_rendered']} rendered frames "
+                f"(acceptance rate {stats['acceptance_rate']:.1%}, rejections {stats['rejections']})"
+            )
+            if stats["frames_accepted"] < CONFIG["num_frames"]:
+                carb.log_warn(
+                    f"[SDG] Only {stats['frames_accepted']} of {CONFIG['num_frames']} frames accepted within "
+                    f"{max_frames} rendered; relax the gate thresholds or raise --gate_max_render_factor."
+                )
+            os.makedirs(output_directory, exist_ok=True)
+            with open(os.path.join(output_directory, "frame_gate_stats.json"), "w", encoding="utf-8") as f:
+                json.dump(stats, f, indent=2)
+    finally:
+        # The warm server keeps running after a failed job; a writer left attached would be
+        # driven by the next job's orchestrator and write into this job's data_dir
+        writer.detach()
+        render_product.destroy()
+    return {
+        "data_dir": output_directory,
+        "frames_rendered": max_frames,
+        "frame_gate": frame_gate.summary() if frame_gate is not None else None,
+    }
+
+
+# Flags that together select the custom objects; a job that sets any of them replaces them all
+ASSET_SELECTION_FLAGS = ("--asset_paths", "--asset_dir", "--asset_glob", "--object_class", "--object_classes")
+
+
+def _strip_flags(argv: List[str], flags) -> List[str]:
+    """`argv` without `flags` (as `--flag v...` or `--flag=v`) and their values."""
+    out: List[str] = []
+    skipping = False
+    for token in argv:
+        if token.startswith("--"):
+            skipping = token.split("=", 1)[0] in flags
+        if not skipping:
+            out.append(token)
+    return out
+
+
+class KitBackend:
+    """sdg_daemon backend: one SimulationApp and warehouse stage for every job of the queue."""
+
+    def __init__(self, server_argv: List[str]):
+        self.server_argv = list(server_argv)
+
+    def start(self) -> None:
+        load_environment()
+
+    def run(self, job: dict) -> dict:
+        # Job flags override the server command line (argparse keeps the last value). Asset
+        # selection is not merged: server --asset_dir plus job --asset_paths would render both.
+        job_args = job_argv(job)
+        server_args = self.server_argv
+        if any(t.split("=", 1)[0] in ASSET_SELECTION_FLAGS for t in job_args if t.startswith("--")):
+            server_args = _strip_flags(server_args, ASSET_SELECTION_FLAGS)
+        configure(server_args + job_args)
+        _plan, errors = build_run_plan()
+        if errors:
+            raise ValueError("; ".join(errors))
+        CONFIG.update(width=args.width, height=args.height, num_frames=args.num_frames)
+        try:
+            return run_job()
+        finally:
+            clear_job_scene()
+
+    def close(self) -> None:
+        pass
+
+
+def main() -> int:
+    if args.localize_assets:
+        return localize_assets()
+
+    if args.serve:
+        serve(
+            JobQueue(_expand_path(args.serve)),
+            KitBackend(sys.argv[1:]),
+            idle_timeout=args.serve_idle_timeout,
+            log=lambda msg: print(msg, flush=True),
+        )
+        return 0
+
+    load_environment()
+    run_job()
+    return 0
 
 
 if __name__ == "__main__":
+    exit_code = 0
     try:
-        main()
+        exit_code = main()
     except Exception as e:
         carb.log_error(f"Exception: {e}")
         import traceback
         traceback.print_exc()
+        # Non-zero so generate_sdg_splits.sh (set -e) stops before post-processing a partial split
+        exit_code = 1
     finally:
         simulation_app.close()
+    # Same exit code as the no-Kit path (e.g. localize runs with failed assets)
+    raise SystemExit(exit_code)
@@ -3,8 +3,11 @@ import json, os, sys
 from pathlib import Path
 from collections import defaultdict
 
+from labels_cache import ultralytics_cache_api, write_split_cache
+
 root = Path(sys.argv[1])  # /home/tndlux/synthetic_out
 splits = ["train","val","test"]
+cache_api = ultralytics_cache_api()  # None: Ultralytics builds labels/<split>.cache itself
 
 def load_json(split):
     js = next((root/split).glob("coco_*.json"), None)
@@ -23,6 +26,7 @@ def write_label(txt_path, W, H, anns, cat2yolo):
         cx=max(0,min(1,cx)); cy=max(0,min(1,cy)); nw=max(0,min(1,nw)); nh=max(0,min(1,nh))
         lines.append(f"{cid} {cx:.6f} {cy:.6f} {nw:.6f} {nh:.6f}")
     txt_path.write_text("\n".join(lines))
+    return "\n".join(lines)
 
 for split in splits:
     data = load_json(split)
@@ -43,6 +47,7 @@ for split in splits:
     # index by basename for match
     name2img = {os.path.basename(im.get("file_name", im.get("coco_url",""))):im for im in data["images"]}
 
+    texts = {}
     for img_path in img_dir.iterdir():
         if not img_path.is_file(): continue
         im = name2img.get(img_path.name)
@@ -51,6 +56,11 @@ for split in splits:
             txt.write_text("")  # no annotations
             continue
         anns = by_img.get(im["id"], [])
-        write_label(txt, im["width"], im["height"], anns, cat2yolo)
+        texts[str(txt.resolve())] = write_label(txt, im["width"], im["height"], anns, cat2yolo)
+
+    # Ultralytics label cache straight from the COCO sizes/labels (skips its first-run scan)
+    if cache_api:
+        sizes = {name: (im["width"], im["height"]) for name, im in name2img.items()}
+        write_split_cache(root, split, sizes, texts, cache_api)
 
 print("Done. Check labels/ for .txt files.")
@@ -0,0 +1,306 @@
+#!/usr/bin/env python3
+"""
+Standalone COCO-style mAP evaluation of an exported YOLOv8 ONNX model on an SDG split.
+
+Why this exists:
+- Evaluating best.onnx / best.int8.onnx with Ultralytics val or pycocotools pulls in the whole
+  training stack and is slow on CPU-only machines. This needs onnxruntime, NumPy and PIL only.
+
+How it works:
+1) ground truth: the split's COCO json (OUT_ROOT/<split>/coco_*.json); model class i is the
+   i-th category id in sorted order, as in coco2yolo.py.
+2) inference: frames are decoded on a thread pool and letterboxed (same mapping as the
+   benchmark in custom_sdg/check_model_inputs_ouptus.py) into batches while the previous
+   batch runs. Models exported with a static batch use that batch size (--batch is ignored);
+   the last batch is zero-padded to it and the padded results are dropped.
+3) postprocess: YOLOv8 head output (B, 4 + nc, N) -> confidence filter, class-aware
+   (or --agnostic) NMS in NumPy, boxes mapped back to the original frame.
+4) metrics: one vectorized IoU matrix per image against its ground truth. Matching follows
+   COCOeval: detections in descending score order each take the best unmatched ground truth
+   box at each of the 10 IoU thresholds .50:.05:.95. AP uses COCO 101-point interpolated
+   precision. Crowd boxes are ignored, and detections are capped by --max_det per image
+   (COCOeval caps at 100 per class and image).
+   The report holds mAP50, mAP50-95, per-class AP and precision/recall curves at IoU .5
+   (sampled at 101 recall points).
+
+Usage:
+  python eval_onnx_map.py --model best.onnx --out_root $OUT_ROOT --split test --batch 8 --json map.json
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import sys
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Dict, List, Tuple
+
+import numpy as np
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "custom_sdg"))
+from coco_masks import find_source_json  # noqa: E402
+from sdg_writers import ResolutionVariant  # noqa: E402
+
+IOU_THRESHOLDS = np.linspace(0.5, 0.95, 10)
+RECALL_POINTS = np.linspace(0.0, 1.0, 101)
+
+
+def box_iou(a: np.ndarray, b: np.ndarray) -> np.ndarray:
+    """IoU matrix of xyxy boxes a (N, 4) and b (M, 4)."""
+    lt = np.maximum(a[:, None, :2], b[None, :, :2])
+    rb = np.minimum(a[:, None, 2:], b[None, :, 2:])
+    inter = np.clip(rb - lt, 0, None).prod(2)
+    area_a = (a[:, 2:] - a[:, :2]).prod(1)
+    area_b = (b[:, 2:] - b[:, :2]).prod(1)
+    return inter / np.maximum(area_a[:, None] + area_b[None, :] - inter, 1e-9)
+
+
+def nms(boxes: np.ndarray, scores: np.ndarray, iou_thr: float, max_det: int) -> np.ndarray:
+    """Indices kept by greedy NMS (boxes xyxy), highest score first."""
+    order = scores.argsort()[::-1]
+    keep = []
+    while order.size and len(keep) < max_det:
+        i = order[0]
+        keep.append(i)
+        if order.size == 1:
+            break
+        iou = box_iou(boxes[i : i + 1], boxes[order[1:]])[0]
+        order = order[1:][iou <= iou_thr]
+    return np.asarray(keep, dtype=np.int64)
+
+
+def postprocess(
+    out: np.ndarray, conf: float, iou_thr: float, max_det: int, agnostic: bool
+) -> List[Tuple[np.ndarray, np.ndarray, np.ndarray]]:
+    """YOLOv8 output (B, 4 + nc, N) -> per image (xyxy boxes in input pixels, scores, classes)."""
+    if out.shape[1] > out.shape[2]:
+        out = out.transpose(0, 2, 1)  # (B, N, 4 + nc) exports
+    results = []
+    for pred in out:
+        cls_scores = pred[4:]
+        cls = cls_scores.argmax(0)
+        scores = cls_scores[cls, np.arange(cls_scores.shape[1])]
+        m = scores > conf
+        xywh, scores, cls = pred[:4, m].T, scores[m], cls[m]
+        boxes = np.concatenate([xywh[:, :2] - xywh[:, 2:] / 2, xywh[:, :2] + xywh[:, 2:] / 2], 1)
+        offset = 0 if agnostic else cls[:, None] * 4096.0  # separates classes for one NMS pass
+        keep = nms(boxes + offset, scores, iou_thr, max_det)
+        results.append((boxes[keep], scores[keep], cls[keep]))
+    return results
+
+
+def match_image(
+    det_boxes: np.ndarray, det_scores: np.ndarray, det_cls: np.ndarray, gt_boxes: np.ndarray, gt_cls: np.ndarray
+) -> np.ndarray:
+    """
+    (n_det, 10) bool: detection is a true positive at each IoU threshold.
+    COCO matching: detections in descending score order each take the best still unmatched
+    ground truth box of their class with IoU >= threshold (all thresholds at once).
+    """
+    tp = np.zeros((len(det_boxes), len(IOU_THRESHOLDS)), dtype=bool)
+    if not len(det_boxes) or not len(gt_boxes):
+        return tp
+    iou = box_iou(det_boxes, gt_boxes) * (det_cls[:, None] == gt_cls[None, :])
+    thr = np.minimum(IOU_THRESHOLDS, 1 - 1e-10)[:, None]
+    matched = np.zeros((len(IOU_THRESHOLDS), len(gt_boxes)), dtype=bool)
+    rows = np.arange(len(IOU_THRESHOLDS))
+    last = len(gt_boxes) - 1
+    for d in np.argsort(-det_scores, kind="stable"):
+        cand = np.where(~matched & (iou[d] >= thr), iou[d], -1.0)
+        best = last - cand[:, ::-1].argmax(1)  # ties go to the later box, as in COCOeval
+        hit = cand[rows, best] >= 0
+        matched[rows[hit], best[hit]] = True
+        tp[d] = hit
+    return tp
+
+
+def average_precision(tp: np.ndarray, conf: np.ndarray, n_gt: int) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """
+    COCO 101-point AP per IoU threshold for one class.
+    Returns (ap (10,), precision at IoU .5 over RECALL_POINTS, max recall per threshold).
+    """
+    if n_gt == 0 or not len(tp):
+        return np.zeros(len(IOU_THRESHOLDS)), np.zeros(len(RECALL_POINTS)), np.zeros(len(IOU_THRESHOLDS))
+    order = np.argsort(-conf, kind="stable")
+    tpc = np.cumsum(tp[order], 0)
+    fpc = np.cumsum(~tp[order], 0)
+    recall = tpc / n_gt
+    precision = tpc / np.maximum(tpc + fpc, 1)
+    # Precision envelope (non-increasing from the right), sampled at the recall points
+    envelope = np.flip(np.maximum.accumulate(np.flip(precision, 0), 0), 0)
+    ap = np.zeros(len(IOU_THRESHOLDS))
+    curve = np.zeros(len(RECALL_POINTS))
+    for t in range(len(IOU_THRESHOLDS)):
+        idx = np.searchsorted(recall[:, t], RECALL_POINTS, side="left")
+        sampled = np.where(idx < len(recall), envelope[np.minimum(idx, len(recall) - 1), t], 0.0)
+        ap[t] = sampled.mean()
+        if t == 0:
+            curve = sampled
+    return ap, curve, recall[-1]
+
+
+def load_ground_truth(coco: dict) -> Tuple[List[int], Dict[int, Tuple[np.ndarray, np.ndarray]]]:
+    """(sorted category ids, image id -> (xyxy boxes, class index)) without crowd boxes."""
+    cat_ids = sorted(int(c["id"]) for c in coco["categories"])
+    cat_idx = {cid: i for i, cid in enumerate(cat_ids)}
+    by_img: Dict[int, List[Tuple[List[float], int]]] = {}
+    for a in coco.get("annotations", []):
+        if a.get("iscrowd", 0) or int(a["category_id"]) not in cat_idx:
+            continue
+        x, y, w, h = a["bbox"]
+        by_img.setdefault(a["image_id"], []).append(([x, y, x + w, y + h], cat_idx[int(a["category_id"])]))
+    gt = {}
+    for im in coco["images"]:
+        rows = by_img.get(im["id"], [])
+        gt[im["id"]] = (
+            np.asarray([r[0] for r in rows], dtype=np.float32).reshape(-1, 4),
+            np.asarray([r[1] for r in rows], dtype=np.int64),
+        )
+    return cat_ids, gt
+
+
+def _load(path: Path, variant: ResolutionVariant, dtype) -> Tuple[np.ndarray, Tuple[int, int]]:
+    from PIL import Image
+
+    with Image.open(path) as im:
+        rgb = np.asarray(im.convert("RGB"))
+    x = variant.apply_image(rgb).astype(np.float32) / 255.0
+    return np.ascontiguousarray(x.transpose(2, 0, 1), dtype=dtype), (rgb.shape[1], rgb.shape[0])
+
+
+def evaluate(args) -> dict:
+    import onnxruntime as ort
+
+    split_dir = Path(args.out_root).expanduser() / args.split
+    try:
+        coco_path = Path(args.coco).expanduser() if args.coco else find_source_json(split_dir)
+    except FileNotFoundError as e:
+        raise SystemExit(f"[eval] {e}")
+    coco = json.loads(coco_path.read_text())
+    cat_ids, gt = load_ground_truth(coco)
+    names = {int(c["id"]): c.get("name", str(c["id"])) for c in coco["categories"]}
+    images = coco["images"][: args.max_images] if args.max_images > 0 else coco["images"]
+
+    so = ort.SessionOptions()
+    so.intra_op_num_threads = args.threads
+    so.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+    sess = ort.InferenceSession(args.model, sess_options=so, providers=["CPUExecutionProvider"])
+    inp = sess.get_inputs()[0]
+    shape = list(inp.shape)
+    h = shape[2] if isinstance(shape[2], int) else args.imgsz
+    w = shape[3] if isinstance(shape[3], int) else args.imgsz
+    static_batch = isinstance(shape[0], int)
+    batch = shape[0] if static_batch else args.batch
+    dtype = np.float16 if inp.type == "tensor(float16)" else np.float32
+    variant = ResolutionVariant(w, h, "letterbox")
+
+    tps, confs, det_cls = [], [], []
+    n_gt = np.zeros(len(cat_ids), dtype=np.int64)
+    t_infer = 0.0
+    t0 = time.time()
+    chunks = [images[i : i + batch] for i in range(0, len(images), batch)]
+    load_chunk = lambda ims: [_load(split_dir / im["file_name"], variant, dtype) for im in ims]  # noqa: E731
+    with ThreadPoolExecutor(max_workers=args.workers) as pool:
+        # Bounded prefetch: decode the next batches while the current one runs
+        pending, submitted = deque(), 0
+        for ims in chunks:
+            while submitted < len(chunks) and len(pending) < 2 * args.workers:
+                pending.append(pool.submit(load_chunk, chunks[submitted]))
+                submitted += 1
+            loaded = pending.popleft().result()
+            x = np.stack([t for t, _size in loaded])
+            if static_batch and len(x) < batch:
+                # Static-batch models need full batches: pad the last one, results are cut below
+                x = np.concatenate([x, np.zeros((batch - len(x),) + x.shape[1:], dtype=x.dtype)])
+            ti = time.perf_counter()
+            out = sess.run(None, {inp.name: x})[0][: len(ims)]
+            t_infer += time.perf_counter() - ti
+            for im, (_t, (src_w, src_h)), (boxes, scores, cls) in zip(
+                ims, loaded, postprocess(out, args.conf, args.iou, args.max_det, args.agnostic)
+            ):
+                sx, sy, pad_x, pad_y, _nw, _nh = variant.transform(src_w, src_h)
+                boxes = (boxes - [pad_x, pad_y, pad_x, pad_y]) / [sx, sy, sx, sy]
+                boxes = np.clip(boxes, 0, [src_w, src_h, src_w, src_h])
+                gt_boxes, gt_cls = gt[im["id"]]
+                n_gt += np.bincount(gt_cls, minlength=len(cat_ids))
+                tps.append(match_image(boxes, scores, cls, gt_boxes, gt_cls))
+                confs.append(scores)
+                det_cls.append(cls)
+    elapsed = time.time() - t0
+
+    tp = np.concatenate(tps) if tps else np.zeros((0, len(IOU_THRESHOLDS)), dtype=bool)
+    conf = np.concatenate(confs) if confs else np.zeros(0)
+    dcls = np.concatenate(det_cls) if det_cls else np.zeros(0, dtype=np.int64)
+    per_class = {}
+    aps = []
+    for i, cid in enumerate(cat_ids):
+        m = dcls == i
+        ap, curve, max_recall = average_precision(tp[m], conf[m], int(n_gt[i]))
+        per_class[names[cid]] = {
+            "gt": int(n_gt[i]),
+            "detections": int(m.sum()),
+            "ap50": round(float(ap[0]), 4),
+            "ap75": round(float(ap[5]), 4),
+            "ap50_95": round(float(ap.mean()), 4),
+            "max_recall50": round(float(max_recall[0]), 4),
+            "pr_curve50": [round(float(p), 4) for p in curve],
+        }
+        if n_gt[i]:
+            aps.append(ap)
+    aps = np.asarray(aps) if aps else np.zeros((1, len(IOU_THRESHOLDS)))
+    return {
+        "model": os.path.abspath(args.model),
+        "coco": str(coco_path),
+        "images": len(images),
+        "map50": round(float(aps[:, 0].mean()), 4),
+        "map75": round(float(aps[:, 5].mean()), 4),
+        "map50_95": round(float(aps.mean()), 4),
+        "per_class": per_class,
+        "recall_points": [round(float(r), 2) for r in RECALL_POINTS],
+        "settings": {
+            "conf": args.conf, "iou": args.iou, "max_det": args.max_det, "agnostic": args.agnostic,
+            "batch": batch, "input": [h, w],
+        },
+        "seconds": {"total": round(elapsed, 2), "inference": round(t_infer, 2)},
+    }
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser(description="COCO-style mAP of a YOLOv8 ONNX model on an SDG split (CPU).")
+    ap.add_argument("--model", required=True, help="ONNX model (best.onnx / best.int8.onnx).")
+    ap.add_argument("--out_root", default=os.path.expanduser("~/synthetic_out"), help="SDG output root.")
+    ap.add_argument("--split", default="test", help="Split directory under --out_root.")
+    ap.add_argument("--coco", default=None, help="COCO json (default: newest coco_*.json of the split).")
+    ap.add_argument("--batch", type=int, default=8, help="Batch size for models with a dynamic batch.")
+    ap.add_argument("--imgsz", type=int, default=640, help="Input size for models with symbolic H/W.")
+    ap.add_argument("--conf", type=float, default=0.001, help="Confidence threshold before NMS.")
+    ap.add_argument("--iou", type=float, default=0.7, help="NMS IoU threshold.")
+    ap.add_argument("--max_det", type=int, default=300, help="Max detections per image.")
+    ap.add_argument("--agnostic", action="store_true", help="Class-agnostic NMS.")
+    ap.add_argument("--threads", type=int, default=os.cpu_count() or 1, help="onnxruntime intra-op threads.")
+    ap.add_argument("--workers", type=int, default=4, help="Decode/preprocess threads.")
+    ap.add_argument("--max_images", type=int, default=0, help="Evaluate only the first N images (0 = all).")
+    ap.add_argument("--json", default=None, help="Also write the report to this file.")
+    args = ap.parse_args()
+
+    report = evaluate(args)
+    print(f"{'class':<24}{'gt':>8}{'AP50':>8}{'AP50-95':>9}", file=sys.stderr)
+    for name, c in report["per_class"].items():
+        print(f"{name[:23]:<24}{c['gt']:>8}{c['ap50']:>8.3f}{c['ap50_95']:>9.3f}", file=sys.stderr)
+    print(
+        f"{'all':<24}{'':>8}{report['map50']:>8.3f}{report['map50_95']:>9.3f}   "
+        f"({report['images']} images in {report['seconds']['total']:.1f}s)",
+        file=sys.stderr,
+    )
+    text = json.dumps(report, indent=2)
+    print(text)
+    if args.json:
+        Path(args.json).write_text(text + "\n")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,172 @@
+#!/usr/bin/env python3
+"""
+Write Ultralytics labels/<split>.cache files directly from the prepared SDG labels.
+
+Why this exists:
+- On its first run Ultralytics opens and verifies every image and parses every label file to
+  build labels/<split>.cache. coco2yolo.py has just produced those labels from the COCO json,
+  which also holds every image size, so the scan only repeats known work.
+
+How it works:
+- Image lists, label paths and the cache hash come from the installed Ultralytics
+  (ultralytics.data.utils), so the cache matches exactly what its dataloader expects.
+- Entries hold the same fields YOLODataset.cache_labels writes (shape from the COCO
+  width/height, boxes parsed from the label text as Ultralytics parses it).
+- Version checks: nothing is written when Ultralytics is not importable or its
+  DATASET_CACHE_VERSION is not one this writer knows. Ultralytics itself rejects a cache whose
+  version or hash (label/image paths and sizes) does not match, and rescans in that case,
+  so a stale cache (frames added or removed later) is simply rebuilt on the next training run.
+
+Usage:
+  python labels_cache.py $OUT_ROOT            # all splits, sizes from the splits' COCO json
+  (coco2yolo.py calls write_split_cache() after writing the labels)
+"""
+
+from __future__ import annotations
+
+import argparse
+import glob
+import json
+import os
+from pathlib import Path
+from typing import Dict, Optional, Tuple
+
+import numpy as np
+
+# Cache layouts this writer produces (ultralytics.data.dataset.DATASET_CACHE_VERSION)
+SUPPORTED_CACHE_VERSIONS = {"1.0.3"}
+
+
+def ultralytics_cache_api() -> Optional[dict]:
+    """Cache helpers of the installed Ultralytics, or None when missing or of an unknown cache version."""
+    try:
+        import ultralytics
+        from ultralytics.data.dataset import DATASET_CACHE_VERSION
+        from ultralytics.data.utils import IMG_FORMATS, get_hash, img2label_paths
+    except Exception as e:
+        print(f"[labels_cache] Ultralytics not available ({e}); it will scan the dataset itself")
+        return None
+    if DATASET_CACHE_VERSION not in SUPPORTED_CACHE_VERSIONS:
+        print(
+            f"[labels_cache] Ultralytics {ultralytics.__version__} uses cache version {DATASET_CACHE_VERSION} "
+            f"(supported: {sorted(SUPPORTED_CACHE_VERSIONS)}); not writing caches"
+        )
+        return None
+    return {
+        "version": DATASET_CACHE_VERSION,
+        "img_formats": IMG_FORMATS,
+        "get_hash": get_hash,
+        "img2label_paths": img2label_paths,
+    }
+
+
+def split_image_files(images_dir: Path, img_formats) -> list:
+    """Image list as YOLODataset.get_img_files builds it for a resolved directory entry of the data yaml."""
+    files = glob.glob(str(Path(images_dir).resolve() / "**" / "*.*"), recursive=True)
+    return sorted(x.replace("/", os.sep) for x in files if x.split(".")[-1].lower() in img_formats)
+
+
+def label_array(text: str) -> np.ndarray:
+    """(n, 5) float32 rows of a YOLO label text, duplicates removed as Ultralytics does."""
+    rows = [x.split() for x in text.strip().splitlines() if len(x)]
+    if not rows:
+        return np.zeros((0, 5), dtype=np.float32)
+    lb = np.array(rows, dtype=np.float32)
+    _, i = np.unique(lb, axis=0, return_index=True)
+    return lb[i] if len(i) < len(lb) else lb
+
+
+def _image_size(path: str) -> Tuple[int, int]:
+    """(width, height) from the image header, for images the COCO json does not list."""
+    from PIL import Image
+
+    with Image.open(path) as im:
+        return im.size
+
+
+def write_split_cache(
+    root: Path,
+    split: str,
+    sizes: Dict[str, Tuple[int, int]],
+    label_texts: Optional[Dict[str, str]] = None,
+    api: Optional[dict] = None,
+) -> Optional[Path]:
+    """
+    Write <root>/labels/<split>.cache for the images in <root>/images/<split>.
+    `sizes` maps image basename -> (width, height); `label_texts` maps label path -> text already
+    written (other label files are read from disk). Returns the cache path, or None when skipped.
+    """
+    api = api or ultralytics_cache_api()
+    if api is None:
+        return None
+    im_files = split_image_files(Path(root) / "images" / split, api["img_formats"])
+    if not im_files:
+        return None
+    label_files = api["img2label_paths"](im_files)
+    label_texts = label_texts or {}
+    labels = []
+    nm = nf = ne = 0
+    for im_file, lb_file in zip(im_files, label_files):
+        w, h = sizes.get(os.path.basename(im_file)) or _image_size(im_file)
+        text = label_texts.get(lb_file)
+        if text is None and os.path.isfile(lb_file):
+            text = Path(lb_file).read_text()
+        if text is None:
+            nm += 1
+            lb = np.zeros((0, 5), dtype=np.float32)
+        else:
+            nf += 1
+            lb = label_array(text)
+            ne += int(len(lb) == 0)
+        labels.append(
+            {
+                "im_file": im_file,
+                "shape": (int(h), int(w)),
+                "cls": lb[:, 0:1],
+                "bboxes": lb[:, 1:],
+                "segments": [],
+                "keypoints": None,
+                "normalized": True,
+                "bbox_format": "xywh",
+            }
+        )
+    cache = {
+        "labels": labels,
+        "hash": api["get_hash"](label_files + im_files),
+        "results": (nf, nm, ne, 0, len(im_files)),
+        "msgs": [],
+        "version": api["version"],
+    }
+    path = Path(label_files[0]).parent.with_suffix(".cache")
+    tmp = path.with_suffix(".tmp.npy")
+    np.save(str(tmp), cache)
+    os.replace(tmp, path)
+    print(f"[labels_cache] {split}: wrote {path} ({len(im_files)} images, {nf - ne} with labels)")
+    return path
+
+
+def coco_image_sizes(split_dir: Path) -> Dict[str, Tuple[int, int]]:
+    """Image basename -> (width, height) from every coco_*.json of an SDG split directory."""
+    sizes: Dict[str, Tuple[int, int]] = {}
+    for js in sorted(Path(split_dir).glob("coco_*.json")):
+        for im in json.loads(js.read_text()).get("images", []):
+            sizes[os.path.basename(im["file_name"])] = (int(im["width"]), int(im["height"]))
+    return sizes
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser(description="Write Ultralytics labels/<split>.cache files for an SDG output root.")
+    ap.add_argument("out_root", help="Output root with images/<split> and labels/<split>.")
+    ap.add_argument("--splits", default="train,val,test", help="Comma-separated splits.")
+    args = ap.parse_args()
+    root = Path(args.out_root).expanduser()
+    api = ultralytics_cache_api()
+    if api is None:
+        return
+    for split in [s for s in args.splits.split(",") if s]:
+        if (root / "images" / split).is_dir():
+            write_split_cache(root, split, coco_image_sizes(root / split), api=api)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,176 @@
+#!/usr/bin/env python3
+"""
+INT8 static quantization (QDQ) of an exported YOLOv8 best.onnx, calibrated on SDG frames.
+
+Why this exists:
+- The models run on CPU edge boxes; INT8 weights/activations cut model size ~4x and speed up
+  convolutions. The SDG val split is representative of the deployment data and is already
+  on disk, so it doubles as the calibration set.
+
+How it works:
+1) samples --num_calib frames from $OUT_ROOT/images/val (evenly spaced, masks skipped) and
+   letterboxes them exactly like the benchmark in custom_sdg/check_model_inputs_ouptus.py;
+2) runs onnxruntime quant_pre_process + quantize_static in QDQ format (per-channel int8
+   weights, uint8 activations). Non-Conv nodes of the Detect head (box decode, DFL softmax,
+   concat) stay in FP32 by default: quantizing them costs box accuracy for little speed;
+3) writes best.int8.onnx next to best.onnx (ONNX metadata such as class names is copied,
+   so Ultralytics can load it) and a report best.int8.json with size, CPU latency (batch 1)
+   and, unless --skip_map, mAP50 / mAP50-95 deltas on the test split via Ultralytics val.
+
+Usage:
+  python quantize_int8.py --model runs/.../weights/best.onnx --out_root $OUT_ROOT --data my_dataset.yaml
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import sys
+import tempfile
+from pathlib import Path
+from typing import List, Optional
+
+import numpy as np
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "custom_sdg"))
+from check_model_inputs_ouptus import (  # noqa: E402
+    latency_stats,
+    load_frames,
+    make_session,
+    model_input,
+    run_benchmark,
+    split_images,
+)
+from sdg_writers import ResolutionVariant  # noqa: E402
+
+
+class FrameReader:
+    """onnxruntime CalibrationDataReader over preprocessed frames (one image per batch)."""
+
+    def __init__(self, input_name: str, tensors: List[np.ndarray]):
+        self.input_name = input_name
+        self.tensors = tensors
+        self.pos = 0
+
+    def get_next(self):
+        if self.pos >= len(self.tensors):
+            return None
+        x = self.tensors[self.pos][None]
+        self.pos += 1
+        return {self.input_name: x}
+
+    def rewind(self):
+        self.pos = 0
+
+
+def calibration_frames(out_root: str, split: str, num: int) -> List[Path]:
+    """`num` frames spread evenly over the split (consecutive frames are near duplicates)."""
+    paths = split_images(None, out_root, split, 0)
+    if num <= 0 or num >= len(paths):
+        return paths
+    return [paths[i] for i in np.linspace(0, len(paths) - 1, num).round().astype(int)]
+
+
+def head_nodes_to_exclude(model) -> List[str]:
+    """Non-Conv nodes of the last /model.N/ module (the Ultralytics Detect head)."""
+    names = [n.name for n in model.graph.node if n.name.startswith("/model.")]
+    if not names:
+        return []
+    head = "/".join(names[-1].split("/")[:2]) + "/"
+    return [n.name for n in model.graph.node if n.name.startswith(head) and n.op_type != "Conv"]
+
+
+def quantize(
+    fp32: Path, int8: Path, tensors: List[np.ndarray], calib_method: str, keep_head_fp32: bool, log=print
+) -> None:
+    import onnx
+    from onnxruntime.quantization import CalibrationMethod, QuantFormat, QuantType, quantize_static
+    from onnxruntime.quantization.shape_inference import quant_pre_process
+
+    name = make_session(str(fp32), 1).get_inputs()[0].name
+    with tempfile.TemporaryDirectory() as tmp:
+        prep = Path(tmp) / "prep.onnx"
+        quant_pre_process(str(fp32), str(prep))
+        exclude = head_nodes_to_exclude(onnx.load(str(prep))) if keep_head_fp32 else []
+        log(f"[int8] calibrating on {len(tensors)} frame(s), {len(exclude)} head node(s) kept in FP32")
+        quantize_static(
+            str(prep),
+            str(int8),
+            FrameReader(name, tensors),
+            quant_format=QuantFormat.QDQ,
+            per_channel=True,
+            activation_type=QuantType.QUInt8,
+            weight_type=QuantType.QInt8,
+            nodes_to_exclude=exclude,
+            calibrate_method={
+                "minmax": CalibrationMethod.MinMax,
+                "entropy": CalibrationMethod.Entropy,
+                "percentile": CalibrationMethod.Percentile,
+            }[calib_method],
+        )
+    # Ultralytics reads names/stride/imgsz from the ONNX metadata
+    src, dst = onnx.load(str(fp32)), onnx.load(str(int8))
+    del dst.metadata_props[:]
+    dst.metadata_props.extend(src.metadata_props)
+    onnx.save(dst, str(int8))
+
+
+def ultralytics_map(model: Path, data: str, imgsz: int) -> Optional[dict]:
+    """mAP50 / mAP50-95 of an ONNX model on the test split of `data` (Ultralytics val on CPU)."""
+    from ultralytics import YOLO
+
+    m = YOLO(str(model), task="detect").val(
+        data=data, split="test", imgsz=imgsz, batch=1, device="cpu", plots=False, verbose=False
+    )
+    return {"map50": round(float(m.box.map50), 4), "map50_95": round(float(m.box.map), 4)}
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser(description="INT8 QDQ quantization of best.onnx calibrated on SDG frames.")
+    ap.add_argument("--model", required=True, help="FP32 ONNX (best.onnx).")
+    ap.add_argument("--out", default=None, help="Output path (default: <model stem>.int8.onnx).")
+    ap.add_argument("--out_root", default=os.path.expanduser("~/synthetic_out"), help="SDG output root.")
+    ap.add_argument("--calib_split", default="val", help="Split of images/<split> used for calibration.")
+    ap.add_argument("--num_calib", type=int, default=200, help="Calibration frames (0 = whole split).")
+    ap.add_argument(
+        "--calib_method", choices=("minmax", "entropy", "percentile"), default="minmax", help="Range calibration."
+    )
+    ap.add_argument("--quantize_head", action="store_true", help="Also quantize the non-Conv Detect head nodes.")
+    ap.add_argument("--imgsz", type=int, default=640, help="Input size for models with symbolic H/W.")
+    ap.add_argument("--threads", type=int, default=os.cpu_count() or 1, help="Threads for the latency comparison.")
+    ap.add_argument("--iters", type=int, default=50, help="Timed runs for the latency comparison.")
+    ap.add_argument("--data", default=None, help="Dataset YAML for the test-split mAP comparison.")
+    ap.add_argument("--skip_map", action="store_true", help="Skip the mAP comparison.")
+    args = ap.parse_args()
+
+    fp32 = Path(args.model).expanduser().resolve()
+    int8 = Path(args.out).expanduser().resolve() if args.out else fp32.with_name(fp32.stem + ".int8.onnx")
+    _name, _batch, h, w, dtype = model_input(make_session(str(fp32), 1), args.imgsz)
+    paths = calibration_frames(args.out_root, args.calib_split, args.num_calib)
+    tensors, _decode_ms, _prep_ms = load_frames(paths, ResolutionVariant(w, h), None, None, dtype)
+    quantize(fp32, int8, tensors, args.calib_method, not args.quantize_head)
+
+    report = {"fp32": {"path": str(fp32)}, "int8": {"path": str(int8)}, "calibration_frames": len(paths)}
+    for key, path in (("fp32", fp32), ("int8", int8)):
+        report[key]["mb"] = round(path.stat().st_size / float(1 << 20), 3)
+        run = run_benchmark(str(path), tensors, [1], [args.threads], 5, args.iters, args.imgsz, 0.0, lambda _m: None)
+        report[key]["latency_ms"] = run[0]["latency_ms"] if run else latency_stats([])
+        if args.data and not args.skip_map:
+            report[key].update(ultralytics_map(path, args.data, args.imgsz) or {})
+    delta = {"mb": round(report["int8"]["mb"] - report["fp32"]["mb"], 3)}
+    if report["fp32"]["latency_ms"]:
+        delta["latency_p50_ms"] = round(report["int8"]["latency_ms"]["p50"] - report["fp32"]["latency_ms"]["p50"], 3)
+        delta["speedup_p50"] = round(report["fp32"]["latency_ms"]["p50"] / report["int8"]["latency_ms"]["p50"], 3)
+    for k in ("map50", "map50_95"):
+        if k in report["fp32"] and k in report["int8"]:
+            delta[k] = round(report["int8"][k] - report["fp32"][k], 4)
+    report["delta"] = delta
+    report_path = int8.with_suffix(".json")
+    report_path.write_text(json.dumps(report, indent=2) + "\n")
+    print(json.dumps(report, indent=2))
+    print(f"[int8] wrote {int8} and {report_path}")
+
+
+if __name__ == "__main__":
+    main()
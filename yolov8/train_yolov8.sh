@@ -176,6 +176,12 @@ if [[ "${ENFORCE_LABELS:-1}" != "0" ]]; then
   fi
 fi
 
+# 4d) Ultralytics label caches (labels/<split>.cache) from the prepared labels and COCO image sizes,
+# so the first epoch skips the image/label scan. Refreshing is cheap, and a stale cache would be rescanned.
+if [[ "${LABELS_CACHE:-1}" != "0" && -d "$OUT_ROOT/labels" ]]; then
+  "$PY_BIN" "$SCRIPT_DIR/labels_cache.py" "$OUT_ROOT" || echo "Warning: labels cache not written; Ultralytics will scan the dataset" >&2
+fi
+
 # 5) Define YOLO output project folder inside OUT_ROOT
 PROJECT_DIR="$OUT_ROOT/$PROJECT_NAME"
 mkdir -p "$PROJECT_DIR"
@@ -204,11 +210,6 @@ echo " - name:    $RUN_NAME"
 
 echo "Training complete. See runs under: $PROJECT_DIR/$RUN_NAME*"
 
-# Cleanup temp file if used
-if [[ -n "${TMP_DATA_YAML}" && -f "${TMP_DATA_YAML}" ]]; then
-  rm -f "${TMP_DATA_YAML}"
-fi
-
 # 6) Export best.pt to ONNX (relative to synthetic_out)
 if [[ "${EXPORT_ONNX:-1}" != "0" ]]; then
   WEIGHTS_DIR="$PROJECT_DIR/$RUN_NAME/weights"
@@ -228,3 +229,27 @@ PY
     echo "Warning: best.pt not found at $BEST_PT; skipping ONNX export" >&2
   fi
 fi
+
+# 7) INT8 static quantization (QDQ) of best.onnx, calibrated on images/val; writes best.int8.onnx and
+# best.int8.json (size, CPU latency and test-split mAP deltas vs FP32)
+if [[ "${EXPORT_ONNX:-1}" != "0" && "${QUANTIZE_INT8:-1}" != "0" ]]; then
+  BEST_ONNX="$PROJECT_DIR/$RUN_NAME/weights/best.onnx"
+  if [[ -f "$BEST_ONNX" ]]; then
+    quant_args=(--model "$BEST_ONNX" --out_root "$OUT_ROOT" --imgsz "$IMG_SIZE" --num_calib "${QUANT_CALIB_IMAGES:-200}")
+    if [[ "${QUANT_MAP:-1}" != "0" && -d "$OUT_ROOT/images/test" ]]; then
+      quant_args+=(--data "$USE_DATA_YAML")
+    else
+      quant_args+=(--skip_map)
+    fi
+    echo "Quantizing ${BEST_ONNX#$OUT_ROOT/} to INT8 (calibration: $OUT_ROOT/images/val)"
+    "$PY_BIN" "$SCRIPT_DIR/quantize_int8.py" "${quant_args[@]}" \
+      || echo "Warning: INT8 quantization failed; best.onnx is unaffected" >&2
+  else
+    echo "Warning: best.onnx not found at $BEST_ONNX; skipping INT8 quantization" >&2
+  fi
+fi
+
+# Cleanup temp file if used
+if [[ -n "${TMP_DATA_YAML}" && -f "${TMP_DATA_YAML}" ]]; then
+  rm -f "${TMP_DATA_YAML}"
+fi